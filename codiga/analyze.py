@@ -7,6 +7,7 @@ Global options:
     -p PROJECT_NAME          Project name to show
     -w                       Wait for the analysis to complete and print results
     -t TIMEOUT               Timeout to wait for the job completion (default 600 seconds)
+    --subscribe              With -w, be notified when the analysis completes instead of polling
 Example:
     $ codiga-analyze -p "MY SUPER PROJECT"
 """
@@ -15,12 +16,17 @@ import os
 import json
 import logging
 import sys
-import time
 
 import docopt
 
 from .constants import DEFAULT_TIMEOUT, API_TOKEN_ENVIRONMENT_VARIABLE
+from .exceptions.polling_timeout_exception import PollingTimeoutException
+from .graphql.cache import do_cached_graphql_query
 from .graphql.common import do_graphql_query
+from .graphql.constants import is_analysis_complete
+from .graphql.registry import register_query
+from .graphql.subscription import wait_for_analysis
+from .utils.poller import Deadline
 from .version import __version__
 
 logging.basicConfig()
@@ -28,6 +34,32 @@ logging.basicConfig()
 log = logging.getLogger('codiga')
 
 
+SCHEDULE_ANALYSIS_MUTATION = register_query("""
+    mutation ScheduleAnalysis($name: String!) {
+      scheduleAnalysis(name: $name){
+        id
+      }
+    }
+""")
+
+GET_ANALYSIS_QUERY = register_query("""
+    query GetAnalysis($id: Long!) {
+      analysis(id: $id){
+        id
+        status
+        techdebt{
+          grade
+          score
+        }
+        summary{
+          duplicates
+          violations
+        }
+      }
+    }
+""")
+
+
 def analyze(api_token, project_name):
     """
     Get the project information with the latest analysis data using the project name
@@ -35,13 +67,7 @@ def analyze(api_token, project_name):
     :param project_name: name of the project
     :return: the project identifier or None is exception or non-existent project.
     """
-    args = []
-    args.append("name: \"" + project_name + "\"")
-    args_string = ",".join(args)
-    query = """
-        mutation { scheduleAnalysis(""" + args_string + """){id}}
-    """
-    response_json = do_graphql_query(api_token, {"query": query})
+    response_json = do_graphql_query(api_token, SCHEDULE_ANALYSIS_MUTATION.payload({"name": project_name}))
 
     if not response_json:
         return None
@@ -56,24 +82,10 @@ def get_analysis(api_token, analysis_id):
     :param analysis_id: the identifier of the analysis we want to poll
     :return: the return code depending on the results or some processing error
     """
-
-    query = """
-        {
-          analysis(id: """ + str(analysis_id) + """){
-            id
-            status
-            techdebt{
-              grade
-              score
-            }
-            summary{
-              duplicates
-              violations
-            }
-          }
-        }
-        """
-    response_json = do_graphql_query(api_token, {"query": query})
+    # a complete analysis never changes, an analysis in progress is polled and not cached
+    response_json = do_cached_graphql_query(api_token, GET_ANALYSIS_QUERY.payload({"id": analysis_id}),
+                                            lambda data: is_analysis_complete(data.get('analysis')),
+                                            mutable_ttl_secs=0)
     return response_json['analysis']
 
 
@@ -87,6 +99,7 @@ def main(argv=None):
 
     project_name = options['-p']
     wait = True if options['-w'] else False
+    subscribe = True if options['--subscribe'] else False
 
     try:
         timeout = int(options['-t']) if options['-t'] else DEFAULT_TIMEOUT
@@ -116,22 +129,18 @@ def main(argv=None):
 
         if wait:
             analysis_id = analysis['id']
-            deadline = time.time() + timeout
-
-            while True:
-                now = time.time()
-                if now > deadline:
-                    log.error("Deadline expired")
-                    sys.exit(1)
-
-                poll_analysis = get_analysis(api_token, analysis_id)
-                if poll_analysis['status'].upper() not in ["DONE", "ERROR", "SAME_REVISION"]:
-                    log.debug("analysis not completed yet")
-                    time.sleep(5)
-                    continue
-
-                print(json.dumps(poll_analysis, indent=4))
-                sys.exit(0)
+            deadline = Deadline(timeout)
+
+            try:
+                poll_analysis = wait_for_analysis(api_token, analysis_id,
+                                                  lambda: get_analysis(api_token, analysis_id),
+                                                  deadline, subscribe)
+            except PollingTimeoutException:
+                log.error("Deadline expired")
+                sys.exit(1)
+
+            print(json.dumps(poll_analysis, indent=4))
+            sys.exit(0)
         else:
             log.info("Analysis started")
             log.info(json.dumps(analysis))
@@ -14,21 +14,39 @@ Global options:
     --max-complex-functions-rate <rate>   Max rate of complex functions in the total number of functions (optional)
     --max-long-functions-rate <rate>      Max rate of long functions in the total number of functions (optional)
     --max-timeout-sec <timeout>           Maximum time to wait before the analysis is done (in secs). Default to 600.
+    --manifest <file>                     YAML or JSON file with the projects and SHA to check (replaces --project/--sha)
 Example:
     $ codiga-check-quality --project "MY SUPER PROJECT" --min-quality-score 90 --sha 7644598cb436840a3961dd2b66172c18a2ff7823
+    $ codiga-check-quality --manifest codiga-projects.yml --min-quality-score 80
+
+Manifest:
+    projects:
+      - project: "MY SUPER PROJECT"
+        sha: 7644598cb436840a3961dd2b66172c18a2ff7823
+        min-quality-score: 90
+
+    Each project accepts the thresholds options without the leading dashes. The options
+    passed on the command line are used for the projects that do not define them.
 """
 
 import os
 import json
 import logging
 import sys
-import time
+import typing
+from dataclasses import dataclass
 
 import docopt
+import yaml
 from codiga.common import is_grade_lower
-from codiga.constants import DEFAULT_TIMEOUT, API_TOKEN_ENVIRONMENT_VARIABLE
-
-from .graphql.common import do_graphql_query
+from codiga.constants import DEFAULT_TIMEOUT, API_TOKEN_ENVIRONMENT_VARIABLE, MAX_POLLING_REQUESTS
+
+from .exceptions.polling_timeout_exception import PollingTimeoutException
+from .graphql.cache import do_cached_graphql_query, get_response_cache, get_response_cache_key
+from .graphql.common import do_graphql_queries, BATCH_MAX_SIZE
+from .graphql.constants import STATUS_ERROR, is_analysis_complete
+from .graphql.registry import register_query
+from .utils.poller import Deadline, poll
 from .version import __version__
 
 logging.basicConfig()
@@ -36,6 +54,31 @@ logging.basicConfig()
 log = logging.getLogger('codiga')
 
 
+GET_ANALYSIS_BY_REVISION_QUERY = register_query("""
+    query GetAnalysisByRevision($name: String!, $revision: String!) {
+      project(name: $name) {
+        analyses(revision: $revision, howmany: 1, skip: 0) {
+          id
+          status
+          slocs
+          techdebt{
+            grade
+            score
+          }
+          summary{
+            duplicates
+            violations
+            duplicated_lines
+            longFunctions
+            totalFunctions
+            complexFunctions
+          }
+        }
+      }
+    }
+""")
+
+
 def get_analysis_by_revision(api_token, project_name, revision):
     """
     Get an analysis using its ID
@@ -44,35 +87,268 @@ def get_analysis_by_revision(api_token, project_name, revision):
     :param revision: the revision to analyze
     :return: the return code depending on the results or some processing error
     """
-
-    query = """
-        {
-            project(name: \"""" + project_name + """\") {
-              analyses(revision: \"""" + revision + """\", howmany: 1, skip: 0) {
-                id
-                status
-                slocs
-                techdebt{
-                  grade
-                  score
-                }
-                summary{
-                  duplicates
-                  violations
-                  duplicated_lines
-                  longFunctions
-                  totalFunctions
-                  complexFunctions
-                }
-              }
-            }
-        }
-        """
-    response_json = do_graphql_query(api_token, {"query": query})
+    payload = GET_ANALYSIS_BY_REVISION_QUERY.payload({"name": project_name, "revision": revision})
+    response_json = do_cached_graphql_query(api_token, payload, is_revision_analysis_complete, mutable_ttl_secs=0)
     logging.info("Analysis response %s", response_json)
     return response_json['project']
 
 
+def get_first_analysis(data):
+    """
+    :param data: the data returned by GET_ANALYSIS_BY_REVISION_QUERY
+    :return: the analysis of the revision or None if there is no analysis yet
+    """
+    project = data.get('project') if data else None
+    if project and project['analyses'] and len(project['analyses']) > 0:
+        return project['analyses'][0]
+    return None
+
+
+def is_revision_analysis_complete(data):
+    """
+    :param data: the data returned by GET_ANALYSIS_BY_REVISION_QUERY
+    :return: True if the analysis of the revision is done and will not change anymore
+    """
+    return is_analysis_complete(get_first_analysis(data))
+
+
+def get_revision_analysis(api_token, project_name, revision):
+    """
+    Get the latest analysis of a revision
+    :param api_token: token to poll the API
+    :param project_name: name of the project to analyze
+    :param revision: the revision to analyze
+    :return: the analysis or None if there is no analysis yet for this revision
+    """
+    return get_first_analysis({'project': get_analysis_by_revision(api_token, project_name, revision)})
+
+
+MANIFEST_PROJECTS_KEY = "projects"
+MANIFEST_PROJECT_KEY = "project"
+MANIFEST_SHA_KEY = "sha"
+
+
+@dataclass
+class QualityThresholds:
+    """
+    The conditions an analysis must meet. None means no condition.
+    """
+    min_quality_score: typing.Optional[int] = None
+    min_quality_grade: typing.Optional[str] = None
+    max_defects_rate: typing.Optional[float] = None
+    max_complex_functions_rate: typing.Optional[float] = None
+    max_long_functions_rate: typing.Optional[float] = None
+
+    @staticmethod
+    def from_options(options: dict, defaults=None):
+        """
+        Get the thresholds from the command line options or a manifest entry.
+        :param options: the values, keyed by option name without the leading dashes
+        :param defaults: the thresholds used for the values not defined in options
+        :return: the thresholds
+        :raise ValueError: if a value is invalid
+        """
+        defaults = defaults or QualityThresholds()
+
+        def get_value(key, convert, default):
+            value = options.get(key)
+            return convert(value) if value is not None else default
+
+        return QualityThresholds(
+            min_quality_score=get_value("min-quality-score", int, defaults.min_quality_score),
+            min_quality_grade=get_value("min-quality-grade", str, defaults.min_quality_grade),
+            max_defects_rate=get_value("max-defects-rate", float, defaults.max_defects_rate),
+            max_complex_functions_rate=get_value("max-complex-functions-rate", float,
+                                                 defaults.max_complex_functions_rate),
+            max_long_functions_rate=get_value("max-long-functions-rate", float, defaults.max_long_functions_rate))
+
+
+ANALYSIS_SUMMARY_METRICS = ['violations', 'complexFunctions', 'longFunctions', 'totalFunctions']
+
+
+def get_analysis_failure(analysis: dict) -> typing.Optional[str]:
+    """
+    :param analysis: a complete analysis
+    :return: why the metrics of the analysis cannot be checked, None if they can
+    """
+    if analysis['status'].upper() == STATUS_ERROR.upper():
+        return "analysis failed"
+    summary = analysis.get('summary') or {}
+    if analysis.get('slocs') is None or not analysis.get('techdebt') \
+            or any(summary.get(metric) is None for metric in ANALYSIS_SUMMARY_METRICS):
+        return "analysis has no metrics"
+    return None
+
+
+def get_analysis_metrics(analysis: dict) -> dict:
+    """
+    Compute the metrics checked by the quality gate
+    :param analysis: a complete analysis
+    :return: the score, grade and rates of the analysis
+    """
+    analysis_slocs = int(analysis['slocs'])
+    analysis_violations = int(analysis['summary']['violations'])
+    analysis_complex_functions = int(analysis['summary']['complexFunctions'])
+    analysis_long_functions = int(analysis['summary']['longFunctions'])
+    analysis_total_functions = int(analysis['summary']['totalFunctions'])
+
+    if analysis_slocs > 0:
+        if analysis_total_functions > 0:
+            analysis_complex_function_rate = analysis_complex_functions / analysis_total_functions
+            analysis_long_function_rate = analysis_long_functions / analysis_total_functions
+        else:
+            analysis_complex_function_rate = 0
+            analysis_long_function_rate = 0
+
+        analysis_violations_rate = analysis_violations / analysis_slocs
+    else:
+        analysis_complex_function_rate = 0
+        analysis_long_function_rate = 0
+        analysis_violations_rate = 0
+
+    return {
+        "score": analysis['techdebt']['score'],
+        "grade": analysis['techdebt']['grade'],
+        "violations_rate": analysis_violations_rate,
+        "complex_function_rate": analysis_complex_function_rate,
+        "long_function_rate": analysis_long_function_rate
+    }
+
+
+def check_analysis(analysis: dict, thresholds: QualityThresholds) -> typing.List[str]:
+    """
+    Check an analysis against the thresholds
+    :param analysis: a complete analysis
+    :param thresholds: the conditions to meet
+    :return: the reasons why the analysis does not meet the conditions (empty if it does)
+    """
+    failure = get_analysis_failure(analysis)
+    if failure is not None:
+        return [failure]
+    metrics = get_analysis_metrics(analysis)
+    reasons = []
+
+    if metrics["score"] and thresholds.min_quality_score is not None \
+            and metrics["score"] < thresholds.min_quality_score:
+        reasons.append(f"analysis score {metrics['score']} is lower than minimum expected score "
+                       f"{thresholds.min_quality_score}")
+
+    if thresholds.max_complex_functions_rate is not None \
+            and metrics["complex_function_rate"] > thresholds.max_complex_functions_rate:
+        reasons.append(f"complex function rate {metrics['complex_function_rate']} is higher than maximum "
+                       f"{thresholds.max_complex_functions_rate}")
+
+    if thresholds.max_long_functions_rate is not None \
+            and metrics["long_function_rate"] > thresholds.max_long_functions_rate:
+        reasons.append(f"long function rate {metrics['long_function_rate']} is higher than maximum "
+                       f"{thresholds.max_long_functions_rate}")
+
+    if thresholds.max_defects_rate is not None and metrics["violations_rate"] > thresholds.max_defects_rate:
+        reasons.append(f"violation rate {metrics['violations_rate']} is higher than maximum "
+                       f"{thresholds.max_defects_rate}")
+
+    if thresholds.min_quality_grade is not None and is_grade_lower(metrics["grade"], thresholds.min_quality_grade):
+        reasons.append(f"grade {metrics['grade']} is lower than grade {thresholds.min_quality_grade}")
+
+    return reasons
+
+
+def load_manifest(path: str, default_thresholds: QualityThresholds) \
+        -> typing.List[typing.Tuple[str, str, QualityThresholds]]:
+    """
+    Load the projects to check from a manifest (YAML or JSON)
+    :param path: the path of the manifest
+    :param default_thresholds: the thresholds for the projects that do not define them
+    :return: the project name, SHA and thresholds of each entry
+    :raise ValueError: if the manifest is invalid
+    """
+    with open(path, 'r', encoding='utf-8') as stream:
+        if path.endswith(".json"):
+            content = json.load(stream)
+        else:
+            content = yaml.safe_load(stream)
+
+    if isinstance(content, dict):
+        content = content.get(MANIFEST_PROJECTS_KEY)
+    if not isinstance(content, list) or len(content) == 0:
+        raise ValueError(f"no projects in manifest {path}")
+
+    entries = []
+    for entry in content:
+        if not isinstance(entry, dict) or not entry.get(MANIFEST_PROJECT_KEY) or not entry.get(MANIFEST_SHA_KEY):
+            raise ValueError(f"each project in the manifest requires {MANIFEST_PROJECT_KEY} and {MANIFEST_SHA_KEY}")
+        entries.append((str(entry[MANIFEST_PROJECT_KEY]), str(entry[MANIFEST_SHA_KEY]),
+                        QualityThresholds.from_options(entry, default_thresholds)))
+    return entries
+
+
+def get_revision_analyses(api_token, revisions: typing.List[typing.Tuple[str, str]],
+                          analyses: dict) -> dict:
+    """
+    Get the latest analysis of several revisions, in batches of queries.
+    Revisions with a complete analysis in analyses or in the response cache are not requested again.
+    :param api_token: token to poll the API
+    :param revisions: the (project name, revision) to get
+    :param analyses: the analyses already fetched, updated with the new ones
+    :return: analyses
+    """
+    cache = get_response_cache()
+    pending = []
+    for revision in revisions:
+        if is_analysis_complete(analyses.get(revision)):
+            continue
+        if cache is not None:
+            payload = GET_ANALYSIS_BY_REVISION_QUERY.payload({"name": revision[0], "revision": revision[1]})
+            cached_data = cache.get(get_response_cache_key(api_token, payload))
+            if cached_data is not None:
+                analyses[revision] = get_first_analysis(cached_data)
+                continue
+        pending.append(revision)
+
+    for start in range(0, len(pending), BATCH_MAX_SIZE):
+        batch = pending[start:start + BATCH_MAX_SIZE]
+        results = do_graphql_queries(api_token, [(GET_ANALYSIS_BY_REVISION_QUERY, {"name": name, "revision": sha})
+                                                 for name, sha in batch])
+        for revision, data in zip(batch, results):
+            analysis = get_first_analysis(data)
+            if analysis is not None:
+                analyses[revision] = analysis
+            if cache is not None and is_analysis_complete(analysis):
+                payload = GET_ANALYSIS_BY_REVISION_QUERY.payload({"name": revision[0], "revision": revision[1]})
+                cache.set(get_response_cache_key(api_token, payload), data)
+    return analyses
+
+
+def check_manifest(api_token, entries: typing.List[typing.Tuple[str, str, QualityThresholds]],
+                   deadline: Deadline) -> dict:
+    """
+    Wait for the analyses of all the entries of a manifest and check them.
+    :param api_token: token to poll the API
+    :param entries: the project name, SHA and thresholds of each project
+    :param deadline: when to stop waiting for the analyses
+    :return: the report with the result of each project
+    """
+    revisions = [(name, sha) for name, sha, _ in entries]
+    analyses = {}
+    try:
+        poll(lambda: get_revision_analyses(api_token, revisions, analyses),
+             lambda result: all(is_analysis_complete(result.get(revision)) for revision in revisions),
+             deadline, max_requests=MAX_POLLING_REQUESTS)
+    except PollingTimeoutException:
+        log.error("Deadline expired")
+
+    projects = []
+    for name, sha, thresholds in entries:
+        analysis = analyses.get((name, sha))
+        if not is_analysis_complete(analysis):
+            reasons = ["analysis not complete before the deadline"]
+        else:
+            reasons = check_analysis(analysis, thresholds)
+        projects.append({"project": name, "sha": sha, "passed": len(reasons) == 0, "reasons": reasons,
+                         "analysis": analysis})
+    return {"passed": all(project["passed"] for project in projects), "projects": projects}
+
+
 def main(argv=None):
     """
     Main function that makes the magic happen.
@@ -82,6 +358,7 @@ def main(argv=None):
     options = docopt.docopt(__doc__, argv=argv, version=__version__)
     sha = options['--sha']
     project_name = options['--project']
+    manifest = options['--manifest']
     min_quality_score_argument = options['--min-quality-score']
     min_quality_grade_argument = options['--min-quality-grade']
     max_defects_rate_argument = options['--max-defects-rate']
@@ -105,6 +382,7 @@ def main(argv=None):
     log.info("                    (parameters)                    ")
     log.info("sha: %s", sha)
     log.info("project_name: %s", project_name)
+    log.info("manifest: %s", manifest)
     log.info("min_quality_score_argument: %s", min_quality_score_argument)
     log.info("min_quality_grade_argument: %s", min_quality_grade_argument)
     log.info("max_defects_rate_argument: %s", max_defects_rate_argument)
@@ -120,6 +398,29 @@ def main(argv=None):
             log.info('%s environment variable not defined!', API_TOKEN_ENVIRONMENT_VARIABLE)
             sys.exit(1)
 
+        # Filter argument and bad values.
+        thresholds = QualityThresholds.from_options({key[2:]: value for key, value in options.items()})
+        deadline = Deadline(timeout)
+
+        if manifest:
+            try:
+                entries = load_manifest(manifest, thresholds)
+            except (OSError, ValueError, yaml.YAMLError) as e:
+                log.error("Cannot load manifest %s: %s", manifest, e)
+                sys.exit(1)
+
+            report = check_manifest(api_token, entries, deadline)
+            print(json.dumps(report, indent=4))
+            for project in report["projects"]:
+                if project["passed"]:
+                    log.info("PASS %s (%s)", project["project"], project["sha"])
+                else:
+                    log.info("FAIL %s (%s): %s", project["project"], project["sha"], "; ".join(project["reasons"]))
+            if not report["passed"]:
+                sys.exit(1)
+            log.info("Everything is fine, all conditions passed")
+            sys.exit(0)
+
         if not project_name:
             log.info('Project name not defined')
             sys.exit(1)
@@ -128,102 +429,29 @@ def main(argv=None):
             log.info('GitHub SHA required')
             sys.exit(1)
 
-        # Filter argument and bad values.
-        if min_quality_score_argument is not None:
-            min_quality_score = int(min_quality_score_argument)
-        else:
-            min_quality_score = None
-
-        if max_defects_rate_argument is not None:
-            max_defects_rate = float(max_defects_rate_argument)
-        else:
-            max_defects_rate = None
-
-        if max_complex_functions_rate_argument is not None:
-            max_complex_functions_rate = float(max_complex_functions_rate_argument)
-        else:
-            max_complex_functions_rate = None
-
-        if max_long_functions_rate_argument is not None:
-            max_long_functions_rate = float(max_long_functions_rate_argument)
-        else:
-            max_long_functions_rate = None
-
-        deadline = time.time() + timeout
-
-        while True:
-            now = time.time()
-            if now > deadline:
-                log.error("Deadline expired")
-                sys.exit(1)
-
-            poll_analysis = None
-            project = get_analysis_by_revision(api_token, project_name, sha)
-            analysis_complete = False
-            if project['analyses'] and len(project['analyses']) > 0:
-                poll_analysis = project['analyses'][0]
-                status = poll_analysis['status']
-                if status.upper() in ["DONE", "ERROR", "SAME_REVISION"]:
-                    poll_analysis = project['analyses'][0]
-                    analysis_complete = True
-            if not analysis_complete:
-                log.debug("analysis not completed yet")
-                time.sleep(5)
-                continue
-
-            print(json.dumps(poll_analysis, indent=4))
-
-            analysis_slocs = int(poll_analysis['slocs'])
-            analysis_violations = int(poll_analysis['summary']['violations'])
-            analysis_complex_functions = int(poll_analysis['summary']['complexFunctions'])
-            analysis_long_functions = int(poll_analysis['summary']['longFunctions'])
-            analysis_total_functions = int(poll_analysis['summary']['totalFunctions'])
-            analysis_score = poll_analysis['techdebt']['score']
-            analysis_grade = poll_analysis['techdebt']['grade']
-
-            if analysis_slocs > 0:
-                if analysis_total_functions > 0:
-                    analysis_complex_function_rate = analysis_complex_functions / analysis_total_functions
-                    analysis_long_function_rate = analysis_long_functions / analysis_total_functions
-                else:
-                    analysis_complex_function_rate = 0
-                    analysis_long_function_rate = 0
-
-                analysis_violations_rate = analysis_violations / analysis_slocs
-            else:
-                analysis_complex_function_rate = 0
-                analysis_long_function_rate = 0
-                analysis_violations_rate = 0
-
-            logging.info("analysis_score: %s", analysis_score)
-            logging.info("analysis_grade: %s", analysis_grade)
-            logging.info("analysis_violations_rate: %s", analysis_violations_rate)
-            logging.info("analysis_complex_function_rate: %s", analysis_complex_function_rate)
-            logging.info("analysis_long_function_rate: %s", analysis_long_function_rate)
-
-            if analysis_score and min_quality_score is not None and analysis_score < min_quality_score:
-                log.info("analysis score %s is lower than minimum expected score %s", analysis_score, min_quality_score)
-                sys.exit(1)
-
-            if max_complex_functions_rate is not None and analysis_complex_function_rate > max_complex_functions_rate:
-                log.info("complex function rate %s is higher than maximum %s", analysis_complex_function_rate, max_complex_functions_rate)
-                sys.exit(1)
-
-            if max_long_functions_rate is not None and analysis_long_function_rate > max_long_functions_rate:
-                log.info("long function rate %s is higher than maximum %s", analysis_long_function_rate, max_long_functions_rate)
-                sys.exit(1)
+        try:
+            poll_analysis = poll(lambda: get_revision_analysis(api_token, project_name, sha),
+                                 is_analysis_complete, deadline, max_requests=MAX_POLLING_REQUESTS)
+        except PollingTimeoutException:
+            log.error("Deadline expired")
+            sys.exit(1)
 
-            if max_defects_rate is not None and analysis_violations_rate > max_defects_rate:
-                log.info("violation rate %s is higher than maximum %s", analysis_violations_rate, max_defects_rate)
-                sys.exit(1)
+        print(json.dumps(poll_analysis, indent=4))
 
-            if min_quality_grade_argument is not None and is_grade_lower(analysis_grade, min_quality_grade_argument):
-                log.info("grade %s is lower than grade %s", analysis_grade, min_quality_grade_argument)
-                sys.exit(1)
+        if get_analysis_failure(poll_analysis) is None:
+            metrics = get_analysis_metrics(poll_analysis)
+            logging.info("analysis_score: %s", metrics["score"])
+            logging.info("analysis_grade: %s", metrics["grade"])
+            logging.info("analysis_violations_rate: %s", metrics["violations_rate"])
+            logging.info("analysis_complex_function_rate: %s", metrics["complex_function_rate"])
+            logging.info("analysis_long_function_rate: %s", metrics["long_function_rate"])
 
-            log.info("Everything is fine, all conditions passed")
-            sys.exit(0)
+        reasons = check_analysis(poll_analysis, thresholds)
+        if reasons:
+            log.info(reasons[0])
+            sys.exit(1)
 
+        log.info("Everything is fine, all conditions passed")
         sys.exit(0)
     except KeyboardInterrupt:  # pragma: no cover
         log.info('Aborted')
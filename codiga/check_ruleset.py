@@ -1,34 +1,225 @@
-"""Save a ruleset into a file
+"""Check that all the tests of a ruleset pass on a Rosie server
 
 Usage:
-    codiga-export-ruleset [options]
+    codiga-check-ruleset [options]
 
 Global options:
     -r RULESET               Name of the ruleset
     -s SERVER_URL            URL of the rosie server to use
+    -j JOBS                  Number of tests executed concurrently (default 8)
+    --no-cache               Execute all tests, including the ones that passed with the same rule and server before
+    --junit FILE             Write the results in a JUnit XML report
+    --json FILE              Write the results in a JSON report
 Example:
-    $ codiga-export-ruleset -r "python-security" -s "https://analysis.codiga.io/analyze"
+    $ codiga-check-ruleset -r "python-security" -s "https://analysis.codiga.io/analyze" --junit report.xml
 """
 
-import os
+import hashlib
 import json
 import logging
 import sys
 import time
+import typing
+import xml.etree.ElementTree as ElementTree
+from concurrent.futures import ThreadPoolExecutor, Future
+from dataclasses import dataclass, asdict
 
 import docopt
 from codiga.model.rosie_rule import RosieRule, ELEMENT_CHECKED_TO_ENTITY_CHECKED_FOR_API
 
+from codiga.exceptions.rosie_analysis_exception import RosieAnalysisException
 from codiga.rosie.api import ROSIE_URL, analyze_rosie
-from .constants import DEFAULT_TIMEOUT, API_TOKEN_ENVIRONMENT_VARIABLE
-from .graphql.common import do_graphql_query
-from .graphql.rosie import graphql_get_rulesets, graphql_get_ruleset
+from .exceptions.ruleset_fetch_exception import RulesetFetchException
+from .graphql.rosie import graphql_get_ruleset, RULESET_PROFILE_FULL
+from .utils.cache_utils import get_cache_file
 from .version import __version__
 
 logging.basicConfig()
 
 log = logging.getLogger('codiga')
 
+DEFAULT_JOBS = 8
+
+TEST_CACHE_FILENAME = "check-ruleset-cache.json"
+
+
+@dataclass
+class RuleTestResult:
+    """
+    Result of the execution of one test of a rule.
+    """
+    rule: str
+    test: str
+    should_fail: bool
+    passed: bool
+    duration_ms: float
+    cached: bool = False
+    # why the analysis did not complete, the test did not pass nor fail
+    error: typing.Optional[str] = None
+
+
+def build_rosie_rule(ruleset_name: str, rule: dict) -> RosieRule:
+    """
+    Build the rule to send to Rosie from the rule returned by the GraphQL API
+    :param ruleset_name: the name of the ruleset
+    :param rule: the rule from the GraphQL API
+    :return: the rule to send to Rosie
+    """
+    if rule['elementChecked'] in ELEMENT_CHECKED_TO_ENTITY_CHECKED_FOR_API:
+        element_checked = ELEMENT_CHECKED_TO_ENTITY_CHECKED_FOR_API[rule['elementChecked']]
+    else:
+        element_checked = None
+    return RosieRule(
+        f"{ruleset_name}/{rule['name']}",
+        rule['content'],
+        rule['language'],
+        rule['ruleType'],
+        element_checked,
+        rule['pattern']
+    )
+
+
+def get_test_cache_key(rule_object: RosieRule, test: dict, server_url: str) -> str:
+    """
+    Get the key identifying the execution of a test: the same test for the same
+    rule on the same server always produces the same result.
+    :param rule_object: the rule being tested
+    :param test: the test from the GraphQL API
+    :param server_url: the URL of the Rosie server
+    :return: the key of the test execution
+    """
+    rule_hash = hashlib.sha256(json.dumps(rule_object.to_json(), sort_keys=True).encode('utf-8')).hexdigest()
+    test_hash = hashlib.sha256(json.dumps([test['name'], test['content'], test['shouldFail']]).encode('utf-8')).hexdigest()
+    return hashlib.sha256(f"{rule_hash}:{test_hash}:{server_url}".encode('utf-8')).hexdigest()
+
+
+def load_test_cache() -> typing.Set[str]:
+    """
+    Load the keys of the tests that passed during previous runs
+    :return: the keys of the tests that passed
+    """
+    try:
+        with open(get_cache_file(TEST_CACHE_FILENAME), "r") as cache_file:
+            return set(json.load(cache_file))
+    except (FileNotFoundError, ValueError, TypeError):
+        return set()
+
+
+def save_test_cache(keys: typing.Set[str]):
+    """
+    Save the keys of the tests that passed
+    :param keys: the keys of the tests that passed
+    :return:
+    """
+    with open(get_cache_file(TEST_CACHE_FILENAME), "w") as cache_file:
+        json.dump(sorted(keys), cache_file)
+
+
+def run_test(rule_object: RosieRule, rule: dict, test: dict, server_url: str) -> RuleTestResult:
+    """
+    Execute a test of a rule on the Rosie server
+    :param rule_object: the rule to send to Rosie
+    :param rule: the rule from the GraphQL API
+    :param test: the test to execute
+    :param server_url: the URL of the Rosie server
+    :return: the result of the test
+    """
+    start_ts = time.time()
+    try:
+        violations = analyze_rosie(test['name'], rule['language'], "utf-8", test['content'], [rule_object],
+                                   server_url, raise_errors=True)
+    except RosieAnalysisException as e:
+        return RuleTestResult(rule=rule['name'], test=test['name'], should_fail=test['shouldFail'], passed=False,
+                              duration_ms=(time.time() - start_ts) * 1000, error=str(e))
+    stop_ts = time.time()
+    return RuleTestResult(rule=rule['name'], test=test['name'], should_fail=test['shouldFail'],
+                          passed=(len(violations) > 0) == test['shouldFail'],
+                          duration_ms=(stop_ts - start_ts) * 1000)
+
+
+def run_tests(ruleset_name: str, rules: typing.List[dict], server_url: str, jobs: int,
+              passed_tests: typing.Optional[typing.Set[str]] = None) -> typing.List[RuleTestResult]:
+    """
+    Execute all the tests of all rules concurrently. The tests that already passed
+    (their keys are in passed_tests) are not executed again.
+    :param ruleset_name: the name of the ruleset
+    :param rules: the rules with their tests from the GraphQL API
+    :param server_url: the URL of the Rosie server
+    :param jobs: the number of tests executed concurrently
+    :param passed_tests: keys of the tests that passed previously, updated with the tests passing now
+                         (tests whose analysis did not complete are never added)
+    :return: the result of all tests, in the order of the rules and tests
+    """
+    results: typing.List[typing.Union[RuleTestResult, Future]] = []
+    keys: typing.List[typing.Optional[str]] = []
+    with ThreadPoolExecutor(jobs) as executor:
+        for rule in rules:
+            rule_object = build_rosie_rule(ruleset_name, rule)
+            for test in rule['tests']:
+                key = get_test_cache_key(rule_object, test, server_url)
+                if passed_tests is not None and key in passed_tests:
+                    results.append(RuleTestResult(rule=rule['name'], test=test['name'],
+                                                  should_fail=test['shouldFail'], passed=True,
+                                                  duration_ms=0, cached=True))
+                else:
+                    results.append(executor.submit(run_test, rule_object, rule, test, server_url))
+                keys.append(key)
+
+        results = [result if isinstance(result, RuleTestResult) else result.result() for result in results]
+
+    if passed_tests is not None:
+        for key, result in zip(keys, results):
+            if result.passed and result.error is None:
+                passed_tests.add(key)
+    return results
+
+
+def write_junit_report(path: str, ruleset_name: str, results: typing.List[RuleTestResult]):
+    """
+    Write the results as a JUnit XML report, one test case per rule test.
+    :param path: the path of the report
+    :param ruleset_name: the name of the ruleset
+    :param results: the results of the tests
+    :return:
+    """
+    test_suite = ElementTree.Element("testsuite", {
+        "name": ruleset_name,
+        "tests": str(len(results)),
+        "failures": str(len([r for r in results if not r.passed and r.error is None])),
+        "errors": str(len([r for r in results if r.error is not None])),
+        "skipped": str(len([r for r in results if r.cached])),
+        "time": "{0:.3f}".format(sum(r.duration_ms for r in results) / 1000)
+    })
+    for result in results:
+        test_case = ElementTree.SubElement(test_suite, "testcase", {
+            "classname": f"{ruleset_name}.{result.rule}",
+            "name": result.test,
+            "time": "{0:.3f}".format(result.duration_ms / 1000)
+        })
+        if result.error is not None:
+            ElementTree.SubElement(test_case, "error", {"message": result.error})
+        elif not result.passed:
+            message = "should fail and has no violations" if result.should_fail \
+                else "should not fail and has violations"
+            ElementTree.SubElement(test_case, "failure", {"message": message})
+        elif result.cached:
+            ElementTree.SubElement(test_case, "skipped", {"message": "passed previously"})
+    ElementTree.ElementTree(test_suite).write(path, encoding="utf-8", xml_declaration=True)
+
+
+def write_json_report(path: str, ruleset_name: str, results: typing.List[RuleTestResult]):
+    """
+    Write the results as a JSON report
+    :param path: the path of the report
+    :param ruleset_name: the name of the ruleset
+    :param results: the results of the tests
+    :return:
+    """
+    with open(path, "w") as report_file:
+        json.dump({
+            "ruleset": ruleset_name,
+            "tests": [asdict(result) for result in results]
+        }, report_file, indent=2)
 
 
 def main(argv=None):
@@ -41,12 +232,14 @@ def main(argv=None):
 
     ruleset_name = options['-r']
     server_url_optional = options['-s']
-
+    jobs_argument = options['-j']
+    use_cache = not options['--no-cache']
+    junit_report = options['--junit']
+    json_report = options['--json']
 
     log.addHandler(logging.StreamHandler())
     log.setLevel(logging.INFO)
 
-    failed_rules = []
     try:
         if not ruleset_name:
             log.info('Please specify a ruleset name!')
@@ -55,39 +248,50 @@ def main(argv=None):
         if server_url_optional is not None:
             server_url = server_url_optional
 
-        ruleset = graphql_get_ruleset(None, ruleset_name)
+        try:
+            jobs = int(jobs_argument) if jobs_argument else DEFAULT_JOBS
+        except ValueError:
+            log.info('The number of jobs should be an integer')
+            sys.exit(1)
+
+        try:
+            ruleset = graphql_get_ruleset(None, ruleset_name, RULESET_PROFILE_FULL)
+        except RulesetFetchException as e:
+            log.error("Cannot get the ruleset: %s", e)
+            sys.exit(1)
 
         if ruleset is None:
             print("ruleset not found")
             sys.exit(1)
 
-        for rule in ruleset['rules']:
-            if rule['elementChecked'] in ELEMENT_CHECKED_TO_ENTITY_CHECKED_FOR_API:
-                element_checked = ELEMENT_CHECKED_TO_ENTITY_CHECKED_FOR_API[rule['elementChecked']]
+        passed_tests = load_test_cache() if use_cache else None
+        results = run_tests(ruleset_name, ruleset['rules'], server_url, max(jobs, 1), passed_tests)
+        if passed_tests is not None:
+            save_test_cache(passed_tests)
+
+        failed_rules = []
+        errors = 0
+        for result in results:
+            if result.passed:
+                continue
+            if result.error is not None:
+                errors += 1
+                print(f"error: {result.error}")
+            elif result.should_fail:
+                print("should fail and has no violations")
             else:
-                element_checked = None
-            rule_object = RosieRule(
-                f"{ruleset_name}/{rule['name']}",
-                rule['content'],
-                rule['language'],
-                rule['ruleType'],
-                element_checked,
-                rule['pattern']
-            )
-            rule_fail = False
-            for test in rule['tests']:
-                violations = analyze_rosie(test['name'], rule['language'], "utf-8", test['content'], [rule_object], server_url)
-                if len(violations) > 0 and not test['shouldFail']:
-                    print("should not fail and has violations")
-                    print(test['name'])
-                    rule_fail = True
-                if len(violations) == 0 and test['shouldFail']:
-                    print("should fail and has no violations")
-                    print(test['name'])
-                    rule_fail = True
-
-            if rule_fail:
-                failed_rules.append(rule['name'])
+                print("should not fail and has violations")
+            print(result.test)
+            if result.rule not in failed_rules:
+                failed_rules.append(result.rule)
+
+        log.info("%s tests executed, %s skipped (passed previously)",
+                 len([r for r in results if not r.cached]), len([r for r in results if r.cached]))
+
+        if junit_report:
+            write_junit_report(junit_report, ruleset_name, results)
+        if json_report:
+            write_json_report(json_report, ruleset_name, results)
 
         if len(failed_rules) == 0:
             print("All rules passed")
@@ -95,6 +299,9 @@ def main(argv=None):
             failed_rules_str = ",".join(failed_rules)
             print(f"Failed rules: {failed_rules_str}")
 
+        if errors:
+            print(f"{errors} tests could not be executed by the analysis server")
+            sys.exit(1)
         sys.exit(0)
     except KeyboardInterrupt:  # pragma: no cover
         log.info('Aborted')
@@ -14,21 +14,40 @@ Global options:
     --password PASSWORD      Password to checkout the target repository (optional)
     --target-branch <STR>    Target branch to analyze (optional)
     --target-revision <STR>  Target revision to analyze (optional)
+    --target-branches <STR>  Comma-separated list of target branches to compare at once (optional)
+    --targets <FILE>         YAML or JSON file with the list of targets to compare at once (optional)
 Example:
     $ codiga-compare
+    $ codiga-compare -p "MY PROJECT" --kind Github --url https://github.com/org/repo --target-branches rc-1,rc-2
+
+Targets file:
+    - branch: rc-1
+    - revision: 7644598cb436840a3961dd2b66172c18a2ff7823
+    - url: https://github.com/org/fork
+      kind: Github
+      branch: main
+
+    The url and kind of a target default to --url and --kind.
 """
 
 import os
 import json
 import logging
 import sys
-import time
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 
 import docopt
-
+import requests
+import yaml
 
 import codiga.constants as constants
-from .graphql.common import do_graphql_query
+from .exceptions.polling_timeout_exception import PollingTimeoutException
+from .graphql.common import do_graphql_query, do_graphql_queries, BATCH_MAX_SIZE
+from .graphql.constants import STATUS_DONE, STATUS_ERROR, TERMINAL_ANALYSIS_STATUSES
+from .graphql.registry import register_query
+from .utils.poller import Deadline, poll
 from .version import __version__
 
 logging.basicConfig()
@@ -36,6 +55,49 @@ logging.basicConfig()
 log = logging.getLogger('codiga')
 
 
+PROJECT_ID_QUERY = register_query("""
+    query ProjectId($name: String!) {
+        project(name: $name) {
+            id
+            name
+        }
+    }
+""")
+
+CREATE_COMPARE_ANALYSIS_MUTATION = register_query("""
+    mutation CreateCompareAnalysis($projectId: Long!, $targetKind: RepositoryKind!, $targetUrl: String!,
+                                   $targetRevision: String, $targetBranch: String) {
+      createCompareAnalysis(projectId: $projectId, targetKind: $targetKind, targetUrl: $targetUrl,
+                            targetRevision: $targetRevision, targetBranch: $targetBranch){
+        id
+      }
+    }
+""")
+
+GET_COMPARE_ANALYSIS_QUERY = register_query("""
+    query GetCompareAnalysis($id: Long!) {
+      analysisCompare(id: $id){
+        id
+        status
+        sourceAnalysis{
+          status
+          summary{
+            duplicates
+            violations
+          }
+        }
+        targetAnalysis{
+          status
+          summary{
+            duplicates
+            violations
+          }
+        }
+      }
+    }
+""")
+
+
 def get_project_id(api_token, project_name):
     """
     Get the project identifier from the GraphQL API
@@ -44,15 +106,7 @@ def get_project_id(api_token, project_name):
     :return: the project identifier or None is exception or non-existent project.
     """
     try:
-        query = """
-        {
-            project (name: \"""" + project_name + """\") {
-                id
-                name
-            }
-        }
-        """
-        response_json = do_graphql_query(api_token, {"query": query})
+        response_json = do_graphql_query(api_token, PROJECT_ID_QUERY.payload({"name": project_name}))
         return response_json["project"]["id"]
     except KeyError:
         log.error("Error while getting project identifier")
@@ -71,92 +125,106 @@ def start_compare_analysis(api_token, project_id, kind, url, username, password,
     :return: the project identifier or None is exception or non-existent project.
     """
     try:
-        args = []
-        args.append("projectId: " + str(project_id))
-        args.append("targetKind: " + kind)
-        args.append("targetUrl: \"" + url + "\"")
+        payload = CREATE_COMPARE_ANALYSIS_MUTATION.payload({
+            "projectId": project_id,
+            "targetKind": kind,
+            "targetUrl": url,
+            "targetRevision": target_revision if target_revision else None,
+            "targetBranch": target_branch if target_branch else None
+        })
+        response_json = do_graphql_query(api_token, payload)
+        return response_json["createCompareAnalysis"]["id"]
+    except (KeyError, TypeError):
+        # TypeError: no response, the query failed
+        log.error("Error while starting new analysis")
+        return None
+    except ValueError as e:
+        log.error("Cannot start the analysis for %s: %s", url, e)
+        return None
+    except requests.RequestException as e:
+        log.error("Error while starting new analysis: %s", e)
+        return None
 
-        if target_revision:
-            args.append("targetRevision: \"" + target_revision + "\"")
 
-        if target_branch:
-            args.append("targetBranch: \"" + target_branch + "\"")
+def is_compare_analysis_complete(compare_analysis):
+    """
+    Check if a compare analysis and both its source and target analyses are done.
+    :param compare_analysis: the compare analysis returned by get_compare_analysis
+    :return: True if the compare analysis is complete
+    """
+    if not compare_analysis:
+        log.info("Did not find compare analysis object")
+        return False
 
-        args_string = ",".join(args)
+    if not compare_analysis['status'].upper() in [STATUS_DONE.upper(), STATUS_ERROR.upper()]:
+        log.debug("compare analysis in status %s", compare_analysis['status'])
+        return False
 
-        query = """
-            mutation { createCompareAnalysis(""" + args_string + """){id}}
-        """
+    if not compare_analysis['sourceAnalysis']:
+        log.info("no source analysis")
+        return False
 
-        response_json = do_graphql_query(api_token, {"query": query})
-        return response_json["createCompareAnalysis"]["id"]
-    except KeyError:
-        log.error("Error while starting new analysis")
-        return None
+    if not compare_analysis['targetAnalysis']:
+        log.info("no target analysis")
+        return False
+
+    source_status = compare_analysis['sourceAnalysis']['status']
+    target_status = compare_analysis['targetAnalysis']['status']
 
+    if source_status.upper() not in TERMINAL_ANALYSIS_STATUSES or target_status.upper() not in TERMINAL_ANALYSIS_STATUSES:
+        log.error("source analysis or target analysis are not done successfully. source status = %s, "
+                  "target status = %s", source_status, target_status)
+        return False
+    return True
 
-def poll_compare_analysis(api_token, compare_analysis_id, timeout):
+
+def poll_compare_analysis(api_token, compare_analysis_id, deadline):
     """
     Poll the compare analysis, get the results and return a value depending on the results.
     :param api_token: access token to poll the API
     :param compare_analysis_id: the identifier of the analysis to poll
-    :param timeout: how long do we wait/poll before returning any issue?
+    :param deadline: the Deadline of the command, we stop polling when it expires
     :return: the return code depending on the results or some processing error
     """
-    deadline_sec = time.time() + int(timeout)
-    while True:
-        time.sleep(5)
-
-        if deadline_sec < time.time():
-            log.error("Timeout expired")
-            sys.exit(1)
-
-        compare_analysis = get_compare_analysis(api_token, compare_analysis_id)
-
-        if not compare_analysis:
-            log.info("Did not find compare analysis object")
-            continue
-
-        if not compare_analysis['status'].upper() in ["DONE", "ERROR"]:
-            log.debug("compare analysis in status %s", compare_analysis['status'])
-            continue
-
-        if not compare_analysis['sourceAnalysis']:
-            log.info("no source analysis")
-            continue
+    try:
+        compare_analysis = poll(lambda: get_compare_analysis(api_token, compare_analysis_id),
+                                is_compare_analysis_complete, deadline,
+                                max_requests=constants.MAX_POLLING_REQUESTS)
+    except PollingTimeoutException:
+        log.error("Timeout expired")
+        sys.exit(1)
 
-        if not compare_analysis['targetAnalysis']:
-            log.info("no target analysis")
-            continue
+    code, _, _ = get_compare_result(compare_analysis)
+    if code == 0 or code >= 5:
+        print(json.dumps(compare_analysis, indent=4))
+    return code
 
-        # Get source and target analysis objects
-        source_analysis = compare_analysis['sourceAnalysis']
-        target_analysis = compare_analysis['targetAnalysis']
 
-        source_status = source_analysis['status']
-        target_status = target_analysis['status']
+def get_compare_result(compare_analysis):
+    """
+    Get the result of a complete compare analysis.
+    :param compare_analysis: the compare analysis
+    :return: the return code, the difference of violations and the difference of duplicates
+      (None for the differences when one of the analyses failed)
+    """
+    source_analysis = compare_analysis['sourceAnalysis']
+    target_analysis = compare_analysis['targetAnalysis']
 
-        if source_status.upper() not in ["DONE", "ERROR", "SAME_REVISION"] or target_status.upper() not in ["DONE", "ERROR", "SAME_REVISION"]:
-            log.error("source analysis or target analysis are not done successfully. source status = %s, "
-                      "target status = %s", source_analysis['status'], target_analysis['status'])
-            continue
+    if source_analysis['status'].upper() == STATUS_ERROR.upper():
+        log.error("source status is error")
+        return 3, None, None
+    if target_analysis['status'].upper() == STATUS_ERROR.upper():
+        log.error("target status is error")
+        return 4, None, None
 
-        if source_status.upper() == "ERROR":
-            log.error("source status is error")
-            return 3
-        elif target_status.upper() == "ERROR":
-            log.error("target status is error")
-            return 4
-        else:
-            print(json.dumps(compare_analysis, indent=4))
-            diff_violations = target_analysis['summary']['violations'] - source_analysis['summary']['violations']
-            diff_duplicates = target_analysis['summary']['violations'] - source_analysis['summary']['violations']
+    diff_violations = target_analysis['summary']['violations'] - source_analysis['summary']['violations']
+    diff_duplicates = target_analysis['summary']['duplicates'] - source_analysis['summary']['duplicates']
 
-            if diff_violations > 0:
-                return 5
-            if diff_duplicates > 0:
-                return 6
-            return 0
+    if diff_violations > 0:
+        return 5, diff_violations, diff_duplicates
+    if diff_duplicates > 0:
+        return 6, diff_violations, diff_duplicates
+    return 0, diff_violations, diff_duplicates
 
 
 def get_compare_analysis(api_token, compare_analysis_id):
@@ -168,31 +236,189 @@ def get_compare_analysis(api_token, compare_analysis_id):
     :param timeout: how long do we wait/poll before returning any issue?
     :return: the return code depending on the results or some processing error
     """
+    response_json = do_graphql_query(api_token, GET_COMPARE_ANALYSIS_QUERY.payload({"id": compare_analysis_id}))
+    return response_json['analysisCompare']
 
-    query = """
-        {
-          analysisCompare(id: """ + str(compare_analysis_id) + """){
-            id
-            status
-            sourceAnalysis{
-              status
-              summary{
-                duplicates
-                violations
-              }
-            }
-            targetAnalysis{
-              status
-              summary{
-                duplicates
-                violations
-              }
-            }
-          }
-        }
+
+# Maximum number of compare analyses created at the same time
+MAX_CONCURRENT_STARTS = 8
+
+
+@dataclass
+class CompareTarget:
+    """
+    A repository, branch or revision to compare the project with.
+    """
+    kind: str
+    url: str
+    branch: typing.Optional[str] = None
+    revision: typing.Optional[str] = None
+
+    @property
+    def name(self) -> str:
         """
-    response_json = do_graphql_query(api_token, {"query": query})
-    return response_json['analysisCompare']
+        :return: the name of the target in the report
+        """
+        return self.revision or self.branch or self.url
+
+
+def get_targets_from_branches(branches: str, kind: str, url: str) -> typing.List[CompareTarget]:
+    """
+    :param branches: comma-separated list of branches
+    :param kind: the kind of the target repository
+    :param url: the URL of the target repository
+    :return: a target for each branch
+    """
+    return [CompareTarget(kind, url, branch=branch.strip()) for branch in branches.split(",") if branch.strip()]
+
+
+def load_targets(path: str, kind: typing.Optional[str], url: typing.Optional[str]) -> typing.List[CompareTarget]:
+    """
+    Load the targets to compare from a YAML or JSON file.
+    :param path: the path of the file
+    :param kind: the kind of the targets that do not define it
+    :param url: the URL of the targets that do not define it
+    :return: the targets
+    :raise ValueError: if the file is invalid
+    """
+    with open(path, 'r', encoding='utf-8') as stream:
+        if path.endswith(".json"):
+            content = json.load(stream)
+        else:
+            content = yaml.safe_load(stream)
+
+    if isinstance(content, dict):
+        content = content.get("targets")
+    if not isinstance(content, list):
+        raise ValueError(f"no targets in {path}")
+
+    targets = []
+    for entry in content:
+        if not isinstance(entry, dict):
+            raise ValueError(f"invalid target {entry}")
+        target = CompareTarget(kind=entry.get("kind", kind), url=entry.get("url", url),
+                               branch=entry.get("branch"), revision=entry.get("revision"))
+        if not target.kind or not target.url:
+            raise ValueError(f"target {target.name} requires a kind and a URL")
+        if target.kind not in constants.VALID_SCM_KINDS:
+            raise ValueError(f"invalid kind {target.kind}")
+        targets.append(target)
+    return targets
+
+
+def start_compare_analyses(api_token, project_id, targets: typing.List[CompareTarget], username, password) \
+        -> typing.List[typing.Optional[int]]:
+    """
+    Start a compare analysis for each target, concurrently.
+    :param api_token: the access token to the GraphQL API
+    :param project_id: identifier of the project to use as source
+    :param targets: the targets to compare with
+    :param username: username of the target repositories
+    :param password: password of the target repositories
+    :return: the identifier of each compare analysis (None if it cannot be started), in the order of targets
+    """
+    if not targets:
+        return []
+    with ThreadPoolExecutor(max_workers=min(len(targets), MAX_CONCURRENT_STARTS)) as executor:
+        return list(executor.map(lambda target: start_compare_analysis(
+            api_token, project_id, target.kind, target.url, username, password, target.branch, target.revision),
+                                 targets))
+
+
+def get_compare_analyses(api_token, compare_analysis_ids: typing.List[int], compare_analyses: dict) -> dict:
+    """
+    Get several compare analyses, in batches of queries. Complete compare analyses are not requested again.
+    :param api_token: access token to poll the API
+    :param compare_analysis_ids: the identifiers of the compare analyses
+    :param compare_analyses: the compare analyses already fetched, updated with the new ones
+    :return: compare_analyses
+    """
+    pending = [compare_analysis_id for compare_analysis_id in compare_analysis_ids
+               if compare_analysis_id not in compare_analyses
+               or not is_compare_analysis_complete(compare_analyses[compare_analysis_id])]
+    for start in range(0, len(pending), BATCH_MAX_SIZE):
+        batch = pending[start:start + BATCH_MAX_SIZE]
+        results = do_graphql_queries(api_token, [(GET_COMPARE_ANALYSIS_QUERY, {"id": compare_analysis_id})
+                                                 for compare_analysis_id in batch])
+        for compare_analysis_id, data in zip(batch, results):
+            if data and data.get('analysisCompare'):
+                compare_analyses[compare_analysis_id] = data['analysisCompare']
+    return compare_analyses
+
+
+def poll_compare_analyses(api_token, compare_analysis_ids: typing.List[int], deadline: Deadline) -> dict:
+    """
+    Poll several compare analyses together until they are all complete or the deadline expires.
+    :param api_token: access token to poll the API
+    :param compare_analysis_ids: the identifiers of the compare analyses
+    :param deadline: when to stop polling
+    :return: the last version of each compare analysis, by identifier
+    """
+    compare_analyses = {}
+    try:
+        poll(lambda: get_compare_analyses(api_token, compare_analysis_ids, compare_analyses),
+             lambda result: all(is_compare_analysis_complete(result.get(compare_analysis_id))
+                                for compare_analysis_id in compare_analysis_ids),
+             deadline, max_requests=constants.MAX_POLLING_REQUESTS)
+    except PollingTimeoutException:
+        log.error("Timeout expired")
+    return compare_analyses
+
+
+def compare_targets(api_token, project_id, targets: typing.List[CompareTarget], username, password,
+                    deadline: Deadline) -> typing.List[dict]:
+    """
+    Compare the project with all the targets at once.
+    :param api_token: the access token to the GraphQL API
+    :param project_id: identifier of the project to use as source
+    :param targets: the targets to compare with
+    :param username: username of the target repositories
+    :param password: password of the target repositories
+    :param deadline: when to stop waiting for the compare analyses
+    :return: the result of each target, in the order of targets
+    """
+    compare_analysis_ids = start_compare_analyses(api_token, project_id, targets, username, password)
+    compare_analyses = poll_compare_analyses(api_token, [compare_analysis_id for compare_analysis_id
+                                                         in compare_analysis_ids if compare_analysis_id], deadline)
+
+    results = []
+    for target, compare_analysis_id in zip(targets, compare_analysis_ids):
+        result = {"target": target.name, "id": compare_analysis_id, "status": None, "code": 1,
+                  "violations": None, "duplicates": None}
+        compare_analysis = compare_analyses.get(compare_analysis_id) if compare_analysis_id else None
+        if compare_analysis_id is None:
+            result["status"] = "NOT_STARTED"
+        elif not is_compare_analysis_complete(compare_analysis):
+            result["status"] = "TIMEOUT"
+        else:
+            result["status"] = compare_analysis['status']
+            result["code"], result["violations"], result["duplicates"] = get_compare_result(compare_analysis)
+        results.append(result)
+    return results
+
+
+def format_delta(value: typing.Optional[int]) -> str:
+    """
+    :param value: a difference between the target and the source
+    :return: the difference with its sign, - if unknown
+    """
+    if value is None:
+        return "-"
+    return f"{value:+d}"
+
+
+def format_compare_table(results: typing.List[dict]) -> str:
+    """
+    Format the results of compare_targets as a table.
+    :param results: the results of each target
+    :return: the table
+    """
+    header = ("TARGET", "STATUS", "VIOLATIONS", "DUPLICATES")
+    rows = [(result["target"], result["status"], format_delta(result["violations"]),
+             format_delta(result["duplicates"])) for result in results]
+    widths = [max(len(row[index]) for row in [header] + rows) for index in range(len(header))]
+    return "\n".join("  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip()
+                     for row in [header] + rows)
 
 
 def main(argv=None):
@@ -204,7 +430,10 @@ def main(argv=None):
     options = docopt.docopt(__doc__, argv=argv, version=__version__)
 
     level = logging.DEBUG if options['--verbose'] else logging.INFO
-    timeout = options['-t'] if options['-t'] else constants.DEFAULT_TIMEOUT
+    try:
+        timeout = int(options['-t']) if options['-t'] else constants.DEFAULT_TIMEOUT
+    except ValueError:
+        timeout = constants.DEFAULT_TIMEOUT
     project_name = options['-p']
     url = options['--url']
     kind = options['--kind']
@@ -212,10 +441,15 @@ def main(argv=None):
     password = options['--password']
     target_branch = options['--target-branch']
     target_revision = options['--target-revision']
+    target_branches = options['--target-branches']
+    targets_file = options['--targets']
 
     log.addHandler(logging.StreamHandler())
     log.setLevel(level)
 
+    # the timeout covers the whole command, not only the polling
+    deadline = Deadline(timeout)
+
     try:
         api_token = os.environ.get(constants.API_TOKEN_ENVIRONMENT_VARIABLE)
 
@@ -231,7 +465,7 @@ def main(argv=None):
             log.info('Kind not defined!')
             sys.exit(1)
 
-        if not url:
+        if not url and not targets_file:
             log.info('URL not defined!')
             sys.exit(1)
 
@@ -239,19 +473,36 @@ def main(argv=None):
             log.info("Invalid kind")
             sys.exit(1)
 
+        targets = []
+        if targets_file:
+            try:
+                targets.extend(load_targets(targets_file, kind, url))
+            except (OSError, ValueError, yaml.YAMLError) as e:
+                log.error("Cannot load targets %s: %s", targets_file, e)
+                sys.exit(1)
+        if target_branches:
+            targets.extend(get_targets_from_branches(target_branches, kind, url))
+
         project_id = get_project_id(api_token, project_name)
 
         if not project_id:
             log.error("Cannot get information about your project, exiting")
             sys.exit(2)
 
+        if targets:
+            results = compare_targets(api_token, project_id, targets, username, password, deadline)
+            print(format_compare_table(results))
+            ret = max(result["code"] for result in results)
+            log.debug("done, returning %s", ret)
+            sys.exit(ret)
+
         compare_analysis_id = start_compare_analysis(api_token, project_id,
                                                      kind, url, username, password, target_branch, target_revision)
         if not compare_analysis_id:
             log.error("Cannot start a new comparison, exiting")
             sys.exit(3)
 
-        ret = poll_compare_analysis(api_token, compare_analysis_id, timeout)
+        ret = poll_compare_analysis(api_token, compare_analysis_id, deadline)
         log.debug("done, returning %s", ret)
         sys.exit(ret)
     except KeyboardInterrupt:  # pragma: no cover
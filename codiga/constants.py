@@ -1,3 +1,5 @@
+from urllib3.util import make_headers
+
 from .version import __version__
 
 GRAPHQL_ENDPOINT_PROD_URL = 'https://api.codiga.io/graphql'
@@ -12,4 +14,18 @@ API_TOKEN_ENVIRONMENT_VARIABLE = "CODIGA_API_TOKEN"
 
 API_TOKEN_HEADER = "X-Api-Token"
 USER_AGENT_HEADER = "User-Agent"
-USER_AGENT_CLI = f"Cli/{__version__}"
\ No newline at end of file
+USER_AGENT_CLI = f"Cli/{__version__}"
+# Compressions we can decode (brotli is added when installed, e.g. with pip install codiga[fast])
+ACCEPT_ENCODING_HEADER = "Accept-Encoding"
+ACCEPT_ENCODING = make_headers(accept_encoding=True)["accept-encoding"]
+
+# Set to 0 to always send the full text of GraphQL queries
+PERSISTED_QUERIES_ENVIRONMENT_VARIABLE = "CODIGA_PERSISTED_QUERIES"
+
+# Set to 0 to send uncompressed requests to Rosie
+ROSIE_COMPRESSION_ENVIRONMENT_VARIABLE = "CODIGA_ROSIE_COMPRESSION"
+# Set to 0 to always send the content of the rules to Rosie
+ROSIE_RULES_BY_REFERENCE_ENVIRONMENT_VARIABLE = "CODIGA_ROSIE_RULES_BY_REFERENCE"
+
+# Maximum number of requests to poll an analysis
+MAX_POLLING_REQUESTS = 200
@@ -0,0 +1,6 @@
+class CircuitOpenException(Exception):
+    """
+    Raised without sending the request when the endpoint failed too many
+    times in a row and is considered down.
+    """
+    pass
@@ -0,0 +1,6 @@
+class CookbookFetchException(Exception):
+    """
+    Raised when the recipes of a cookbook cannot all be fetched, so that a partial
+    list of recipes is never used as the content of the cookbook.
+    """
+    pass
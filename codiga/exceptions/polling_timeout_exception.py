@@ -0,0 +1,6 @@
+class PollingTimeoutException(Exception):
+    """
+    Raised when an object polled on the API is not complete before the deadline
+    or the maximum number of requests.
+    """
+    pass
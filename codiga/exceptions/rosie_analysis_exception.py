@@ -0,0 +1,6 @@
+class RosieAnalysisException(Exception):
+    """
+    Raised when the analysis by Rosie did not complete (timeout, connection error,
+    error status or invalid response), so that it is not mistaken for no violation.
+    """
+    pass
@@ -0,0 +1,6 @@
+class RulesetFetchException(Exception):
+    """
+    Raised when a page of a ruleset cannot be fetched, so that an incomplete
+    ruleset is never used as if it were complete.
+    """
+    pass
@@ -0,0 +1,5 @@
+class SubscriptionException(Exception):
+    """
+    Raised when a GraphQL subscription fails or ends before we get the expected data.
+    """
+    pass
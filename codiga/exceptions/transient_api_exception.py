@@ -0,0 +1,9 @@
+class TransientApiException(Exception):
+    """
+    Raised when the API returns a status that may succeed if the request is sent
+    again (too many requests or server unavailable).
+    """
+    def __init__(self, status_code, retry_after_secs=None):
+        super().__init__(f"API returned status {status_code}")
+        self.status_code = status_code
+        self.retry_after_secs = retry_after_secs
@@ -0,0 +1,5 @@
+class WebSocketException(Exception):
+    """
+    Raised when the WebSocket handshake fails or when the connection is closed.
+    """
+    pass
@@ -5,22 +5,27 @@ Usage:
 
 Global options:
     -r RULESET               Name of the rulesets (e.g. python-security,python-best-practices)
-    -f FILE                  File to store the ruleset
+    -f FILE                  File to store the ruleset (compressed with gzip if the name ends with .gz)
+    -j JOBS                  Number of pages of rules fetched concurrently (default 8)
+    --gzip                   Compress the file with gzip
+    --incremental            Do not rewrite the file if no rule changed since the last export
 Example:
     $ codiga-export-ruleset -r "python-security" -f rules.json
 """
 
+import gzip
+import hashlib
 import os
 import json
 import logging
 import sys
-import time
+import typing
 
 import docopt
 
-from .constants import DEFAULT_TIMEOUT, API_TOKEN_ENVIRONMENT_VARIABLE
-from .graphql.common import do_graphql_query
-from .graphql.rosie import graphql_get_rulesets, graphql_get_ruleset
+from .constants import API_TOKEN_ENVIRONMENT_VARIABLE
+from .exceptions.ruleset_fetch_exception import RulesetFetchException
+from .graphql.rosie import graphql_iter_rulesets, RULESET_PROFILE_RUNTIME
 from .rosie.ruleset import element_checked_api_to_json
 from .version import __version__
 
@@ -28,6 +33,108 @@ logging.basicConfig()
 
 log = logging.getLogger('codiga')
 
+DEFAULT_JOBS = 8
+
+
+def convert_rule_for_export(ruleset_name: str, rule: dict) -> dict:
+    """
+    Convert a rule from the GraphQL API into the format of the export file
+    :param ruleset_name: the name of the ruleset
+    :param rule: the rule from the GraphQL API
+    :return: the rule to write in the export file
+    """
+    return {
+        "name": f"{ruleset_name}/{rule['name']}",
+        "code": rule['content'],
+        "language": rule['language'].upper(),
+        "pattern": rule['pattern'],
+        "ruleType": "AST_CHECK" if rule['ruleType'].lower() == "ast" else "PATTERN",
+        "entityChecked": element_checked_api_to_json(rule['elementChecked'])
+    }
+
+
+def get_rule_hash(rule: dict) -> str:
+    """
+    :param rule: a rule in the format of the export file
+    :return: the hash of the content of the rule
+    """
+    return hashlib.sha256(json.dumps(rule, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def open_export_file(path: str, mode: str, compress: bool):
+    """
+    Open an export file, compressed or not.
+    :param path: the path of the file
+    :param mode: the mode to open the file ("r" or "w")
+    :param compress: True if the file is compressed with gzip
+    :return: the file object
+    """
+    if compress:
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def load_export_hashes(path: str, compress: bool) -> typing.Optional[typing.List[str]]:
+    """
+    Get the hash of all rules from an existing export file
+    :param path: the path of the export file
+    :param compress: True if the file is compressed with gzip
+    :return: the hash of each rule, in the order of the file, or None if the file cannot be read
+    """
+    try:
+        with open_export_file(path, "r", compress) as export_file:
+            return [get_rule_hash(rule) for rule in json.load(export_file)["rules"]]
+    except (OSError, EOFError, ValueError, KeyError, TypeError):
+        return None
+
+
+def export_rulesets(api_token: str, ruleset_names: typing.List[str], filename: str,
+                    jobs: int = DEFAULT_JOBS, compress: bool = False, incremental: bool = False) -> bool:
+    """
+    Fetch the rulesets concurrently and write their rules in a file. Rules are written page by page,
+    as soon as each page is received, in the order of the rulesets names. The file is written in a temporary
+    file first and replaces the existing file only when complete.
+
+    :param api_token: the API token to access the GraphQL API
+    :param ruleset_names: the name of the rulesets to export
+    :param filename: the file to write
+    :param jobs: the number of pages of rules fetched concurrently
+    :param compress: True to compress the file with gzip
+    :param incremental: True to keep the existing file if no rule changed
+    :return: True if the file has been written, False if it was kept because no rule changed
+    """
+    previous_hashes = load_export_hashes(filename, compress) if incremental else None
+    hashes: typing.List[str] = []
+    temporary_filename = f"{filename}.{os.getpid()}.tmp"
+
+    try:
+        with open_export_file(temporary_filename, "w", compress) as outfile:
+            found_rulesets: typing.Set[str] = set()
+
+            outfile.write('{"rules": [')
+            for page in graphql_iter_rulesets(api_token, ruleset_names, RULESET_PROFILE_RUNTIME, jobs):
+                found_rulesets.add(page['name'])
+                for r in page['rules']:
+                    new_object = convert_rule_for_export(page['name'], r)
+                    if hashes:
+                        outfile.write(", ")
+                    outfile.write(json.dumps(new_object))
+                    hashes.append(get_rule_hash(new_object))
+            outfile.write(']}')
+
+        for ruleset_name in ruleset_names:
+            if ruleset_name not in found_rulesets:
+                log.warning("ruleset %s not found", ruleset_name)
+
+        if previous_hashes is not None and previous_hashes == hashes:
+            os.remove(temporary_filename)
+            return False
+        os.replace(temporary_filename, filename)
+        return True
+    except BaseException:
+        if os.path.exists(temporary_filename):
+            os.remove(temporary_filename)
+        raise
 
 
 def main(argv=None):
@@ -40,7 +147,9 @@ def main(argv=None):
 
     ruleset_names = options['-r']
     filename = options['-f']
-
+    jobs_argument = options['-j']
+    compress = options['--gzip'] or (filename is not None and filename.endswith(".gz"))
+    incremental = options['--incremental']
 
     log.addHandler(logging.StreamHandler())
     log.setLevel(logging.INFO)
@@ -52,33 +161,28 @@ def main(argv=None):
             log.info('%s environment variable not defined!', API_TOKEN_ENVIRONMENT_VARIABLE)
             sys.exit(1)
 
-
         if not ruleset_names:
             log.info('Please specify a ruleset name (or multiple separated by a comma)!')
             sys.exit(1)
-        rules = []
-        for ruleset_name in ruleset_names.split(","):
-            ruleset = graphql_get_ruleset(api_token, ruleset_name)
-            if ruleset is None:
-                continue
-
-            for r in ruleset['rules']:
-                new_object = {
-                    "name": f"{ruleset_name}/{r['name']}",
-                    "code": r['content'],
-                    "language": r['language'].upper(),
-                    "pattern": r['pattern'],
-                    "ruleType": "AST_CHECK" if r['ruleType'].lower() == "ast" else "PATTERN",
-                    "entityChecked": element_checked_api_to_json(r['elementChecked'])
-                }
-                rules.append(new_object)
-
-        with open(filename, "w") as outfile:
-            content = {
-                "rules": rules
-            }
-            outfile.write(json.dumps(content))
 
+        if not filename:
+            log.info('Please specify a file to store the rules!')
+            sys.exit(1)
+
+        try:
+            jobs = int(jobs_argument) if jobs_argument else DEFAULT_JOBS
+        except ValueError:
+            log.info('The number of jobs should be an integer')
+            sys.exit(1)
+
+        try:
+            written = export_rulesets(api_token, ruleset_names.split(","), filename, max(jobs, 1), compress,
+                                      incremental)
+        except RulesetFetchException as e:
+            log.error("Cannot export the rulesets, %s is unchanged: %s", filename, e)
+            sys.exit(1)
+        if not written:
+            log.info("No rule changed, keeping %s", filename)
 
         sys.exit(0)
     except KeyboardInterrupt:  # pragma: no cover
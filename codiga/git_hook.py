@@ -11,6 +11,13 @@ Global options:
     --remote-sha <string>                   The remote SHA. If new branch, the script passes automatically
     --local-sha <string>                    The local SHA being pushed
     --max-timeout-sec <timeout>             Maximum time to wait before the analysis is done (in secs). Default to 60.
+    --min-severity <severity>               Only use rules reporting at least this severity (overrides min-severity in codiga.yml)
+    --categories <categories>               Only use rules reporting these categories (overrides categories in codiga.yml)
+    --rule-time-budget-ms <ms>              Exclude the rules that consistently take more than this time to execute (in ms)
+    --rule-stats                            Record the execution time of each rule (always enabled with --rule-time-budget-ms)
+    --fail-fast                             Stop the analysis as soon as a violation blocks the push
+    --fail-fast-severity <severity>         Minimum severity blocking the push in fail-fast mode (INFORMATIONAL, WARNING, ERROR, CRITICAL). Default to any severity.
+    --fail-fast-categories <categories>     Categories blocking the push in fail-fast mode (example: security,error_prone). Default to all categories.
 
 Example:
     $ codiga-git-hook --local-sha <sha1> --remote-sha <sha2>
@@ -19,25 +26,30 @@ Note:
     Make sure your API keys are defined using CODIGA_API_TOKEN
 """
 import typing
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
 import os
 import logging
 import sys
 import base64
-from threading import Thread
+import threading
 import time
-from time import sleep
-from typing import List, Dict, Set
+from typing import List, Dict, Set, Callable, Optional
 
 from unidiff import PatchSet
 import docopt
 
 from .constants import BLANK_SHA, API_TOKEN_ENVIRONMENT_VARIABLE
-from .graphql.rosie import graphql_get_rulesets
-from .model.rosie_rule import RosieRule, convert_rules_to_rosie_rules
+from .exceptions.ruleset_fetch_exception import RulesetFetchException
+from .graphql.rosie import graphql_iter_rulesets, RULESET_PROFILE_RUNTIME
+from .model.rosie_rule import RosieRule, convert_rules_to_rosie_rules, filter_rosie_rules
 from .model.violation import Violation
-from .rosie.api import analyze_rosie
-from .rosie.ruleset import get_rulesets_from_codigafile
+from .model.violation_filter import ViolationFilter
+from .rosie.api import analyze_rosie, ROSIE_TIMEOUT_SECS
+from .rosie.lockfile import LOCKFILE_NAME, RulesetLock
+from .rosie.prefilter import select_rules, apply_rule_tokens
+from .rosie.telemetry import RuleStats
+from .rosie.ruleset import get_rulesets_from_codigafile, get_rule_filter_from_codigafile, \
+    get_rule_tokens_from_codigafile
 from .utils.file_utils import associate_files_with_language
 from .utils.git import get_git_binary, get_diff, find_closest_sha, get_root_directory
 from .utils.patch_utils import get_added_or_modified_lines
@@ -48,24 +60,45 @@ logging.basicConfig()
 
 log: logging.Logger = logging.getLogger('codiga')
 
+# Minimum timeout of a request to Rosie, even when the deadline of the hook is close
+MIN_ROSIE_TIMEOUT_SECS = 1
 
-def analyze_file(rosie_rules: typing.List[RosieRule], filename: str, language: str) -> List[Violation]:
+
+def analyze_file(rosie_rules: typing.List[RosieRule], filename: str, language: str,
+                 rule_stats: Optional[RuleStats] = None, deadline: Optional[float] = None,
+                 stopped: Optional[threading.Event] = None) -> List[Violation]:
     """
     Analyze a file using a GraphQL query
     :param rosie_rules: rules to use
     :param language: language of the file
     :param filename: the name of the filename
+    :param rule_stats: if defined, record the execution of each rule
+    :param deadline: if defined, the time after which the request to Rosie times out
+    :param stopped: if defined and set, the file is not sent
     :return: the list of violations found
     """
 
     violations: List[Violation] = []
 
+    if stopped is not None and stopped.is_set():
+        return violations
+    timeout = ROSIE_TIMEOUT_SECS
+    if deadline is not None:
+        timeout = max(min(timeout, deadline - time.time()), MIN_ROSIE_TIMEOUT_SECS)
+
     # Read the file being pushed/sent
     try:
         with open(filename, "r") as file:
             code: str = file.read()
+            # rules that cannot match are not sent, nor the file if no rule is left
+            file_rules = select_rules(rosie_rules, code)
+            if not file_rules:
+                return violations
             code_base64 = base64.b64encode(code.encode('utf-8')).decode('utf-8')
-            res = analyze_rosie(filename, language, "utf-8", code_base64, rosie_rules)
+            if stopped is not None and stopped.is_set():
+                return violations
+            res = analyze_rosie(filename, language, "utf-8", code_base64, file_rules,
+                                rule_stats=rule_stats, timeout=timeout)
             violations.extend(res)
     except FileNotFoundError:
         logging.error("Cannot open file %s", filename)
@@ -75,41 +108,65 @@ def analyze_file(rosie_rules: typing.List[RosieRule], filename: str, language: s
 
 def analyze_files(files_with_language: Dict[str, str],
                   rosie_rules: typing.List[RosieRule],
-                  max_timeout_secs: int) -> Dict[str, List[Violation]]:
+                  max_timeout_secs: int,
+                  stop_condition: Optional[Callable[[str, List[Violation]], bool]] = None,
+                  rule_stats: Optional[RuleStats] = None) -> Dict[str, List[Violation]]:
     """
     Analyze all files and return the list of violations for all of them. In order
     to speed up analysis, use a thread pool to launch multiple analysis.
 
+    If a stop condition is given, it is called each time the analysis of a file completes. When
+    it returns True, the files not sent yet are not analyzed and the function returns the results
+    collected so far. Requests already sent to Rosie are not interrupted: they complete in the
+    background, within the timeout of the analysis.
+
     :param files_with_language: Dictionary with the files and their languages
     :param rosie_rules: list of rules to use
     :param max_timeout_secs: how long before the analysis fails (in seconds)
+    :param stop_condition: function called with the filename and its violations, stops the analysis when returning True
+    :param rule_stats: if defined, record the execution of each rule
     :return: dictionary with the file name as key and list of violations as a result
     """
-    threads: Dict[str, Thread] = {}
     result: Dict[str, List[Violation]] = {}
     executor = ThreadPoolExecutor(4)
-    files_to_analyze = files_with_language.keys()
     deadline = time.time() + max_timeout_secs
+    stopped = threading.Event()
 
     # Submit all threads to be executed.
-    for filename in files_to_analyze:
-        thread = executor.submit(analyze_file, rosie_rules, filename, files_with_language[filename])
-        threads[filename] = thread
-
-    # Wait for threads completion
-    for filename in threads:
-        while not threads[filename].done():
-            sleep(0.5)
-
-        # If we reach the deadline, just cancel the threads and raise a timeout error.
-        if time.time() > deadline:
-            for thread in threads.values():
-                thread.cancel()
-                raise TimeoutError("max execution time reached")
+    futures: Dict[Future, str] = {}
+    for filename in files_with_language.keys():
+        future = executor.submit(analyze_file, rosie_rules, filename, files_with_language[filename], rule_stats,
+                                 deadline, stopped)
+        futures[future] = filename
+
+    # Wait for threads completion, processing the results as soon as they are available.
+    pending = set(futures.keys())
+    try:
+        while pending:
+            remaining_secs = deadline - time.time()
 
-        result[filename] = threads[filename].result()
+            # If we reach the deadline, the remaining threads are cancelled and we raise a timeout error.
+            if remaining_secs <= 0:
+                raise TimeoutError("max execution time reached")
 
-    return result
+            done, pending = wait(pending, timeout=remaining_secs, return_when=FIRST_COMPLETED)
+            for future in done:
+                filename = futures[future]
+                result[filename] = future.result()
+                if stop_condition is not None and stop_condition(filename, result[filename]):
+                    log.info("stopping the analysis, %s files not analyzed", len(pending))
+                    pending = set()
+                    break
+    finally:
+        # Cancel all threads not started yet and do not send the files of the threads already
+        # started. Requests already sent are not interrupted.
+        stopped.set()
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+    # Keep the results in the same order than the files to analyze
+    return {filename: result[filename] for filename in files_with_language.keys() if filename in result}
 
 
 def print_violations(files_with_violations: Dict[str, List[Violation]]):
@@ -124,12 +181,48 @@ def print_violations(files_with_violations: Dict[str, List[Violation]]):
             print("{0}:{1} {2}".format(filename, violation.line, violation.description), file=sys.stderr)
 
 
-def check_push(local_sha: str, remote_sha: str, max_timeout_secs: int):
+def load_rosie_rules(api_token: str, lockfile_path: str, rulesets: List[str],
+                     rule_filter: Optional[ViolationFilter], languages: Set[str]) -> List[RosieRule]:
+    """
+    Load the rules to use. When the lock file exists and was generated for the same rulesets,
+    the rules are loaded from it (only for the given languages). Otherwise, rules are fetched
+    from the GraphQL API.
+    :param api_token: the API token to access the GraphQL API
+    :param lockfile_path: the path of the codiga.lock file
+    :param rulesets: the rulesets from codiga.yml
+    :param rule_filter: the filter on the severity and category of the rules
+    :param languages: the languages of the files to analyze
+    :return: the rules to use
+    """
+    if os.path.isfile(lockfile_path):
+        try:
+            with RulesetLock(lockfile_path) as lock:
+                if lock.rulesets == rulesets:
+                    log.info("loading rules from %s", lockfile_path)
+                    return filter_rosie_rules(lock.get_rules(languages), rule_filter)
+                log.warning("%s was not generated for the rulesets of codiga.yml, ignoring it", lockfile_path)
+        except (OSError, ValueError, KeyError) as e:
+            log.warning("cannot read %s (%s), ignoring it", lockfile_path, e)
+
+    # Rules are converted page by page, as soon as each page is received.
+    return convert_rules_to_rosie_rules(graphql_iter_rulesets(api_token, rulesets, RULESET_PROFILE_RUNTIME),
+                                        rule_filter)
+
+
+def check_push(local_sha: str, remote_sha: str, max_timeout_secs: int,
+               fail_fast_filter: Optional[ViolationFilter] = None,
+               rule_filter: Optional[ViolationFilter] = None,
+               rule_time_budget_ms: Optional[int] = None,
+               collect_rule_stats: bool = False):
     """
     Check the current push.
     :param local_sha:
     :param remote_sha:
     :param max_timeout_secs:
+    :param fail_fast_filter: if defined, stop the analysis at the first violation in the diff matching this filter
+    :param rule_filter: minimum severity and categories of the rules to use, overrides the values from codiga.yml
+    :param rule_time_budget_ms: if defined, exclude the rules consistently taking more time than this budget
+    :param collect_rule_stats: record the execution time of each rule, enabled when rule_time_budget_ms is defined
     :return:
     """
     api_token: str = os.environ.get(API_TOKEN_ENVIRONMENT_VARIABLE)
@@ -167,10 +260,24 @@ def check_push(local_sha: str, remote_sha: str, max_timeout_secs: int):
 
     log.info("using the following rulesets %s", rulesets)
 
-    rules = graphql_get_rulesets(api_token, rulesets)
-    rosie_rules: typing.List[RosieRule] = convert_rules_to_rosie_rules(rules)
+    # Values passed on the command line take precedence over the ones from codiga.yml
+    try:
+        codigafile_rule_filter = get_rule_filter_from_codigafile(ruleset_files)
+    except ValueError as e:
+        log.error("invalid codiga.yml file: %s", e)
+        sys.exit(2)
+    if rule_filter is None:
+        rule_filter = codigafile_rule_filter
+    else:
+        rule_filter = ViolationFilter(
+            min_severity=rule_filter.min_severity or codigafile_rule_filter.min_severity,
+            categories=rule_filter.categories or codigafile_rule_filter.categories)
 
-    log.info("found %s rules", len(rosie_rules))
+    try:
+        rule_tokens = get_rule_tokens_from_codigafile(ruleset_files)
+    except ValueError as e:
+        log.error("invalid codiga.yml file: %s", e)
+        sys.exit(2)
 
     patch_set = PatchSet(diff_content)
     added_lines: Dict[str, Set[int]] = get_added_or_modified_lines(patch_set)
@@ -187,8 +294,53 @@ def check_push(local_sha: str, remote_sha: str, max_timeout_secs: int):
     else:
         print("No file to analyze")
 
+    lockfile_path = f"{root_directory.strip()}/{LOCKFILE_NAME}"
+    try:
+        rosie_rules: typing.List[RosieRule] = load_rosie_rules(api_token, lockfile_path, rulesets, rule_filter,
+                                                               set(files_with_languages.values()))
+    except RulesetFetchException as e:
+        log.error("Cannot get the rules of the rulesets: %s", e)
+        sys.exit(1)
+
+    # Statistics about the rules executions are kept across runs to find the slowest rules, only when requested.
+    rule_stats: Optional[RuleStats] = None
+    if collect_rule_stats or rule_time_budget_ms is not None:
+        rule_stats = RuleStats.load()
+    if rule_stats is not None and rule_time_budget_ms is not None:
+        slow_rules = rule_stats.select_rules_to_exclude(rule_time_budget_ms)
+        if slow_rules:
+            log.info("excluding %s rules over the time budget of %sms: %s", len(slow_rules), rule_time_budget_ms,
+                     ",".join(sorted(slow_rules)))
+            rosie_rules = [rule for rule in rosie_rules if rule.id not in slow_rules]
+
+    # Rules are only sent for the files containing one of their tokens
+    rosie_rules = apply_rule_tokens(rosie_rules, rule_tokens)
+
+    log.info("found %s rules", len(rosie_rules))
+
+    # In fail-fast mode, stop as soon as a file has a violation in the diff that blocks the push.
+    stop_condition = None
+    blocking_files: List[str] = []
+    if fail_fast_filter is not None:
+        def stop_condition(filename: str, violations: List[Violation]) -> bool:
+            violations_in_diff = filter_violations_for_diff(violations, added_lines.get(filename, []))
+            if any(fail_fast_filter.matches(v.severity, v.category) for v in violations_in_diff):
+                blocking_files.append(filename)
+                return True
+            return False
+
     # First, analyze each file and get the list of violations.
-    files_with_violations: Dict[str, List[Violation]] = analyze_files(files_with_languages, rosie_rules, max_timeout_secs)
+    files_with_violations: Dict[str, List[Violation]] = analyze_files(files_with_languages, rosie_rules,
+                                                                      max_timeout_secs, stop_condition, rule_stats)
+    if rule_stats is not None:
+        try:
+            rule_stats.save()
+        except OSError:
+            log.warning("cannot save the rule statistics")
+
+    if blocking_files:
+        print("Fail-fast: analysis stopped after {0} of {1} files".format(len(files_with_violations),
+                                                                          len(files_with_languages)), file=sys.stderr)
 
     # Finally, filter the violations with the information with the diff. Only show the violations that have been
     # added in the diff being pushed.
@@ -221,6 +373,13 @@ def main(argv=None):
     remote_sha: str = options['--remote-sha']
     local_sha: str = options['--local-sha']
     max_timeout_sec: str = options['--max-timeout-sec']
+    min_severity: str = options['--min-severity']
+    categories: str = options['--categories']
+    rule_time_budget_ms: str = options['--rule-time-budget-ms']
+    collect_rule_stats: bool = options['--rule-stats']
+    fail_fast: bool = options['--fail-fast']
+    fail_fast_severity: str = options['--fail-fast-severity']
+    fail_fast_categories: str = options['--fail-fast-categories']
     api_token: str = os.environ.get(API_TOKEN_ENVIRONMENT_VARIABLE)
 
     if not api_token:
@@ -251,11 +410,37 @@ def main(argv=None):
             print("timeout value should be an integer", file=sys.stderr)
             sys.exit(2)
 
+    try:
+        rule_filter: ViolationFilter = ViolationFilter.from_options(min_severity, categories)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        sys.exit(2)
+
+    rule_time_budget_ms_int: Optional[int] = None
+    if rule_time_budget_ms:
+        try:
+            rule_time_budget_ms_int = int(rule_time_budget_ms)
+        except ValueError:
+            print("rule time budget should be an integer", file=sys.stderr)
+            sys.exit(2)
+
+    fail_fast_filter: Optional[ViolationFilter] = None
+    if fail_fast or fail_fast_severity or fail_fast_categories:
+        try:
+            fail_fast_filter = ViolationFilter.from_options(fail_fast_severity, fail_fast_categories)
+        except ValueError as e:
+            print(str(e), file=sys.stderr)
+            sys.exit(2)
+
     try:
         check_push(
             local_sha=local_sha,
             remote_sha=remote_sha,
-            max_timeout_secs=max_timeout_sec_int)
+            max_timeout_secs=max_timeout_sec_int,
+            fail_fast_filter=fail_fast_filter,
+            rule_filter=rule_filter,
+            rule_time_budget_ms=rule_time_budget_ms_int,
+            collect_rule_stats=collect_rule_stats)
         sys.exit(0)
     except Exception:
         log.exception("unexpected error. Please send the trace to support@codiga.io")
@@ -18,6 +18,7 @@ Global options:
     --max-complex-functions-rate <rate>   Max rate of complex functions in the total number of functions (optional)
     --max-long-functions-rate <rate>      Max rate of long functions in the total number of functions (optional)
     --max-timeout-sec <timeout>           Maximum time to wait before the analysis is done (in secs). Default to 600.
+    --subscribe                           Be notified when the analysis completes instead of polling (optional)
 Example:
     $ codiga-github-action -p "MY SUPER PROJECT" --min-quality-score 90
 """
@@ -26,14 +27,17 @@ import os
 import json
 import logging
 import sys
-import time
 
 import docopt
 
 from codiga.common import is_grade_lower
 
 from .constants import DEFAULT_TIMEOUT, API_TOKEN_ENVIRONMENT_VARIABLE
+from .exceptions.polling_timeout_exception import PollingTimeoutException
 from .graphql.common import do_graphql_query, do_graphql_query_with_api_token
+from .graphql.registry import register_query
+from .graphql.subscription import wait_for_analysis
+from .utils.poller import Deadline
 from .version import __version__
 
 logging.basicConfig()
@@ -41,6 +45,40 @@ logging.basicConfig()
 log = logging.getLogger('codiga')
 
 
+GITHUB_ACTION_MUTATION = register_query("""
+    mutation GithubAction($projectName: String, $ref: String, $token: String!, $actor: String!,
+                          $repositoryName: String!, $sha: String) {
+      githubAction(projectName: $projectName, ref: $ref, token: $token, actor: $actor,
+                   repositoryName: $repositoryName, sha: $sha){
+        id
+      }
+    }
+""")
+
+GET_ANALYSIS_QUERY = register_query("""
+    query GetGithubActionAnalysis($id: Long!) {
+      analysis(id: $id){
+        id
+        status
+        revision
+        slocs
+        techdebt{
+          grade
+          score
+        }
+        summary{
+          duplicates
+          violations
+          duplicated_lines
+          longFunctions
+          totalFunctions
+          complexFunctions
+        }
+      }
+    }
+""")
+
+
 def start_analysis(api_token, token, actor, repository, sha, ref, project_name):
     """
     Get the project information with the latest analysis data using the project name
@@ -53,21 +91,20 @@ def start_analysis(api_token, token, actor, repository, sha, ref, project_name):
     :param project_name: name of the project
     :return: the project identifier or None is exception or non-existent project.
     """
-    args = []
+    variables = {
+        "token": token,
+        "actor": actor,
+        "repositoryName": repository
+    }
     if project_name is not None and len(project_name) > 0:
-        args.append("projectName: \"" + project_name + "\"")
+        variables["projectName"] = project_name
     if ref is not None and len(ref) > 0:
-        args.append("ref: \"" + ref + "\"")
-    args.append("token: \"" + token + "\"")
-    args.append("actor: \"" + actor + "\"")
-    args.append("repositoryName: \"" + repository + "\"")
+        variables["ref"] = ref
     if sha is not None and len(sha) > 0 and sha != "none":
-        args.append("sha: \"" + sha + "\"")
-    args_string = ",".join(args)
-    query = """mutation {githubAction(""" + args_string + """){id}}"""
+        variables["sha"] = sha
 
     log.info("starting analysis using api token")
-    response_json = do_graphql_query_with_api_token(api_token, {"query": query})
+    response_json = do_graphql_query_with_api_token(api_token, GITHUB_ACTION_MUTATION.payload(variables))
 
     if not response_json:
         return None
@@ -82,31 +119,7 @@ def get_analysis(api_token, analysis_id):
     :param analysis_id: the identifier of the analysis we want to poll
     :return: the return code depending on the results or some processing error
     """
-
-    query = """
-        {
-          analysis(id: """ + str(analysis_id) + """){
-            id
-            status
-            revision
-            slocs
-            techdebt{
-              grade
-              score
-            }
-            summary{
-              duplicates
-              violations
-              duplicated_lines
-              longFunctions
-              totalFunctions
-              complexFunctions
-            }
-          }
-        }
-        """
-
-    response_json = do_graphql_query_with_api_token(api_token, {"query": query})
+    response_json = do_graphql_query_with_api_token(api_token, GET_ANALYSIS_QUERY.payload({"id": analysis_id}))
     logging.info("Analysis response %s", response_json)
     return response_json['analysis']
 
@@ -131,6 +144,7 @@ def main(argv=None):
     max_complex_functions_rate_argument = options['--max-complex-functions-rate']
     max_long_functions_rate_argument = options['--max-long-functions-rate']
     custom_timeout_sec = options['--max-timeout-sec']
+    subscribe = True if options['--subscribe'] else False
 
     try:
         timeout = int(custom_timeout_sec) if custom_timeout_sec is not None else DEFAULT_TIMEOUT
@@ -209,75 +223,69 @@ def main(argv=None):
 
         #  Now, time to check the results and if we pass the given criteria
         analysis_id = analysis['id']
-        deadline = time.time() + timeout
-
-        while True:
-            now = time.time()
-            if now > deadline:
-                log.error("Deadline expired")
-                sys.exit(1)
-
-            poll_analysis = get_analysis(api_token, analysis_id)
-            if poll_analysis is None or poll_analysis['status'].upper() not in ["DONE", "ERROR", "SAME_REVISION"]:
-                log.debug("analysis not completed yet")
-                time.sleep(5)
-                continue
-
-            print(json.dumps(poll_analysis, indent=4))
-
-            analysis_slocs = int(poll_analysis['slocs'])
-            revision = poll_analysis['revision']
-            analysis_violations = int(poll_analysis['summary']['violations'])
-            analysis_complex_functions = int(poll_analysis['summary']['complexFunctions'])
-            analysis_long_functions = int(poll_analysis['summary']['longFunctions'])
-            analysis_total_functions = int(poll_analysis['summary']['totalFunctions'])
-            analysis_score = poll_analysis['techdebt']['score']
-            analysis_grade = poll_analysis['techdebt']['grade']
-
-            if analysis_slocs > 0:
-                if analysis_total_functions > 0:
-                    analysis_complex_function_rate = analysis_complex_functions / analysis_total_functions
-                    analysis_long_function_rate = analysis_long_functions / analysis_total_functions
-                else:
-                    analysis_complex_function_rate = 0
-                    analysis_long_function_rate = 0
-
-                analysis_violations_rate = analysis_violations / analysis_slocs
+        deadline = Deadline(timeout)
+
+        try:
+            poll_analysis = wait_for_analysis(api_token, analysis_id,
+                                              lambda: get_analysis(api_token, analysis_id),
+                                              deadline, subscribe)
+        except PollingTimeoutException:
+            log.error("Deadline expired")
+            sys.exit(1)
+
+        print(json.dumps(poll_analysis, indent=4))
+
+        analysis_slocs = int(poll_analysis['slocs'])
+        revision = poll_analysis['revision']
+        analysis_violations = int(poll_analysis['summary']['violations'])
+        analysis_complex_functions = int(poll_analysis['summary']['complexFunctions'])
+        analysis_long_functions = int(poll_analysis['summary']['longFunctions'])
+        analysis_total_functions = int(poll_analysis['summary']['totalFunctions'])
+        analysis_score = poll_analysis['techdebt']['score']
+        analysis_grade = poll_analysis['techdebt']['grade']
+
+        if analysis_slocs > 0:
+            if analysis_total_functions > 0:
+                analysis_complex_function_rate = analysis_complex_functions / analysis_total_functions
+                analysis_long_function_rate = analysis_long_functions / analysis_total_functions
             else:
                 analysis_complex_function_rate = 0
                 analysis_long_function_rate = 0
-                analysis_violations_rate = 0
 
-            logging.info("revision: %s", revision)
-            logging.info("analysis_score: %s", analysis_score)
-            logging.info("analysis_grade: %s", analysis_grade)
-            logging.info("analysis_violations_rate: %s", analysis_violations_rate)
-            logging.info("analysis_complex_function_rate: %s", analysis_complex_function_rate)
-            logging.info("analysis_long_function_rate: %s", analysis_long_function_rate)
-
-            if analysis_score and min_quality_score is not None and analysis_score < min_quality_score:
-                log.info("analysis score %s is lower than minimum expected score %s", analysis_score, min_quality_score)
-                sys.exit(1)
-
-            if max_complex_functions_rate is not None and analysis_complex_function_rate > max_complex_functions_rate:
-                log.info("complex function rate %s is higher than maximum %s", analysis_complex_function_rate, max_complex_functions_rate)
-                sys.exit(1)
+            analysis_violations_rate = analysis_violations / analysis_slocs
+        else:
+            analysis_complex_function_rate = 0
+            analysis_long_function_rate = 0
+            analysis_violations_rate = 0
+
+        logging.info("revision: %s", revision)
+        logging.info("analysis_score: %s", analysis_score)
+        logging.info("analysis_grade: %s", analysis_grade)
+        logging.info("analysis_violations_rate: %s", analysis_violations_rate)
+        logging.info("analysis_complex_function_rate: %s", analysis_complex_function_rate)
+        logging.info("analysis_long_function_rate: %s", analysis_long_function_rate)
+
+        if analysis_score and min_quality_score is not None and analysis_score < min_quality_score:
+            log.info("analysis score %s is lower than minimum expected score %s", analysis_score, min_quality_score)
+            sys.exit(1)
 
-            if max_long_functions_rate is not None and analysis_long_function_rate > max_long_functions_rate:
-                log.info("long function rate %s is higher than maximum %s", analysis_long_function_rate, max_long_functions_rate)
-                sys.exit(1)
+        if max_complex_functions_rate is not None and analysis_complex_function_rate > max_complex_functions_rate:
+            log.info("complex function rate %s is higher than maximum %s", analysis_complex_function_rate, max_complex_functions_rate)
+            sys.exit(1)
 
-            if max_defects_rate is not None and analysis_violations_rate > max_defects_rate:
-                log.info("violation rate %s is higher than maximum %s", analysis_violations_rate, max_defects_rate)
-                sys.exit(1)
+        if max_long_functions_rate is not None and analysis_long_function_rate > max_long_functions_rate:
+            log.info("long function rate %s is higher than maximum %s", analysis_long_function_rate, max_long_functions_rate)
+            sys.exit(1)
 
-            if min_quality_grade_argument is not None and is_grade_lower(analysis_grade, min_quality_grade_argument):
-                log.info("grade %s is lower than grade %s", analysis_grade, min_quality_grade_argument)
-                sys.exit(1)
+        if max_defects_rate is not None and analysis_violations_rate > max_defects_rate:
+            log.info("violation rate %s is higher than maximum %s", analysis_violations_rate, max_defects_rate)
+            sys.exit(1)
 
-            log.info("Everything is fine, all conditions passed")
-            sys.exit(0)
+        if min_quality_grade_argument is not None and is_grade_lower(analysis_grade, min_quality_grade_argument):
+            log.info("grade %s is lower than grade %s", analysis_grade, min_quality_grade_argument)
+            sys.exit(1)
 
+        log.info("Everything is fine, all conditions passed")
         sys.exit(0)
     except KeyboardInterrupt:  # pragma: no cover
         log.info('Aborted')
@@ -0,0 +1,190 @@
+"""
+Disk cache for the responses of the GraphQL API. Responses describing objects that do not
+change anymore (e.g. a finished analysis) are kept until evicted, other responses expire
+after a short time. The oldest entries are evicted when the cache exceeds its size.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import typing
+
+from codiga.common import log
+from codiga.graphql import common
+from codiga.utils.cache_utils import get_cache_file
+from codiga.utils.json_utils import loads, dumps_bytes
+
+# Set to 0 to disable the response cache
+RESPONSE_CACHE_ENVIRONMENT_VARIABLE = "CODIGA_GRAPHQL_CACHE"
+RESPONSE_CACHE_DIRECTORY = "graphql-responses"
+RESPONSE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+# When evicting, remove entries until the cache uses this fraction of its maximum size
+RESPONSE_CACHE_EVICTION_RATIO = 0.8
+MUTABLE_RESPONSE_TTL_SECS = 30
+
+
+def normalize_query(query: str) -> str:
+    """
+    :param query: the text of a GraphQL query
+    :return: the query with whitespaces collapsed, so that formatting does not change cache keys
+    """
+    return re.sub(r"\s+", " ", query).strip()
+
+
+def get_response_cache_key(api_token: typing.Optional[str], payload: dict) -> str:
+    """
+    Get the cache key for a payload. The API token is part of the key since the
+    response depends on the permissions of the user.
+    :param api_token: the API token
+    :param payload: the payload of the query
+    :return: the key
+    """
+    token_hash = hashlib.sha256((api_token or "").encode('utf-8')).hexdigest()
+    key = json.dumps({
+        "query": normalize_query(payload.get("query", "")),
+        "variables": payload.get("variables") or {},
+        "token": token_hash
+    }, sort_keys=True)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    Responses stored on disk, one file per response.
+    """
+    def __init__(self, directory: str, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _get_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> typing.Optional[dict]:
+        """
+        :param key: the key of the response
+        :return: the response or None if not cached or expired
+        """
+        path = self._get_path(key)
+        try:
+            with open(path, 'rb') as cache_file:
+                entry = loads(cache_file.read())
+        except (OSError, ValueError):
+            return None
+
+        expires_at = entry.get("expiresAt")
+        if expires_at is not None and expires_at < time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+        try:
+            # the modification time is used to evict the least recently used entries
+            os.utime(path)
+        except OSError:
+            pass
+        return entry.get("data")
+
+    def set(self, key: str, data: dict, ttl_secs: typing.Optional[float] = None):
+        """
+        Store a response
+        :param key: the key of the response
+        :param data: the response
+        :param ttl_secs: how long the response is valid, None if it never expires
+        """
+        expires_at = time.time() + ttl_secs if ttl_secs is not None else None
+        try:
+            file_descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(file_descriptor, 'wb') as cache_file:
+                cache_file.write(dumps_bytes({"expiresAt": expires_at, "data": data}))
+            os.replace(temporary_path, self._get_path(key))
+        except OSError as e:
+            log.debug("cannot write response in cache: %s", e)
+            return
+        self.evict()
+
+    def evict(self):
+        """
+        Remove the least recently used entries when the cache is larger than its maximum size.
+        """
+        with self._lock:
+            try:
+                entries = []
+                for entry in os.scandir(self.directory):
+                    if entry.name.endswith(".json"):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+            except OSError:
+                return
+
+            total_bytes = sum(size for _, size, _ in entries)
+            if total_bytes <= self.max_bytes:
+                return
+
+            for _, size, path in sorted(entries):
+                if total_bytes <= self.max_bytes * RESPONSE_CACHE_EVICTION_RATIO:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                total_bytes -= size
+
+
+_response_cache: typing.Optional[ResponseCache] = None
+
+
+def get_response_cache() -> typing.Optional[ResponseCache]:
+    """
+    :return: the response cache in the cache directory, None if disabled
+    """
+    global _response_cache
+    if os.environ.get(RESPONSE_CACHE_ENVIRONMENT_VARIABLE, "1").lower() in ["0", "false", "no"]:
+        return None
+    if _response_cache is None:
+        try:
+            _response_cache = ResponseCache(get_cache_file(RESPONSE_CACHE_DIRECTORY))
+        except OSError as e:
+            log.debug("cannot create response cache: %s", e)
+            return None
+    return _response_cache
+
+
+def do_cached_graphql_query(api_token, payload: dict, is_immutable: typing.Callable[[dict], bool],
+                            mutable_ttl_secs: float = MUTABLE_RESPONSE_TTL_SECS,
+                            query_function: typing.Optional[typing.Callable] = None) -> typing.Optional[dict]:
+    """
+    Do a GraphQL query, using the response cache.
+    :param api_token: the API token to access the GraphQL API
+    :param payload: the payload of the query
+    :param is_immutable: function returning True if a response will never change
+    :param mutable_ttl_secs: how long to keep responses that may change (0 to not keep them)
+    :param query_function: the function doing the query, do_graphql_query by default
+    :return: the data of the response
+    """
+    if query_function is None:
+        query_function = common.do_graphql_query
+
+    cache = get_response_cache()
+    if cache is None:
+        return query_function(api_token, payload)
+
+    key = get_response_cache_key(api_token, payload)
+    data = cache.get(key)
+    if data is not None:
+        log.debug("response found in cache")
+        return data
+
+    data = query_function(api_token, payload)
+    if data is not None:
+        if is_immutable(data):
+            cache.set(key, data)
+        elif mutable_ttl_secs > 0:
+            cache.set(key, data, mutable_ttl_secs)
+    return data
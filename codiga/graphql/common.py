@@ -1,17 +1,259 @@
 """
 Common functions to manage the GraphQL API
 """
+import email.utils
+import os
+import threading
+import time
+import typing
+from concurrent.futures import Future
+
 import requests
 
-from tenacity import retry, stop_after_attempt, wait_random
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_random
 
 from codiga import constants
 from codiga.common import log
 from codiga.constants import API_TOKEN_HEADER, GRAPHQL_ENDPOINT_STAGING_URL, \
-    GRAPHQL_ENDPOINT_PROD_URL, USER_AGENT_HEADER, USER_AGENT_CLI
+    GRAPHQL_ENDPOINT_PROD_URL, USER_AGENT_HEADER, USER_AGENT_CLI, PERSISTED_QUERIES_ENVIRONMENT_VARIABLE, \
+    ACCEPT_ENCODING_HEADER, ACCEPT_ENCODING
+from codiga.exceptions.circuit_open_exception import CircuitOpenException
+from codiga.exceptions.transient_api_exception import TransientApiException
+from codiga.graphql.registry import get_registered_query, GraphQLQuery
+from codiga.utils.json_utils import loads
+from codiga.utils.retry import RetryBudget, CircuitBreaker
+
+PERSISTED_QUERY_VERSION = 1
+PERSISTED_QUERY_NOT_FOUND = "PersistedQueryNotFound"
+PERSISTED_QUERY_NOT_SUPPORTED = "PersistedQueryNotSupported"
+# Error codes (in errors[].extensions.code) used by some servers instead of the messages above
+PERSISTED_QUERY_ERROR_CODES = {
+    "PERSISTED_QUERY_NOT_FOUND": PERSISTED_QUERY_NOT_FOUND,
+    "PERSISTED_QUERY_NOT_SUPPORTED": PERSISTED_QUERY_NOT_SUPPORTED
+}
+
+# Endpoints that do not support persisted queries. We do not try to use them again.
+_endpoints_without_persisted_queries = set()
+
+# Maximum number of connections kept open to the API
+HTTP_POOL_SIZE = 16
+
+# Statuses worth retrying: the same request may succeed later
+TRANSIENT_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def create_http_session() -> requests.Session:
+    """
+    Create a session that keeps its connections open between requests and asks
+    for compressed responses.
+    :return: the session
+    """
+    session = requests.Session()
+    session.headers[ACCEPT_ENCODING_HEADER] = ACCEPT_ENCODING
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=HTTP_POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# Session shared by all the requests to the GraphQL API (and all the threads) to reuse connections
+http_session = create_http_session()
+
+
+def use_persisted_queries(endpoint: str) -> bool:
+    """
+    :param endpoint: the GraphQL endpoint
+    :return: True if we should try to send only the hash of registered queries to this endpoint
+    """
+    if os.environ.get(PERSISTED_QUERIES_ENVIRONMENT_VARIABLE, "1").lower() in ["0", "false", "no"]:
+        return False
+    return endpoint not in _endpoints_without_persisted_queries
+
+
+def get_persisted_query_error(response: requests.Response) -> typing.Optional[str]:
+    """
+    Find the error returned by the server when it cannot use the hash of a persisted query
+    :param response: the response to a payload with only the hash of the query
+    :return: PERSISTED_QUERY_NOT_FOUND, PERSISTED_QUERY_NOT_SUPPORTED or None if the query was executed
+    """
+    # most responses are data: only decode the ones that can contain such an error
+    if b"PersistedQuery" not in response.content and b"PERSISTED_QUERY" not in response.content:
+        return None
+    try:
+        response_json = loads(response.content)
+    except ValueError:
+        return None
+    errors = response_json.get("errors") if isinstance(response_json, dict) else None
+    for error in errors if isinstance(errors, list) else []:
+        if not isinstance(error, dict):
+            continue
+        code = (error.get("extensions") or {}).get("code")
+        for value in (error.get("message"), PERSISTED_QUERY_ERROR_CODES.get(code)):
+            if value in (PERSISTED_QUERY_NOT_FOUND, PERSISTED_QUERY_NOT_SUPPORTED):
+                return value
+    return None
+
+
+def post_graphql_payload(endpoint: str, payload: dict, headers: dict, timeout=None) -> requests.Response:
+    """
+    Send a payload to the GraphQL endpoint. When the payload uses a registered query, we first
+    send only the hash of the query (automatic persisted query). If the server does not know the
+    hash yet, the payload is sent again with the query text and the hash so that the server
+    registers it for the next requests.
+
+    Persisted queries are only disabled for the endpoint when the server says it does not
+    support them, or rejects the request (400) without a persisted query error. Transient
+    statuses are returned as is, to be retried by send_graphql_payload.
+
+    :param endpoint: the GraphQL endpoint
+    :param payload: the payload to send
+    :param headers: the HTTP headers
+    :param timeout: the timeout of the request
+    :return: the response
+    """
+    query = get_registered_query(payload.get("query"))
+    if query is None:
+        return http_session.post(endpoint, json=payload, headers=headers, timeout=timeout)
+
+    extensions = {"persistedQuery": {"version": PERSISTED_QUERY_VERSION, "sha256Hash": query.sha256}}
+
+    if use_persisted_queries(endpoint):
+        persisted_payload = {key: value for key, value in payload.items() if key != "query"}
+        persisted_payload["extensions"] = extensions
+        response = http_session.post(endpoint, json=persisted_payload, headers=headers, timeout=timeout)
+        if response.status_code in TRANSIENT_STATUS_CODES:
+            return response
+        error = get_persisted_query_error(response)
+        if error is None and response.status_code != 400:
+            return response
+        if error != PERSISTED_QUERY_NOT_FOUND:
+            log.debug("persisted queries not supported by %s", endpoint)
+            _endpoints_without_persisted_queries.add(endpoint)
+
+    return http_session.post(endpoint, json=dict(payload, extensions=extensions), headers=headers, timeout=timeout)
+
+
+MAX_ATTEMPTS = 7
+MAX_RETRY_AFTER_SECS = 30
+
+# Retries allowed for all the threads of the process
+retry_budget = RetryBudget()
+
+# One circuit breaker for each endpoint
+_circuit_breakers: typing.Dict[str, CircuitBreaker] = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(endpoint: str) -> CircuitBreaker:
+    """
+    :param endpoint: the GraphQL endpoint
+    :return: the circuit breaker of the endpoint
+    """
+    with _circuit_breakers_lock:
+        if endpoint not in _circuit_breakers:
+            _circuit_breakers[endpoint] = CircuitBreaker()
+        return _circuit_breakers[endpoint]
+
+
+def get_retry_after(response: requests.Response) -> typing.Optional[float]:
+    """
+    :param response: the response of the API
+    :return: the number of seconds to wait from the Retry-After header (in seconds or as a date), None if absent
+    """
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_transient_exception(exception: BaseException) -> bool:
+    """
+    :param exception: the exception raised when sending a request
+    :return: True if sending the request again may succeed
+    """
+    return isinstance(exception, (TransientApiException, requests.ConnectionError, requests.Timeout))
+
+
+def stop_when_budget_exhausted(retry_state) -> bool:
+    """
+    Stop retrying when the retry budget of the process is spent
+    :param retry_state: the tenacity state
+    :return: True to stop retrying
+    """
+    return not retry_budget.try_acquire()
+
+
+def wait_retry_after(retry_state) -> float:
+    """
+    Wait for the time requested by the API with Retry-After, or a random time
+    :param retry_state: the tenacity state
+    :return: the number of seconds to wait
+    """
+    exception = retry_state.outcome.exception()
+    if isinstance(exception, TransientApiException) and exception.retry_after_secs is not None:
+        return min(exception.retry_after_secs, MAX_RETRY_AFTER_SECS)
+    return wait_random(min=1, max=2)(retry_state)
+
+
+@retry(retry=retry_if_exception(is_transient_exception),
+       stop=stop_after_attempt(MAX_ATTEMPTS) | stop_when_budget_exhausted,
+       wait=wait_retry_after, reraise=True)
+def send_graphql_payload(endpoint: str, payload: dict, headers: dict, timeout=None) -> requests.Response:
+    """
+    Send a payload to the GraphQL endpoint and retry transient failures (connection errors,
+    timeouts, 429 and 5xx statuses) while the retry budget allows it. Other errors are not retried.
+    :param endpoint: the GraphQL endpoint
+    :param payload: the payload to send
+    :param headers: the HTTP headers
+    :param timeout: the timeout of the request
+    :return: the response
+    :raise CircuitOpenException: if the endpoint failed too many times recently
+    :raise TransientApiException: if the API still returns a transient status after the retries
+    """
+    circuit_breaker = get_circuit_breaker(endpoint)
+    circuit_breaker.before_call()
+    try:
+        response = post_graphql_payload(endpoint, payload, headers, timeout=timeout)
+    except BaseException:
+        # any failure, including a non-transient one, must close a half-open circuit again
+        circuit_breaker.record_failure()
+        raise
+    if response.status_code in TRANSIENT_STATUS_CODES:
+        circuit_breaker.record_failure()
+        raise TransientApiException(response.status_code, get_retry_after(response))
+    circuit_breaker.record_success()
+    retry_budget.record_success()
+    return response
+
+
+def get_graphql_response(endpoint: str, payload: dict, headers: dict, timeout=None) -> typing.Optional[dict]:
+    """
+    Send a payload to the GraphQL endpoint
+    :param endpoint: the GraphQL endpoint
+    :param payload: the payload to send
+    :param headers: the HTTP headers
+    :param timeout: the timeout of the request
+    :return: the JSON object returned, None if the API returned an error status or is failing
+    """
+    try:
+        response = send_graphql_payload(endpoint, payload, headers, timeout=timeout)
+    except (TransientApiException, CircuitOpenException) as e:
+        log.error('Failed to send GraphQL query to Codiga API: %s', e)
+        return None
+    if response.status_code != 200:
+        log.error('Failed to send GraphQL query to Codiga API')
+        return None
+    # the body is decompressed as it is received, decode the bytes directly
+    return loads(response.content)
 
 
-@retry(stop=stop_after_attempt(7), wait=wait_random(min=1, max=2))
 def do_graphql_query(api_token, payload):
     """
     Do a GraphQL query. This base method is used by all other methods that do a GraphQL query.
@@ -24,15 +266,12 @@ def do_graphql_query(api_token, payload):
         headers = {API_TOKEN_HEADER: api_token, USER_AGENT_HEADER: USER_AGENT_CLI}
     else:
         headers = {USER_AGENT_HEADER: USER_AGENT_CLI}
-    response = requests.post(constants.GRAPHQL_ENDPOINT_PROD_URL, json=payload, headers=headers, timeout=10)
-    if response.status_code != 200:
-        log.error('Failed to send GraphQL query to Codiga API')
+    response_json = get_graphql_response(constants.GRAPHQL_ENDPOINT_PROD_URL, payload, headers, timeout=10)
+    if response_json is None:
         return None
-    response_json = response.json()
     return response_json["data"]
 
 
-@retry(stop=stop_after_attempt(7), wait=wait_random(min=1, max=2))
 def do_graphql_query_with_api_token(api_token, payload, use_staging=False):
     """
     Do a GraphQL query. This base method is used by all other methods that do a GraphQL query.
@@ -46,14 +285,11 @@ def do_graphql_query_with_api_token(api_token, payload, use_staging=False):
     endpoint = GRAPHQL_ENDPOINT_PROD_URL
     if use_staging:
         endpoint = GRAPHQL_ENDPOINT_STAGING_URL
-    response = requests.post(endpoint, json=payload, headers=headers)
-    if response.status_code != 200:
-        log.error('Failed to send GraphQL query to Codiga API')
+    response_json = get_graphql_response(endpoint, payload, headers)
+    if response_json is None:
         return None
-    response_json = response.json()
     return response_json["data"]
 
-@retry(stop=stop_after_attempt(7), wait=wait_random(min=1, max=2))
 def do_graphql_query_with_api_token_complete(api_token, payload, use_staging=False):
     """
     Do a GraphQL query. This base method is used by all other methods that do a GraphQL query.
@@ -67,9 +303,158 @@ def do_graphql_query_with_api_token_complete(api_token, payload, use_staging=Fal
     endpoint = GRAPHQL_ENDPOINT_PROD_URL
     if use_staging:
         endpoint = GRAPHQL_ENDPOINT_STAGING_URL
-    response = requests.post(endpoint, json=payload, headers=headers)
-    if response.status_code != 200:
-        log.error('Failed to send GraphQL query to Codiga API')
-        return None
-    response_json = response.json()
-    return response_json
\ No newline at end of file
+    return get_graphql_response(endpoint, payload, headers)
+
+
+BATCH_WINDOW_SECS = 0.01
+BATCH_MAX_SIZE = 50
+
+
+def build_batch_payload(queries: typing.List[typing.Tuple[GraphQLQuery, dict]]) -> dict:
+    """
+    Merge several queries into one query. The variables and the root fields of the query
+    at index i are prefixed with b<i>_ so that they do not conflict with the other queries.
+    :param queries: the queries with the values of their variables
+    :return: the payload of the merged query
+    """
+    variable_definitions = []
+    selections = []
+    variables = {}
+    for index, (query, query_variables) in enumerate(queries):
+        prefix = f"b{index}_"
+        for name, variable_type in query.variables.items():
+            variable_definitions.append(f"${prefix}{name}: {variable_type}")
+        for name, value in query.check_variables(query_variables).items():
+            variables[prefix + name] = value
+        selections.append(query.prefixed_selection(prefix))
+
+    definitions = f"({', '.join(variable_definitions)})" if variable_definitions else ""
+    text = f"query Batch{definitions} {{{''.join(selections)}}}"
+    return {"query": text, "operationName": "Batch", "variables": variables}
+
+
+def split_batch_data(queries: typing.List[typing.Tuple[GraphQLQuery, dict]],
+                     data: typing.Optional[dict]) -> typing.List[typing.Optional[dict]]:
+    """
+    Split the data of a merged query into the data of each query
+    :param queries: the queries merged in the batch
+    :param data: the data returned for the merged query
+    :return: the data for each query (None if the merged query failed)
+    """
+    if data is None:
+        return [None for _ in queries]
+    return [{field: data.get(f"b{index}_{field}") for field in query.root_fields}
+            for index, (query, _) in enumerate(queries)]
+
+
+def do_graphql_queries(api_token, queries: typing.List[typing.Tuple[GraphQLQuery, dict]],
+                       use_staging=False) -> typing.List[typing.Optional[dict]]:
+    """
+    Execute several queries in a single request.
+    :param api_token: the API token to access the GraphQL API
+    :param queries: the queries to execute, with the values of their variables
+    :param use_staging: use the staging endpoint
+    :return: the data returned for each query, in the same order
+    """
+    if not queries:
+        return []
+    if len(queries) == 1:
+        query, variables = queries[0]
+        payload = query.payload(variables)
+    else:
+        payload = build_batch_payload(queries)
+
+    if use_staging:
+        data = do_graphql_query_with_api_token(api_token, payload, use_staging)
+    else:
+        data = do_graphql_query(api_token, payload)
+
+    if len(queries) == 1:
+        return [data]
+    return split_batch_data(queries, data)
+
+
+class GraphQLBatcher:
+    """
+    Coalesce the queries submitted within a short window (from any thread) into a single
+    request. Mutations are never merged and are sent as soon as they are submitted.
+
+    Example:
+        batcher = GraphQLBatcher(api_token)
+        futures = [batcher.submit(PROJECT_QUERY, {"name": name}) for name in names]
+        projects = [future.result() for future in futures]
+    """
+    def __init__(self, api_token, window_secs: float = BATCH_WINDOW_SECS,
+                 max_batch_size: int = BATCH_MAX_SIZE, use_staging: bool = False):
+        self._api_token = api_token
+        self._window_secs = window_secs
+        self._max_batch_size = max_batch_size
+        self._use_staging = use_staging
+        self._lock = threading.Lock()
+        self._pending: typing.List[typing.Tuple[GraphQLQuery, dict, Future]] = []
+        self._timer: typing.Optional[threading.Timer] = None
+
+    def submit(self, query: GraphQLQuery, variables: typing.Optional[dict] = None) -> Future:
+        """
+        Submit a query to be sent with the next batch
+        :param query: the query to execute
+        :param variables: the values of the variables
+        :return: a future with the data of the query
+        """
+        future = Future()
+        variables = query.check_variables(variables)
+
+        if query.operation_type != "query":
+            self._send([(query, variables, future)])
+            return future
+
+        batch = None
+        with self._lock:
+            self._pending.append((query, variables, future))
+            if len(self._pending) >= self._max_batch_size:
+                batch = self._take_pending()
+            elif self._timer is None:
+                self._timer = threading.Timer(self._window_secs, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if batch:
+            self._send(batch)
+        return future
+
+    def execute(self, query: GraphQLQuery, variables: typing.Optional[dict] = None) -> typing.Optional[dict]:
+        """
+        Submit a query and wait for its data
+        :param query: the query to execute
+        :param variables: the values of the variables
+        :return: the data of the query
+        """
+        return self.submit(query, variables).result()
+
+    def flush(self):
+        """
+        Send all the queries submitted and not sent yet
+        :return:
+        """
+        with self._lock:
+            batch = self._take_pending()
+        if batch:
+            self._send(batch)
+
+    def _take_pending(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch = self._pending
+        self._pending = []
+        return batch
+
+    def _send(self, batch: typing.List[typing.Tuple[GraphQLQuery, dict, Future]]):
+        try:
+            results = do_graphql_queries(self._api_token, [(query, variables) for query, variables, _ in batch],
+                                         self._use_staging)
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, _, future), result in zip(batch, results):
+            future.set_result(result)
@@ -1,4 +1,6 @@
 
+import typing
+
 # status for AnalysisResult and FileAnalysis
 STATUS_UNKNOWN: str = "Unknown"
 STATUS_DONE: str = "Done"
@@ -8,3 +10,14 @@ STATUS_IGNORE: str = "Ignore"
 STATUS_IN_PROGRESS: str = "InProgress"
 STATUS_SCHEDULED: str = "Scheduled"
 STATUS_STARTED: str = "Started"
+
+# status (upper case) of an analysis that will not change anymore
+TERMINAL_ANALYSIS_STATUSES: list = [STATUS_DONE.upper(), STATUS_ERROR.upper(), STATUS_SAME_REVISION.upper()]
+
+
+def is_analysis_complete(analysis: typing.Optional[dict]) -> bool:
+    """
+    :param analysis: an analysis with its status
+    :return: True if the status of the analysis will not change anymore
+    """
+    return analysis is not None and analysis['status'].upper() in TERMINAL_ANALYSIS_STATUSES
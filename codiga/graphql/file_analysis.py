@@ -1,9 +1,44 @@
 """
 Function to create a file analysis using the GraphQL API.
 """
-import json
 
 from codiga.graphql.common import do_graphql_query
+from codiga.graphql.registry import register_query
+
+CREATE_FILE_ANALYSIS_MUTATION = register_query("""
+    mutation CreateFileAnalysis($language: LanguageEnumeration!, $code: String!, $filename: String!, $projectId: Long) {
+        createFileAnalysis(
+            language: $language,
+            code: $code,
+            filename: $filename,
+            projectId: $projectId
+        )
+    }
+""")
+
+GET_FILE_ANALYSIS_QUERY = register_query("""
+    query GetFileAnalysis($id: Long!) {
+      getFileAnalysis(id: $id){
+        status
+        filename
+        language
+        runningTimeSeconds
+        timestamp
+        violations {
+          id
+          language
+          description
+          severity
+          category
+          line
+          lineCount
+          tool
+          rule
+          ruleUrl
+        }
+      }
+    }
+""")
 
 
 def graphql_create_file_analysis(api_token: str, filename: str,
@@ -20,21 +55,13 @@ def graphql_create_file_analysis(api_token: str, filename: str,
     """
     if not filename or not language or not content:
         raise ValueError
-    code_content = json.dumps(content)
-    project_id_text: str = "null"
-    if project_id:
-        project_id_text = str(project_id)
-    query = """
-    mutation{
-        createFileAnalysis (
-            language: """ + language + """,
-            code: """ + code_content + """,
-            filename: \"""" + filename + """\"
-            projectId: """ + project_id_text + """
-        )
-    }
-    """
-    data = do_graphql_query(api_token, {"query": query})
+    payload = CREATE_FILE_ANALYSIS_MUTATION.payload({
+        "language": language,
+        "code": content,
+        "filename": filename,
+        "projectId": project_id if project_id else None
+    })
+    data = do_graphql_query(api_token, payload)
     return int(data['createFileAnalysis'])
 
 
@@ -49,28 +76,5 @@ def graphql_get_file_analysis(api_token: str, file_analysis_id: int):
     if not api_token or not file_analysis_id:
         raise ValueError
 
-    query = """
-    {
-      getFileAnalysis(id:""" + str(file_analysis_id) + """){
-        status
-        filename
-        language
-        runningTimeSeconds
-        timestamp
-        violations {
-          id
-          language
-          description
-          severity
-          category
-          line
-          lineCount
-          tool
-          rule
-          ruleUrl
-        }
-      }
-    }
-    """
-    data = do_graphql_query(api_token, {"query": query})
+    data = do_graphql_query(api_token, GET_FILE_ANALYSIS_QUERY.payload({"id": file_analysis_id}))
     return data
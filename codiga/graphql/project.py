@@ -3,6 +3,25 @@ Function to create a file analysis using the GraphQL API.
 """
 
 from codiga.graphql.common import do_graphql_query
+from codiga.graphql.file_analysis import GET_FILE_ANALYSIS_QUERY
+from codiga.graphql.registry import register_query
+
+PROJECT_INFO_QUERY = register_query("""
+    query ProjectInfo($name: String!) {
+      project(name: $name) {
+        id
+        name
+        public
+        description
+        status
+        owner{
+          username
+        }
+        level
+        analysesCount
+      }
+    }
+""")
 
 
 def graphql_get_project_info(api_token: str, project_name: str):
@@ -14,23 +33,7 @@ def graphql_get_project_info(api_token: str, project_name: str):
     """
     if not project_name or not api_token:
         raise ValueError
-    query = """
-        {
-          project(name:\"""" + project_name + """\") {
-            id
-            name
-            public
-            description
-            status
-            owner{
-              username
-            }
-            level
-            analysesCount
-          }
-        }
-    """
-    data = do_graphql_query(api_token, {"query": query})
+    data = do_graphql_query(api_token, PROJECT_INFO_QUERY.payload({"name": project_name}))
     if 'project' in data:
         return data['project']
     return None
@@ -47,27 +50,4 @@ def graphql_get_file_analysis(api_token: str, file_analysis_id: int):
     if not file_analysis_id:
         raise ValueError
 
-    query = """
-    {
-      getFileAnalysis(id:""" + str(file_analysis_id) + """){
-        status
-        filename
-        language
-        runningTimeSeconds
-        timestamp
-        violations {
-          id
-          language
-          description
-          severity
-          category
-          line
-          lineCount
-          tool
-          rule
-          ruleUrl
-        }
-      }
-    }
-    """
-    return do_graphql_query(api_token, {"query": query})
+    return do_graphql_query(api_token, GET_FILE_ANALYSIS_QUERY.payload({"id": file_analysis_id}))
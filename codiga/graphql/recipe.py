@@ -1,4 +1,58 @@
+from codiga.exceptions.cookbook_fetch_exception import CookbookFetchException
 from codiga.graphql.common import do_graphql_query_with_api_token, do_graphql_query_with_api_token_complete
+from codiga.graphql.registry import register_query
+
+CREATE_RECIPE_MUTATION = register_query("""
+    mutation CreateAssistantRecipe($code: String!, $name: String!, $language: LanguageEnumeration!,
+                                   $cookbookId: Long, $shortcut: String, $isPublic: Boolean!) {
+        createAssistantRecipe(
+            code: $code,
+            name: $name,
+            language: $language,
+            cookbookId: $cookbookId,
+            shortcut: $shortcut,
+            keywords: [],
+            generateDescription: true,
+            isPublic: $isPublic
+        ) {
+            id
+        }
+    }
+""")
+
+
+UPDATE_RECIPE_MUTATION = register_query("""
+    mutation UpdateAssistantRecipe($id: Long!, $code: String!, $name: String!, $language: LanguageEnumeration!,
+                                   $shortcut: String, $isPublic: Boolean!) {
+        updateAssistantRecipe(
+            id: $id,
+            code: $code,
+            name: $name,
+            language: $language,
+            shortcut: $shortcut,
+            keywords: [],
+            isPublic: $isPublic
+        ) {
+            id
+        }
+    }
+""")
+
+COOKBOOK_RECIPES_QUERY = register_query("""
+    query CookbookRecipes($id: Long!, $howmany: Int!, $skip: Int!) {
+        cookbook(id: $id) {
+            recipes(howmany: $howmany, skip: $skip) {
+                id
+                name
+                shortcut
+                code
+                language
+            }
+        }
+    }
+""")
+
+COOKBOOK_RECIPES_PAGE_SIZE = 100
 
 
 def post_recipe(api_token, recipe, language, is_public, cookbook_id, use_staging):
@@ -10,22 +64,55 @@ def post_recipe(api_token, recipe, language, is_public, cookbook_id, use_staging
     :param use_staging: if we use the staging endpoint or not
     :return:
     """
-    is_public_str = "true" if is_public else "false"
-    cookbook_str = str(cookbook_id) if cookbook_id is not None else "null"
-    query = """
-    mutation{
-        createAssistantRecipe (
-            code: \"""" + recipe["content"] + """\",
-            name: \"""" + recipe["name"] + """\",
-            language: """ + language + """,
-            cookbookId: """ + cookbook_str + """,
-            shortcut: \"""" + recipe["shortcut"] + """\",
-            keywords: [],
-            generateDescription: true,
-            isPublic: """ + is_public_str + """
-        ) {
-            id
-        }
-    }
+    payload = CREATE_RECIPE_MUTATION.payload({
+        "code": recipe["content"],
+        "name": recipe["name"],
+        "language": language,
+        "cookbookId": cookbook_id,
+        "shortcut": recipe["shortcut"],
+        "isPublic": bool(is_public)
+    })
+    return do_graphql_query_with_api_token_complete(api_token, payload, use_staging)
+
+
+def update_recipe(api_token, recipe_id, recipe, language, is_public, use_staging):
+    """
+    Update an existing recipe on the API endpoint
+    :param api_token: the API token to update the recipe
+    :param recipe_id: the identifier of the recipe to update
+    :param recipe: the new version of the recipe
+    :param use_staging: if we use the staging endpoint or not
+    :return:
+    """
+    payload = UPDATE_RECIPE_MUTATION.payload({
+        "id": recipe_id,
+        "code": recipe["content"],
+        "name": recipe["name"],
+        "language": language,
+        "shortcut": recipe["shortcut"],
+        "isPublic": bool(is_public)
+    })
+    return do_graphql_query_with_api_token_complete(api_token, payload, use_staging)
+
+
+def get_cookbook_recipes(api_token, cookbook_id, use_staging):
+    """
+    Get all the recipes of a cookbook
+    :param api_token: the API token
+    :param cookbook_id: the identifier of the cookbook
+    :param use_staging: if we use the staging endpoint or not
+    :return: the recipes of the cookbook with their code
+    :raise CookbookFetchException: if a page of recipes cannot be fetched
     """
-    return do_graphql_query_with_api_token_complete(api_token, {"query": query}, use_staging)
+    recipes = []
+    while True:
+        payload = COOKBOOK_RECIPES_QUERY.payload({"id": cookbook_id, "howmany": COOKBOOK_RECIPES_PAGE_SIZE,
+                                                  "skip": len(recipes)})
+        data = do_graphql_query_with_api_token(api_token, payload, use_staging)
+        if data is None:
+            raise CookbookFetchException(f"cannot get the recipes of cookbook {cookbook_id} "
+                                         f"after the first {len(recipes)} recipes")
+        page = (data.get("cookbook") or {}).get("recipes") or []
+        recipes.extend(page)
+        if len(page) < COOKBOOK_RECIPES_PAGE_SIZE:
+            return recipes
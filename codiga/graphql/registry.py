@@ -0,0 +1,199 @@
+"""
+Registry of all the GraphQL operations used by the tools. Operations are written with
+GraphQL variables (user input is never concatenated into the query text) and are parsed
+and validated once, when they are registered at import time.
+
+Each registered operation has a SHA-256 hash used for automatic persisted queries:
+the query text is sent only when the server does not know the hash yet.
+"""
+import hashlib
+import re
+import textwrap
+import typing
+
+OPERATION_TYPES = ["query", "mutation", "subscription"]
+
+_TOKEN_REGEX = re.compile(r'(?P<ignored>\s+|,|#[^\n]*)'
+                          r'|(?P<string>"(?:\\.|[^"\\])*")'
+                          r'|(?P<variable>\$[_A-Za-z][_0-9A-Za-z]*)'
+                          r'|(?P<name>[_A-Za-z][_0-9A-Za-z]*)'
+                          r'|(?P<number>-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)'
+                          r'|(?P<punctuator>\.\.\.|[{}()\[\]:!=@])')
+
+_CLOSING_PUNCTUATORS = {"{": "}", "(": ")", "[": "]"}
+
+PREFIX_PLACEHOLDER = "__CODIGA_PREFIX__"
+
+
+def _tokenize(text: str) -> typing.List[typing.Tuple[str, str, int]]:
+    """
+    Split a GraphQL document into tokens
+    :param text: the GraphQL document
+    :return: the list of (kind, value, position) tokens, without whitespaces and comments
+    :raise ValueError: if the document contains an invalid character
+    """
+    tokens = []
+    position = 0
+    while position < len(text):
+        match = _TOKEN_REGEX.match(text, position)
+        if not match:
+            raise ValueError(f"invalid character {text[position]!r} at position {position}")
+        if match.lastgroup != "ignored":
+            tokens.append((match.lastgroup, match.group(), position))
+        position = match.end()
+    return tokens
+
+
+class GraphQLQuery:
+    """
+    A GraphQL operation (query, mutation or subscription) with its variables.
+    """
+    def __init__(self, text: str):
+        """
+        Parse and validate an operation
+        :param text: the text of the operation
+        :raise ValueError: if the operation is invalid
+        """
+        self.text: str = textwrap.dedent(text).strip()
+        self.sha256: str = hashlib.sha256(self.text.encode('utf-8')).hexdigest()
+        self.operation_type: str = ""
+        self.name: str = ""
+        # Declared variables and their types, e.g. {"name": "String!"}
+        self.variables: typing.Dict[str, str] = {}
+        # Keys of the root fields in the response (alias or name of the fields)
+        self.root_fields: typing.List[str] = []
+        # Selection set where variables and root fields are prefixed by PREFIX_PLACEHOLDER
+        self._selection_template: str = ""
+        self._parse()
+
+    def _parse(self):
+        tokens = _tokenize(self.text)
+        if len(tokens) < 2 or tokens[0][0] != "name" or tokens[0][1] not in OPERATION_TYPES:
+            raise ValueError("operation must start with query, mutation or subscription")
+        if tokens[1][0] != "name":
+            raise ValueError("operation must be named")
+        self.operation_type = tokens[0][1]
+        self.name = tokens[1][1]
+
+        index = 2
+        if index < len(tokens) and tokens[index][1] == "(":
+            index += 1
+            while index < len(tokens) and tokens[index][1] != ")":
+                if tokens[index][0] != "variable" or index + 1 >= len(tokens) or tokens[index + 1][1] != ":":
+                    raise ValueError(f"invalid variable definition in {self.name}")
+                variable_name = tokens[index][1][1:]
+                index += 2
+                variable_type = ""
+                while index < len(tokens) and (tokens[index][0] == "name" or tokens[index][1] in "[]!"):
+                    variable_type += tokens[index][1]
+                    index += 1
+                if not variable_type:
+                    raise ValueError(f"missing type for variable {variable_name} in {self.name}")
+                self.variables[variable_name] = variable_type
+            index += 1
+
+        if index >= len(tokens) or tokens[index][1] != "{":
+            raise ValueError(f"missing selection set in {self.name}")
+
+        # Check that the selection is balanced and only uses declared variables. At the same
+        # time, build the template of the selection used to merge operations in one request.
+        stack = []
+        used_variables = set()
+        template_parts = []
+        template_position = tokens[index][2] + 1
+        for position in range(index, len(tokens)):
+            kind, value, text_position = tokens[position]
+            if stack == [] and position > index:
+                raise ValueError(f"unexpected token {value} after the selection set in {self.name}")
+            if value in _CLOSING_PUNCTUATORS:
+                stack.append(_CLOSING_PUNCTUATORS[value])
+            elif value in _CLOSING_PUNCTUATORS.values():
+                if not stack or stack.pop() != value:
+                    raise ValueError(f"unbalanced {value} in {self.name}")
+                if not stack:
+                    template_parts.append(self.text[template_position:text_position])
+            elif kind == "variable":
+                used_variables.add(value[1:])
+                template_parts.append(self.text[template_position:text_position])
+                template_parts.append("$" + PREFIX_PLACEHOLDER + value[1:])
+                template_position = text_position + len(value)
+            elif kind == "name" and len(stack) == 1 and tokens[position - 1][1] not in [":", "@"]:
+                # Root field, possibly with an alias (alias: field)
+                is_alias = position + 1 < len(tokens) and tokens[position + 1][1] == ":"
+                self.root_fields.append(value)
+                template_parts.append(self.text[template_position:text_position])
+                if is_alias:
+                    template_parts.append(PREFIX_PLACEHOLDER + value)
+                else:
+                    template_parts.append(PREFIX_PLACEHOLDER + value + ": " + value)
+                template_position = text_position + len(value)
+        if stack:
+            raise ValueError(f"unbalanced selection set in {self.name}")
+        self._selection_template = "".join(template_parts)
+
+        undeclared_variables = used_variables - set(self.variables.keys())
+        if undeclared_variables:
+            raise ValueError(f"undeclared variables {','.join(sorted(undeclared_variables))} in {self.name}")
+        unused_variables = set(self.variables.keys()) - used_variables
+        if unused_variables:
+            raise ValueError(f"unused variables {','.join(sorted(unused_variables))} in {self.name}")
+
+    def prefixed_selection(self, prefix: str) -> str:
+        """
+        Get the selection set of the operation (without the surrounding braces) where all
+        variables and root fields are prefixed, so that it can be merged with other operations.
+        :param prefix: the prefix to use
+        :return: the selection set
+        """
+        return self._selection_template.replace(PREFIX_PLACEHOLDER, prefix)
+
+    def payload(self, variables: typing.Optional[dict] = None) -> dict:
+        """
+        Build the payload to send to the GraphQL API. Variables with a None value are
+        not sent, so that the corresponding arguments are not set.
+        :param variables: the values of the variables
+        :return: the payload
+        :raise ValueError: if a variable is unknown or a required variable is missing
+        """
+        return {"query": self.text, "operationName": self.name, "variables": self.check_variables(variables)}
+
+    def check_variables(self, variables: typing.Optional[dict] = None) -> dict:
+        """
+        Check the values of the variables and remove the ones with a None value
+        :param variables: the values of the variables
+        :return: the values to send
+        :raise ValueError: if a variable is unknown or a required variable is missing
+        """
+        values = {name: value for name, value in (variables or {}).items() if value is not None}
+        unknown_variables = set(values.keys()) - set(self.variables.keys())
+        if unknown_variables:
+            raise ValueError(f"unknown variables {','.join(sorted(unknown_variables))} for {self.name}")
+        for name, variable_type in self.variables.items():
+            if variable_type.endswith("!") and name not in values:
+                raise ValueError(f"missing variable {name} for {self.name}")
+        return values
+
+
+_QUERIES_BY_TEXT: typing.Dict[str, GraphQLQuery] = {}
+
+
+def register_query(text: str) -> GraphQLQuery:
+    """
+    Parse, validate and register a GraphQL operation.
+    :param text: the text of the operation
+    :return: the operation
+    :raise ValueError: if the operation is invalid
+    """
+    query = GraphQLQuery(text)
+    return _QUERIES_BY_TEXT.setdefault(query.text, query)
+
+
+def get_registered_query(text: typing.Optional[str]) -> typing.Optional[GraphQLQuery]:
+    """
+    Get a registered operation from its text
+    :param text: the text of the operation
+    :return: the operation or None if the operation is not registered
+    """
+    if not text:
+        return None
+    return _QUERIES_BY_TEXT.get(text)
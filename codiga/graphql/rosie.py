@@ -1,99 +1,199 @@
 import typing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 """
 All the GraphQL queries for Rosie
 """
 
+from codiga.exceptions.ruleset_fetch_exception import RulesetFetchException
 from codiga.graphql.common import do_graphql_query
+from codiga.graphql.registry import register_query
 
+# Fetch profiles: the runtime profile contains what is needed to execute the rules,
+# the full profile also contains the tests of the rules.
+RULESET_PROFILE_RUNTIME = "runtime"
+RULESET_PROFILE_FULL = "full"
 
-def get_rulesets_name_string(ruleset_names: typing.List[str]):
+RULE_RUNTIME_FIELDS = """
+          id
+          name
+          content
+          language
+          ruleType
+          pattern
+          patternMultiline
+          elementChecked
+          severity
+          category"""
+
+RULE_FULL_FIELDS = RULE_RUNTIME_FIELDS + """
+          tests {
+            id
+            name
+            shouldFail
+            content
+            description
+          }"""
+
+RULE_FIELDS_FOR_PROFILE = {
+    RULESET_PROFILE_RUNTIME: RULE_RUNTIME_FIELDS,
+    RULESET_PROFILE_FULL: RULE_FULL_FIELDS
+}
+
+# Number of rules fetched per request and number of pages of a ruleset fetched concurrently
+RULES_PAGE_SIZE = 500
+RULES_PAGES_IN_FLIGHT = 4
+RULESETS_FETCHED_CONCURRENTLY = 8
+
+GET_RULESETS_QUERIES = {profile: register_query("""
+    query GetRulesets""" + profile.capitalize() + """($names: [String!]!, $howmany: Int!, $skip: Int!) {
+      ruleSetsForClient(names: $names){
+        id
+        name
+        rules(howmany: $howmany, skip: $skip){""" + fields + """
+        }
+      }
+    }
+""") for profile, fields in RULE_FIELDS_FOR_PROFILE.items()}
+
+GET_RULESET_QUERIES = {profile: register_query("""
+    query GetRuleset""" + profile.capitalize() + """($name: String!, $howmany: Int!, $skip: Int!) {
+      ruleSet(name: $name){
+        id
+        name
+        rules(howmany: $howmany, skip: $skip){""" + fields + """
+        }
+      }
+    }
+""") for profile, fields in RULE_FIELDS_FOR_PROFILE.items()}
+
+
+def iter_ruleset_pages(fetch_page: typing.Callable[[str, int], typing.Optional[dict]],
+                       ruleset_names: typing.List[str],
+                       concurrency: int = RULESETS_FETCHED_CONCURRENTLY) -> typing.Iterator[dict]:
     """
-    Converts a List[str] into a string for graphql requests
-    :param ruleset_names: List[str]
-    :return: str
+    Fetch the rules of several rulesets page by page and yield each page as soon as it is
+    available, in the order of the rulesets. The first page of all rulesets is fetched
+    concurrently. When a ruleset has more rules than a page, the next pages are fetched
+    concurrently, RULES_PAGES_IN_FLIGHT at a time.
+
+    :param fetch_page: function returning a page of a ruleset, from its name and page number,
+      or None if the ruleset does not exist. It raises RulesetFetchException if the query failed.
+    :param ruleset_names: the names of the rulesets
+    :param concurrency: the maximum number of pages fetched at the same time
+    :return: an iterator of ruleset pages ({"id": ..., "name": ..., "rules": [...]})
+    :raises RulesetFetchException: if a page cannot be fetched, the pages already yielded are incomplete
     """
-    return "[\"" + ("\", \"".join(ruleset_names)) + "\"]"
+    with ThreadPoolExecutor(concurrency) as executor:
+        first_pages = [executor.submit(fetch_page, ruleset_name, 0) for ruleset_name in ruleset_names]
+        try:
+            for ruleset_name, first_page in zip(ruleset_names, first_pages):
+                pages = deque([first_page])
+                next_page_number = 1
+                while pages:
+                    page = pages.popleft().result()
+                    if page is None:
+                        if next_page_number > 1:
+                            # the previous page was full, the ruleset cannot be missing now
+                            raise RulesetFetchException(f"ruleset {ruleset_name} not found after the first page")
+                        break
+                    yield page
+                    if len(page['rules']) < RULES_PAGE_SIZE:
+                        break
+                    # The page is full, there may be more rules: keep several pages in flight.
+                    while len(pages) < RULES_PAGES_IN_FLIGHT:
+                        pages.append(executor.submit(fetch_page, ruleset_name, next_page_number))
+                        next_page_number += 1
+                for pending_page in pages:
+                    pending_page.cancel()
+        finally:
+            for first_page in first_pages:
+                first_page.cancel()
 
 
-def graphql_get_rulesets(api_token: str, ruleset_names: typing.List[str]):
+def merge_ruleset_pages(pages: typing.Iterable[dict]) -> typing.List[dict]:
     """
-    Get rulesets by their names
+    Merge the pages of rulesets into complete rulesets
+    :param pages: the pages of the rulesets
+    :return: the rulesets with all their rules, in the order of the pages
+    """
+    rulesets: typing.Dict[str, dict] = {}
+    for page in pages:
+        if page['name'] in rulesets:
+            rulesets[page['name']]['rules'].extend(page['rules'])
+        else:
+            rulesets[page['name']] = dict(page, rules=list(page['rules']))
+    return list(rulesets.values())
+
+
+def graphql_iter_rulesets(api_token: str, ruleset_names: typing.List[str],
+                          profile: str = RULESET_PROFILE_FULL,
+                          concurrency: int = RULESETS_FETCHED_CONCURRENTLY) -> typing.Iterator[dict]:
+    """
+    Get rulesets by their names, page by page. Pages can be converted into rules
+    as soon as they arrive (e.g. using convert_rules_to_rosie_rules).
 
     :param api_token: the API token to access the GraphQL API
     :param ruleset_names: the names of all rulesets to fetch
+    :param profile: the fields to fetch for each rule (RULESET_PROFILE_RUNTIME or RULESET_PROFILE_FULL)
+    :param concurrency: the maximum number of pages fetched at the same time
+    :return: an iterator of ruleset pages ({"id": ..., "name": ..., "rules": [...]})
+    :raises RulesetFetchException: if a page of a ruleset cannot be fetched
     """
-    if not ruleset_names or not api_token:
+    if not ruleset_names or not api_token or profile not in RULE_FIELDS_FOR_PROFILE:
         raise ValueError
 
-    ruleset_names_string = get_rulesets_name_string(ruleset_names)
-    query = """
-        {
-            ruleSetsForClient(names: """ + ruleset_names_string + """){
-            id
-            name
-            rules(howmany: 10000, skip: 0){
-              id
-              name
-              content
-              language
-              ruleType
-              pattern
-              patternMultiline
-              elementChecked
-              tests {
-                id
-                name
-                shouldFail
-                content
-                description
-              }
-            }
-          }
-        }"""
-    data = do_graphql_query(api_token, {"query": query})
-    if 'ruleSetsForClient' in data:
-        return data['ruleSetsForClient']
-    return None
+    def fetch_page(ruleset_name: str, page_number: int) -> typing.Optional[dict]:
+        payload = GET_RULESETS_QUERIES[profile].payload({"names": [ruleset_name],
+                                                         "howmany": RULES_PAGE_SIZE,
+                                                         "skip": page_number * RULES_PAGE_SIZE})
+        data = do_graphql_query(api_token, payload)
+        if data is None:
+            raise RulesetFetchException(f"cannot fetch page {page_number} of ruleset {ruleset_name}")
+        if not data.get('ruleSetsForClient'):
+            return None
+        return data['ruleSetsForClient'][0]
+
+    return iter_ruleset_pages(fetch_page, ruleset_names, concurrency)
+
+
+def graphql_get_rulesets(api_token: str, ruleset_names: typing.List[str], profile: str = RULESET_PROFILE_FULL):
+    """
+    Get rulesets by their names
+
+    :param api_token: the API token to access the GraphQL API
+    :param ruleset_names: the names of all rulesets to fetch
+    :param profile: the fields to fetch for each rule (RULESET_PROFILE_RUNTIME or RULESET_PROFILE_FULL)
+    :raises RulesetFetchException: if a page of a ruleset cannot be fetched
+    """
+    return merge_ruleset_pages(graphql_iter_rulesets(api_token, ruleset_names, profile))
 
 
-def graphql_get_ruleset(api_token: str, ruleset_name: str):
+def graphql_get_ruleset(api_token: str, ruleset_name: str, profile: str = RULESET_PROFILE_FULL):
     """
     Get rulesets by their names
 
     :param api_token: the API token to access the GraphQL API
     :param ruleset_name: the name of the ruleset to fetch
+    :param profile: the fields to fetch for each rule (RULESET_PROFILE_RUNTIME or RULESET_PROFILE_FULL)
+    :raises RulesetFetchException: if a page of the ruleset cannot be fetched
     """
-    if not ruleset_name:
+    if not ruleset_name or profile not in RULE_FIELDS_FOR_PROFILE:
         raise ValueError
 
-    query = """
-        {
-          ruleSet(name: \"""" + ruleset_name + """\"){
-            id
-            name
-            rules(howmany: 10000, skip: 0){
-              id
-              name
-              content
-              language
-              ruleType
-              pattern
-              patternMultiline
-              elementChecked
-              tests {
-                id
-                name
-                shouldFail
-                content
-                description
-              }
-            }
-          }
-        }"""
-    data = do_graphql_query(api_token, {"query": query})
-    if 'ruleSet' in data:
+    def fetch_page(name: str, page_number: int) -> typing.Optional[dict]:
+        payload = GET_RULESET_QUERIES[profile].payload({"name": name,
+                                                        "howmany": RULES_PAGE_SIZE,
+                                                        "skip": page_number * RULES_PAGE_SIZE})
+        data = do_graphql_query(api_token, payload)
+        if data is None:
+            raise RulesetFetchException(f"cannot fetch page {page_number} of ruleset {name}")
+        if not data.get('ruleSet'):
+            return None
         return data['ruleSet']
-    return None
-
 
+    rulesets = merge_ruleset_pages(iter_ruleset_pages(fetch_page, [ruleset_name]))
+    if rulesets:
+        return rulesets[0]
+    return None
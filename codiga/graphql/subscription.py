@@ -0,0 +1,173 @@
+"""
+GraphQL subscriptions over WebSocket using the graphql-transport-ws protocol.
+They let the CLI wait for an analysis without polling the API. When subscriptions
+are not available, we fall back to polling.
+"""
+import json
+import socket
+import typing
+
+from codiga.common import log
+from codiga.constants import API_TOKEN_HEADER, GRAPHQL_ENDPOINT_PROD_URL, USER_AGENT_HEADER, USER_AGENT_CLI, \
+    MAX_POLLING_REQUESTS
+from codiga.exceptions.subscription_exception import SubscriptionException
+from codiga.exceptions.websocket_exception import WebSocketException
+from codiga.graphql.constants import is_analysis_complete
+from codiga.graphql.registry import register_query, GraphQLQuery
+from codiga.utils.poller import Deadline, poll
+from codiga.utils.websocket import websocket_connect
+
+GRAPHQL_TRANSPORT_WS_PROTOCOL = "graphql-transport-ws"
+SUBSCRIPTION_ID = "1"
+
+# Minimum timeout when waiting for a message, a zero timeout makes the socket non-blocking
+MIN_RECEIVE_TIMEOUT_SECS = 0.01
+# Maximum time without checking the analysis, in case a notification is lost
+SAFETY_POLL_SECS = 10
+
+ANALYSIS_UPDATED_SUBSCRIPTION = register_query("""
+    subscription AnalysisUpdated($id: Long!) {
+      analysisUpdated(id: $id){
+        id
+        status
+      }
+    }
+""")
+
+
+def get_subscription_endpoint(endpoint: str) -> str:
+    """
+    :param endpoint: the HTTP GraphQL endpoint
+    :return: the WebSocket endpoint for subscriptions
+    """
+    if endpoint.startswith("https://"):
+        return "wss://" + endpoint[len("https://"):]
+    if endpoint.startswith("http://"):
+        return "ws://" + endpoint[len("http://"):]
+    return endpoint
+
+
+class GraphQLSubscription:
+    """
+    A subscription to a GraphQL operation. The connection is initialized
+    and the subscription started when the object is created.
+    """
+    def __init__(self, endpoint: str, api_token: str, query: GraphQLQuery, variables: dict, timeout: float):
+        self.connection = websocket_connect(endpoint, {USER_AGENT_HEADER: USER_AGENT_CLI},
+                                            GRAPHQL_TRANSPORT_WS_PROTOCOL, timeout)
+        try:
+            self._send({"type": "connection_init", "payload": {API_TOKEN_HEADER: api_token}})
+            message = self._receive()
+            while message.get("type") == "ping":
+                message = self._receive()
+            if message.get("type") != "connection_ack":
+                raise SubscriptionException(f"connection not acknowledged: {message}")
+            self._send({"id": SUBSCRIPTION_ID, "type": "subscribe", "payload": query.payload(variables)})
+        except BaseException:
+            self.connection.close()
+            raise
+
+    def _send(self, message: dict):
+        self.connection.send_text(json.dumps(message))
+
+    def _receive(self) -> dict:
+        message = self.connection.receive_text()
+        try:
+            return json.loads(message)
+        except ValueError as exception:
+            raise SubscriptionException(f"invalid message {message}") from exception
+
+    def next_data(self, timeout: float) -> typing.Optional[dict]:
+        """
+        Wait for the next result of the subscription
+        :param timeout: the maximum number of seconds to wait
+        :return: the data of the result or None if the server completed the subscription
+        :raise SubscriptionException: if the server returns an error
+        """
+        self.connection.settimeout(max(timeout, MIN_RECEIVE_TIMEOUT_SECS))
+        while True:
+            message = self._receive()
+            message_type = message.get("type")
+            if message_type == "ping":
+                self._send({"type": "pong"})
+            elif message_type == "next":
+                payload = message.get("payload") or {}
+                if payload.get("errors"):
+                    raise SubscriptionException(f"subscription error: {payload['errors']}")
+                return payload.get("data")
+            elif message_type == "error":
+                raise SubscriptionException(f"subscription error: {message.get('payload')}")
+            elif message_type == "complete":
+                return None
+
+    def close(self):
+        """
+        Stop the subscription and close the connection.
+        """
+        try:
+            self._send({"id": SUBSCRIPTION_ID, "type": "complete"})
+        except OSError:
+            pass
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def wait_with_subscription(api_token: str, analysis_id, get_analysis: typing.Callable[[], typing.Optional[dict]],
+                           deadline: Deadline, endpoint: str = GRAPHQL_ENDPOINT_PROD_URL) -> dict:
+    """
+    Wait for an analysis to complete using a subscription. If no notification is received
+    for SAFETY_POLL_SECS, the analysis is requested in case a notification was lost.
+    :param api_token: the API token to access the GraphQL API
+    :param analysis_id: the identifier of the analysis
+    :param get_analysis: function returning the analysis
+    :param deadline: when to stop waiting
+    :param endpoint: the HTTP GraphQL endpoint
+    :return: the complete analysis
+    :raise SubscriptionException: if the subscription fails
+    """
+    with GraphQLSubscription(get_subscription_endpoint(endpoint), api_token, ANALYSIS_UPDATED_SUBSCRIPTION,
+                             {"id": analysis_id}, deadline.remaining()) as subscription:
+        # the analysis may have completed before the subscription started
+        analysis = get_analysis()
+        while not is_analysis_complete(analysis):
+            try:
+                data = subscription.next_data(min(deadline.remaining(), SAFETY_POLL_SECS))
+            except socket.timeout:
+                if deadline.expired():
+                    raise
+                analysis = get_analysis()
+                continue
+            if data is None:
+                raise SubscriptionException("subscription completed before the analysis")
+            if is_analysis_complete(data.get("analysisUpdated")):
+                analysis = get_analysis()
+                if not is_analysis_complete(analysis):
+                    raise SubscriptionException("analysis notified as complete but not complete yet")
+        return analysis
+
+
+def wait_for_analysis(api_token: str, analysis_id, get_analysis: typing.Callable[[], typing.Optional[dict]],
+                      deadline: Deadline, subscribe: bool = False, endpoint: str = GRAPHQL_ENDPOINT_PROD_URL) -> dict:
+    """
+    Wait for an analysis to complete. If subscribe is True, we are notified by the API when the
+    analysis completes and fall back to polling if the subscription is not available.
+    :param api_token: the API token to access the GraphQL API
+    :param analysis_id: the identifier of the analysis
+    :param get_analysis: function returning the analysis
+    :param deadline: when to stop waiting
+    :param subscribe: True to use a subscription
+    :param endpoint: the HTTP GraphQL endpoint
+    :return: the complete analysis
+    :raise PollingTimeoutException: if the analysis is not complete before the deadline
+    """
+    if subscribe:
+        try:
+            return wait_with_subscription(api_token, analysis_id, get_analysis, deadline, endpoint)
+        except (OSError, WebSocketException, SubscriptionException) as exception:
+            log.info("subscription not available (%s), polling the analysis", exception)
+    return poll(get_analysis, is_analysis_complete, deadline, max_requests=MAX_POLLING_REQUESTS)
@@ -0,0 +1,79 @@
+"""Generate the codiga.lock file from the codiga.yml file. When the codiga.lock file
+exists, codiga-git-hook loads the rules from it without using the network.
+
+Usage:
+    codiga-lock [options]
+
+Global options:
+    -c FILE                  Path of the codiga.yml file (default: codiga.yml)
+    -o FILE                  Path of the lock file (default: codiga.lock, next to the codiga.yml file)
+Example:
+    $ codiga-lock -c codiga.yml
+"""
+
+import os
+import logging
+import sys
+
+import docopt
+
+from .constants import API_TOKEN_ENVIRONMENT_VARIABLE
+from .exceptions.ruleset_fetch_exception import RulesetFetchException
+from .graphql.rosie import graphql_iter_rulesets, RULESET_PROFILE_RUNTIME
+from .model.rosie_rule import convert_rules_to_rosie_rules
+from .rosie.lockfile import LOCKFILE_NAME, write_lockfile
+from .rosie.ruleset import get_rulesets_from_codigafile
+from .version import __version__
+
+logging.basicConfig()
+
+log = logging.getLogger('codiga')
+
+
+def main(argv=None):
+    """
+    Make the magic happen.
+    :param argv:
+    :return:
+    """
+    options = docopt.docopt(__doc__, argv=argv, version=__version__)
+
+    codigafile = options['-c'] or "codiga.yml"
+    lockfile = options['-o'] or os.path.join(os.path.dirname(codigafile), LOCKFILE_NAME)
+
+    log.addHandler(logging.StreamHandler())
+    log.setLevel(logging.INFO)
+
+    try:
+        api_token = os.environ.get(API_TOKEN_ENVIRONMENT_VARIABLE)
+
+        if not api_token:
+            log.info('%s environment variable not defined!', API_TOKEN_ENVIRONMENT_VARIABLE)
+            sys.exit(1)
+
+        if not os.path.isfile(codigafile):
+            log.info('Cannot find %s', codigafile)
+            sys.exit(1)
+
+        rulesets = get_rulesets_from_codigafile(codigafile)
+        if not rulesets:
+            log.info('No ruleset in %s', codigafile)
+            sys.exit(1)
+
+        try:
+            rosie_rules = convert_rules_to_rosie_rules(graphql_iter_rulesets(api_token, rulesets,
+                                                                             RULESET_PROFILE_RUNTIME))
+        except RulesetFetchException as e:
+            log.error("Cannot get the rules of the rulesets: %s", e)
+            sys.exit(1)
+        if not rosie_rules:
+            log.error("Cannot get the rules of the rulesets")
+            sys.exit(1)
+
+        write_lockfile(lockfile, rulesets, rosie_rules)
+        log.info("%s rules written in %s", len(rosie_rules), lockfile)
+
+        sys.exit(0)
+    except KeyboardInterrupt:  # pragma: no cover
+        log.info('Aborted')
+        sys.exit(1)
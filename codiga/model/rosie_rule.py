@@ -1,6 +1,8 @@
 import typing
 from dataclasses import dataclass
 
+from codiga.model.violation_filter import ViolationFilter
+
 
 @dataclass
 class RosieRule:
@@ -10,6 +12,10 @@ class RosieRule:
     rule_type: str
     entity_checked: typing.Optional[str]
     pattern: typing.Optional[str]
+    severity: typing.Optional[str] = None
+    category: typing.Optional[str] = None
+    # literal tokens, the rule can only report a violation in a file containing one of them
+    tokens: typing.Optional[typing.List[str]] = None
 
     def to_json(self):
         return {
@@ -41,12 +47,26 @@ ELEMENT_CHECKED_TO_ENTITY_CHECKED_FOR_API: typing.Dict[str, str] = {
 }
 
 
-def convert_rules_to_rosie_rules(rulesets_api) -> typing.List[RosieRule]:
+def convert_rules_to_rosie_rules(rulesets_api,
+                                 rule_filter: typing.Optional[ViolationFilter] = None) -> typing.List[RosieRule]:
+    """
+    Convert the rulesets returned by the GraphQL API into rules to send to Rosie.
+    :param rulesets_api: the rulesets from the GraphQL API
+    :param rule_filter: if defined, only keep the rules with a severity and category matching the filter
+    :return: the list of rules to send to Rosie
+    """
     rules = []
     for ruleset in rulesets_api:
         ruleset_name = ruleset['name']
 
         for rule in ruleset['rules']:
+            severity = rule.get('severity')
+            category = rule.get('category')
+
+            # Do not send rules that cannot report a violation we are interested in
+            if rule_filter is not None and not rule_filter.matches(severity, category):
+                continue
+
             rule_name = f"{ruleset_name}/{rule['name']}"
             rule_content = rule['content']
             language = rule['language'].lower()
@@ -66,6 +86,21 @@ def convert_rules_to_rosie_rules(rulesets_api) -> typing.List[RosieRule]:
                                    language=language,
                                    rule_type=rule_type,
                                    entity_checked=entity_checked,
-                                   pattern=pattern)
+                                   pattern=pattern,
+                                   severity=severity,
+                                   category=category)
             rules.append(rosie_rule)
     return rules
+
+
+def filter_rosie_rules(rules: typing.List[RosieRule],
+                       rule_filter: typing.Optional[ViolationFilter]) -> typing.List[RosieRule]:
+    """
+    Keep only the rules with a severity and category matching a filter
+    :param rules: the rules to filter
+    :param rule_filter: the filter, keep all rules if None
+    :return: the rules matching the filter
+    """
+    if rule_filter is None:
+        return rules
+    return [rule for rule in rules if rule_filter.matches(rule.severity, rule.category)]
@@ -0,0 +1,83 @@
+"""
+Defines a filter on the severity and the category of a violation.
+"""
+import typing
+from dataclasses import dataclass
+
+from codiga.rosie.constants import SEVERITIES, CATEGORIES
+
+
+def get_severity_rank(severity: str) -> int:
+    """
+    Get the rank of a severity, the higher the rank, the more important the severity.
+    :param severity: the severity (e.g. CRITICAL)
+    :return: the rank of the severity or -1 if the severity is unknown
+    """
+    try:
+        return SEVERITIES.index(severity.upper())
+    except ValueError:
+        return -1
+
+
+@dataclass
+class ViolationFilter:
+    """
+    Keep only the violations that have at least a given severity
+    and belong to a given set of categories. A None value means
+    that any severity (or category) is accepted.
+    """
+    min_severity: typing.Optional[str] = None
+    categories: typing.Optional[typing.Set[str]] = None
+
+    def matches(self, severity: typing.Optional[str], category: typing.Optional[str]) -> bool:
+        """
+        Check if a severity and a category match the filter. Unknown (None) values
+        always match since we cannot decide to exclude them.
+        :param severity: the severity to check
+        :param category: the category to check
+        :return: True if the severity and category match the filter
+        """
+        if self.min_severity is not None and severity is not None:
+            if get_severity_rank(severity) < get_severity_rank(self.min_severity):
+                return False
+        if self.categories is not None and category is not None:
+            if category.upper() not in self.categories:
+                return False
+        return True
+
+    def is_empty(self) -> bool:
+        """
+        :return: True if the filter accepts everything
+        """
+        return self.min_severity is None and self.categories is None
+
+    @staticmethod
+    def from_options(min_severity: typing.Optional[str],
+                     categories: typing.Optional[typing.Union[str, typing.List[str]]]) -> 'ViolationFilter':
+        """
+        Build a filter from user-provided values (command line or configuration file).
+        :param min_severity: the minimum severity (e.g. ERROR) or None
+        :param categories: the categories as a comma-separated string or a list, or None
+        :return: the filter
+        :raise ValueError: if a severity or a category is invalid
+        """
+        severity_value = None
+        if min_severity:
+            severity_value = str(min_severity).strip().upper()
+            if severity_value not in SEVERITIES:
+                raise ValueError(f"invalid severity {min_severity}, valid values: {','.join(SEVERITIES)}")
+
+        categories_value = None
+        if categories:
+            if isinstance(categories, str):
+                categories = categories.split(",")
+            categories_value = set()
+            for category in categories:
+                category_value = str(category).strip().upper()
+                if not category_value:
+                    continue
+                if category_value not in CATEGORIES:
+                    raise ValueError(f"invalid category {category}, valid values: {','.join(CATEGORIES)}")
+                categories_value.add(category_value)
+
+        return ViolationFilter(min_severity=severity_value, categories=categories_value)
@@ -5,35 +5,40 @@ Usage:
 
 Global options:
     -p PROJECT_NAME          Project name to show
+    --projects NAMES         Comma-separated list of projects to export (bulk mode)
+    --all                    Export all the projects visible with the API token (bulk mode)
+    --history                In bulk mode, export all the analyses of each project instead of the last one
+    --max-analyses N         In bulk mode with --history, maximum number of analyses per project
+    --format FORMAT          Format of the bulk export: ndjson or csv [default: ndjson]
 Example:
     $ codiga-project -p "MY SUPER PROJECT"
+    $ codiga-project --projects "project1,project2" --format csv
+    $ codiga-project --all --history --max-analyses 50
 """
 
 import os
+import csv
 import json
 import logging
 import sys
+import typing
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import docopt
 
 from .constants import API_TOKEN_ENVIRONMENT_VARIABLE
-from .graphql.common import do_graphql_query
+from .graphql.cache import do_cached_graphql_query
+from .graphql.common import do_graphql_query, do_graphql_queries, BATCH_MAX_SIZE
+from .graphql.registry import register_query, GraphQLQuery
 
 from .version import __version__
 
 log = logging.getLogger('codiga')
 
 
-def get_project_information(api_token: str, project_name: str) -> dict:
-    """
-    Get the project information with the latest analysis data using the project name
-    :param api_token: the api token to the GraphQL API
-    :param project_name: name of the project
-    :return: the project identifier or None is exception or non-existent project.
-    """
-    query = """
-    {
-        project (name: \"""" + project_name + """\") {
+PROJECT_INFORMATION_QUERY = register_query("""
+    query ProjectInformation($name: String!) {
+        project(name: $name) {
             id
             name
             lastAnalysis{
@@ -41,8 +46,8 @@ def get_project_information(api_token: str, project_name: str) -> dict:
               techdebt{
                 score
                 grade
-              } 
-              summary { 
+              }
+              summary {
                 violations
                 duplicates
                 duplicated_lines
@@ -68,11 +73,245 @@ def get_project_information(api_token: str, project_name: str) -> dict:
             }
         }
     }
+""")
+
+
+def get_project_information(api_token: str, project_name: str) -> dict:
     """
-    response_json = do_graphql_query(api_token, {"query": query})
+    Get the project information with the latest analysis data using the project name
+    :param api_token: the api token to the GraphQL API
+    :param project_name: name of the project
+    :return: the project identifier or None is exception or non-existent project.
+    """
+    # the last analysis of a project changes, the response is cached for a short time only
+    response_json = do_cached_graphql_query(api_token, PROJECT_INFORMATION_QUERY.payload({"name": project_name}),
+                                            lambda data: False)
     return response_json['project']
 
 
+ALL_PROJECTS_QUERY = register_query("""
+    query AllProjects($howmany: Int!, $skip: Int!) {
+        projects(howmany: $howmany, skip: $skip) {
+            name
+        }
+    }
+""")
+
+PROJECT_ANALYSES_QUERY = register_query("""
+    query ProjectAnalyses($name: String!, $howmany: Int!, $skip: Int!) {
+        project(name: $name) {
+            id
+            name
+            analysesCount
+            analyses(howmany: $howmany, skip: $skip) {
+              id
+              status
+              revision
+              timestamp
+              techdebt{
+                score
+                grade
+              }
+              summary {
+                violations
+                duplicates
+                complexFunctions
+                longFunctions
+              }
+            }
+        }
+    }
+""")
+
+FORMAT_NDJSON = "ndjson"
+FORMAT_CSV = "csv"
+FORMATS = [FORMAT_NDJSON, FORMAT_CSV]
+
+PROJECTS_PAGE_SIZE = 100
+ANALYSES_PAGE_SIZE = 100
+# Maximum number of batched requests sent at the same time
+MAX_CONCURRENT_REQUESTS = 8
+
+PROJECT_COLUMNS = ["project", "id", "status", "score", "grade", "violations", "duplicates", "duplicated_lines",
+                   "complexFunctions", "longFunctions"]
+ANALYSIS_COLUMNS = ["project", "id", "status", "revision", "timestamp", "score", "grade", "violations",
+                    "duplicates", "complexFunctions", "longFunctions"]
+
+
+def get_all_project_names(api_token: str) -> typing.Optional[typing.List[str]]:
+    """
+    Get the names of all the projects visible with the API token
+    :param api_token: the api token to the GraphQL API
+    :return: the names of the projects, None if a page of projects cannot be fetched
+    """
+    names = []
+    while True:
+        data = do_graphql_query(api_token, ALL_PROJECTS_QUERY.payload({"howmany": PROJECTS_PAGE_SIZE,
+                                                                       "skip": len(names)}))
+        if data is None:
+            return None
+        projects = data.get('projects') or []
+        names.extend(project['name'] for project in projects)
+        if len(projects) < PROJECTS_PAGE_SIZE:
+            return names
+
+
+def execute_batches(api_token: str, queries: typing.List[typing.Tuple[GraphQLQuery, dict]]) \
+        -> typing.Iterator[typing.Tuple[int, typing.Optional[dict]]]:
+    """
+    Execute queries in batches, several batches at the same time.
+    :param api_token: the api token to the GraphQL API
+    :param queries: the queries with their variables
+    :return: the index of each query with its data, in the order the batches complete
+    """
+    batches = [list(range(start, min(start + BATCH_MAX_SIZE, len(queries))))
+               for start in range(0, len(queries), BATCH_MAX_SIZE)]
+    if not batches:
+        return
+    with ThreadPoolExecutor(max_workers=min(len(batches), MAX_CONCURRENT_REQUESTS)) as executor:
+        futures = {executor.submit(do_graphql_queries, api_token, [queries[index] for index in batch]): batch
+                   for batch in batches}
+        for future in as_completed(futures):
+            for index, data in zip(futures[future], future.result()):
+                yield index, data
+
+
+def get_projects_information(api_token: str, project_names: typing.List[str],
+                             failed: typing.Optional[typing.List[str]] = None) -> typing.Iterator[dict]:
+    """
+    Get the information of many projects, with batched and concurrent queries.
+    :param api_token: the api token to the GraphQL API
+    :param project_names: names of the projects
+    :param failed: if defined, the names of the projects that cannot be fetched are added to it
+    :return: the projects, as they are received
+    """
+    queries = [(PROJECT_INFORMATION_QUERY, {"name": name}) for name in project_names]
+    for index, data in execute_batches(api_token, queries):
+        project = (data or {}).get('project')
+        if not project:
+            log.error("Cannot get information for project %s", project_names[index])
+            if failed is not None:
+                failed.append(project_names[index])
+            continue
+        yield project
+
+
+def get_projects_analyses(api_token: str, project_names: typing.List[str],
+                          max_analyses: typing.Optional[int] = None,
+                          failed: typing.Optional[typing.List[str]] = None) \
+        -> typing.Iterator[typing.Tuple[str, dict]]:
+    """
+    Get the analyses of many projects. The first page of each project gives the number of
+    analyses, all the other pages are then requested at once.
+    :param api_token: the api token to the GraphQL API
+    :param project_names: names of the projects
+    :param max_analyses: maximum number of analyses per project, all if None
+    :param failed: if defined, the names of the projects whose analyses cannot all be fetched are added to it
+    :return: the project name with each analysis, as they are received
+    """
+    page_size = min(ANALYSES_PAGE_SIZE, max_analyses) if max_analyses else ANALYSES_PAGE_SIZE
+    first_pages = [(PROJECT_ANALYSES_QUERY, {"name": name, "howmany": page_size, "skip": 0})
+                   for name in project_names]
+
+    next_pages = []
+    for index, data in execute_batches(api_token, first_pages):
+        project = (data or {}).get('project')
+        if not project:
+            log.error("Cannot get analyses for project %s", project_names[index])
+            if failed is not None:
+                failed.append(project_names[index])
+            continue
+        for analysis in project['analyses'] or []:
+            yield project['name'], analysis
+
+        total = project.get('analysesCount') or 0
+        if max_analyses:
+            total = min(total, max_analyses)
+        for skip in range(page_size, total, page_size):
+            next_pages.append((PROJECT_ANALYSES_QUERY, {"name": project['name'],
+                                                        "howmany": min(page_size, total - skip), "skip": skip}))
+
+    for index, data in execute_batches(api_token, next_pages):
+        project = (data or {}).get('project')
+        if not project:
+            log.error("Cannot get analyses for project %s", next_pages[index][1]["name"])
+            if failed is not None and next_pages[index][1]["name"] not in failed:
+                failed.append(next_pages[index][1]["name"])
+            continue
+        for analysis in project['analyses'] or []:
+            yield project['name'], analysis
+
+
+def get_project_row(project: dict) -> dict:
+    """
+    :param project: the project information
+    :return: the row of the project in the bulk export
+    """
+    analysis = project.get('lastAnalysis') or {}
+    techdebt = analysis.get('techdebt') or {}
+    summary = analysis.get('summary') or {}
+    return {
+        "project": project.get('name'),
+        "id": project.get('id'),
+        "status": analysis.get('status'),
+        "score": techdebt.get('score'),
+        "grade": techdebt.get('grade'),
+        "violations": summary.get('violations'),
+        "duplicates": summary.get('duplicates'),
+        "duplicated_lines": summary.get('duplicated_lines'),
+        "complexFunctions": summary.get('complexFunctions'),
+        "longFunctions": summary.get('longFunctions')
+    }
+
+
+def get_analysis_row(project_name: str, analysis: dict) -> dict:
+    """
+    :param project_name: the name of the project
+    :param analysis: an analysis of the project
+    :return: the row of the analysis in the bulk export
+    """
+    techdebt = analysis.get('techdebt') or {}
+    summary = analysis.get('summary') or {}
+    return {
+        "project": project_name,
+        "id": analysis.get('id'),
+        "status": analysis.get('status'),
+        "revision": analysis.get('revision'),
+        "timestamp": analysis.get('timestamp'),
+        "score": techdebt.get('score'),
+        "grade": techdebt.get('grade'),
+        "violations": summary.get('violations'),
+        "duplicates": summary.get('duplicates'),
+        "complexFunctions": summary.get('complexFunctions'),
+        "longFunctions": summary.get('longFunctions')
+    }
+
+
+def write_rows(rows: typing.Iterable[dict], columns: typing.List[str], output_format: str, output=None) -> int:
+    """
+    Write rows as they are produced.
+    :param rows: the rows
+    :param columns: the columns (used for CSV)
+    :param output_format: ndjson or csv
+    :param output: the stream to write to, stdout by default
+    :return: the number of rows written
+    """
+    output = output or sys.stdout
+    count = 0
+    writer = None
+    if output_format == FORMAT_CSV:
+        writer = csv.DictWriter(output, fieldnames=columns, lineterminator="\n")
+        writer.writeheader()
+    for row in rows:
+        if writer:
+            writer.writerow(row)
+        else:
+            output.write(json.dumps(row) + "\n")
+        output.flush()
+        count = count + 1
+    return count
+
+
 def main(argv=None):
     """
     Make the magic happen.
@@ -82,6 +321,11 @@ def main(argv=None):
     options = docopt.docopt(__doc__, argv=argv, version=__version__)
 
     project_name = options['-p']
+    project_names = options['--projects']
+    all_projects = options['--all']
+    history = options['--history']
+    output_format = options['--format']
+    max_analyses = options['--max-analyses']
 
     log.addHandler(logging.StreamHandler())
     log.setLevel(logging.INFO)
@@ -89,6 +333,43 @@ def main(argv=None):
     try:
         api_token = os.environ.get(API_TOKEN_ENVIRONMENT_VARIABLE)
 
+        if project_names or all_projects:
+            if not api_token:
+                log.info('API Token not defined!')
+                sys.exit(1)
+
+            if output_format not in FORMATS:
+                log.info('Invalid format %s, use one of %s', output_format, ", ".join(FORMATS))
+                sys.exit(1)
+
+            try:
+                max_analyses = int(max_analyses) if max_analyses else None
+            except ValueError:
+                log.info('Invalid maximum number of analyses')
+                sys.exit(1)
+
+            if all_projects:
+                names = get_all_project_names(api_token)
+                if names is None:
+                    log.error("Cannot get the list of projects")
+                    sys.exit(1)
+            else:
+                names = [name.strip() for name in project_names.split(",") if name.strip()]
+
+            failed: typing.List[str] = []
+            if history:
+                rows = (get_analysis_row(name, analysis)
+                        for name, analysis in get_projects_analyses(api_token, names, max_analyses, failed))
+                count = write_rows(rows, ANALYSIS_COLUMNS, output_format)
+            else:
+                rows = (get_project_row(project) for project in get_projects_information(api_token, names, failed))
+                count = write_rows(rows, PROJECT_COLUMNS, output_format)
+            log.info("%s rows exported for %s projects", count, len(names))
+            if failed:
+                log.error("Incomplete export, data missing for %s projects: %s", len(failed), ",".join(failed))
+                sys.exit(1)
+            sys.exit(0)
+
         if not project_name:
             log.info('Project name not defined!')
             sys.exit(1)
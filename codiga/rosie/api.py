@@ -1,24 +1,184 @@
+"""
+Client of the Rosie analysis server.
+
+Requests are compressed with gzip. If the server rejects compressed requests, they are sent
+again without compression and compression is not used anymore for this server.
+
+Rules can be sent by reference: requests announce the protocol with the X-Rosie-Rule-Cache
+header and each rule has a contentHash (SHA-256 of contentBase64). A server implementing the
+protocol keeps the rules it receives and answers with the same header. Then, the content of
+the rules already sent is omitted, only their hash is sent. When the server does not know a
+hash anymore (e.g. after a restart), it answers with status 409 and {"missingRules": [hashes]}
+and the request is sent again with the content of these rules.
+"""
+import gzip
 import logging
 import os
+import threading
 import time
 
 import requests
 import requests.exceptions
-from typing import List
-
-
+from typing import Dict, List, Optional, Set
 
+from codiga.constants import ACCEPT_ENCODING_HEADER, ACCEPT_ENCODING, ROSIE_COMPRESSION_ENVIRONMENT_VARIABLE, \
+    ROSIE_RULES_BY_REFERENCE_ENVIRONMENT_VARIABLE
+from codiga.exceptions.rosie_analysis_exception import RosieAnalysisException
 from codiga.model.rosie_rule import RosieRule
 from codiga.model.violation import Violation
+from codiga.rosie.lockfile import get_rule_content_hash
+from codiga.rosie.telemetry import RuleStats, record_rule_responses
+from codiga.utils.json_utils import loads, dumps_bytes
 
 ROSIE_URL = "https://analysis.codiga.io/analyze"
+# Maximum number of seconds to wait for the analysis of a file
+ROSIE_TIMEOUT_SECS = 10
+
+RULE_CACHE_HEADER = "X-Rosie-Rule-Cache"
+RULE_CACHE_VERSION = "1"
+RULE_CACHE_MISS_STATUS = 409
+
+# Requests smaller than this are not compressed
+COMPRESSION_MIN_BYTES = 1024
+COMPRESSION_LEVEL = 6
+# Statuses returned by servers that do not accept compressed requests
+COMPRESSION_REJECTED_STATUSES = {400, 415}
 
 log: logging.Logger = logging.getLogger('codiga')
 
 
+def is_enabled(environment_variable: str) -> bool:
+    """
+    :param environment_variable: the environment variable of the feature
+    :return: False if the feature is disabled by the environment variable
+    """
+    return os.environ.get(environment_variable, "1").lower() not in ["0", "false", "no"]
+
+
+def rule_to_payload(rule: RosieRule, rule_hash: Optional[str], by_reference: bool) -> dict:
+    """
+    Serialize a rule for a request
+    :param rule: the rule
+    :param rule_hash: the hash of the rule content, None if the protocol is not used
+    :param by_reference: True to send only the hash of the content
+    :return: the rule for the request
+    """
+    result = rule.to_json()
+    if rule_hash is not None:
+        result["contentHash"] = rule_hash
+    if by_reference:
+        del result["contentBase64"]
+    return result
+
+
+class RosieSession:
+    """
+    Connections to a Rosie server and what we know about it: if it accepts compressed
+    requests and which rules it already has. A session is shared by all threads.
+    """
+    def __init__(self, server_url: str, compress: bool = True, rules_by_reference: bool = True):
+        """
+        :param server_url: the URL of the Rosie server
+        :param compress: True to compress the requests
+        :param rules_by_reference: True to use the rule-by-reference protocol when the server supports it
+        """
+        self.server_url = server_url
+        self.compress = compress
+        self.rules_by_reference = rules_by_reference
+        self.rule_cache_supported = False
+        self.http_session = requests.Session()
+        self.http_session.headers[ACCEPT_ENCODING_HEADER] = ACCEPT_ENCODING
+        self._sent_rules: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def get_rules_payload(self, rules: List[RosieRule], rule_hashes: List[str]) -> List[dict]:
+        """
+        :param rules: the rules of the request
+        :param rule_hashes: the hash of each rule
+        :return: the rules to send, only the hash of the rules the server already has
+        """
+        if not self.rules_by_reference:
+            return [rule.to_json() for rule in rules]
+        with self._lock:
+            sent_rules = set(self._sent_rules) if self.rule_cache_supported else set()
+        return [rule_to_payload(rule, rule_hash, rule_hash in sent_rules) for rule, rule_hash in zip(rules, rule_hashes)]
+
+    def post(self, payload: dict, timeout) -> requests.Response:
+        """
+        Send a request, compressed when the server accepts it
+        :param payload: the request
+        :param timeout: the timeout of the request
+        :return: the response
+        """
+        body = dumps_bytes(payload)
+        headers = {'Content-type': 'application/json'}
+        if self.rules_by_reference:
+            headers[RULE_CACHE_HEADER] = RULE_CACHE_VERSION
+        if self.compress and len(body) >= COMPRESSION_MIN_BYTES:
+            response = self.http_session.post(self.server_url, data=gzip.compress(body, COMPRESSION_LEVEL),
+                                              headers=dict(headers, **{"Content-Encoding": "gzip"}), timeout=timeout)
+            if response.status_code not in COMPRESSION_REJECTED_STATUSES:
+                return response
+            response = self.http_session.post(self.server_url, data=body, headers=headers, timeout=timeout)
+            if response.status_code == 200:
+                log.debug("compressed requests not supported by %s", self.server_url)
+                self.compress = False
+            return response
+        return self.http_session.post(self.server_url, data=body, headers=headers, timeout=timeout)
+
+    def analyze(self, payload: dict, rules: List[RosieRule], timeout=10) -> requests.Response:
+        """
+        Send an analysis request with its rules
+        :param payload: the request without its rules
+        :param rules: the rules to execute
+        :param timeout: the timeout of each request
+        :return: the response
+        """
+        rule_hashes = [get_rule_content_hash(rule) for rule in rules] if self.rules_by_reference else []
+        response = self.post(dict(payload, rules=self.get_rules_payload(rules, rule_hashes)), timeout)
+        if response.status_code == RULE_CACHE_MISS_STATUS and self.rules_by_reference:
+            try:
+                missing_rules = set(loads(response.content).get("missingRules") or rule_hashes)
+            except (ValueError, AttributeError):
+                missing_rules = set(rule_hashes)
+            with self._lock:
+                self._sent_rules.difference_update(missing_rules)
+            response = self.post(dict(payload, rules=self.get_rules_payload(rules, rule_hashes)), timeout)
+        if response.status_code == 200 and self.rules_by_reference:
+            supported = response.headers.get(RULE_CACHE_HEADER) == RULE_CACHE_VERSION
+            with self._lock:
+                self.rule_cache_supported = supported
+                if supported:
+                    self._sent_rules.update(rule_hashes)
+        return response
+
+
+# One session for each Rosie server
+_rosie_sessions: Dict[str, RosieSession] = {}
+_rosie_sessions_lock = threading.Lock()
+
+
+def get_rosie_session(server_url: str) -> RosieSession:
+    """
+    :param server_url: the URL of the Rosie server
+    :return: the session shared by all requests to this server
+    """
+    with _rosie_sessions_lock:
+        if server_url not in _rosie_sessions:
+            _rosie_sessions[server_url] = RosieSession(
+                server_url,
+                compress=is_enabled(ROSIE_COMPRESSION_ENVIRONMENT_VARIABLE),
+                rules_by_reference=is_enabled(ROSIE_RULES_BY_REFERENCE_ENVIRONMENT_VARIABLE))
+        return _rosie_sessions[server_url]
+
+
 def analyze_rosie(filename: str, language: str, file_encoding: str,
                   code_base64: str, rules: List[RosieRule],
-                  server_url: str = ROSIE_URL) -> List[Violation]:
+                  server_url: str = ROSIE_URL,
+                  rule_stats: Optional[RuleStats] = None,
+                  session: Optional[RosieSession] = None,
+                  raise_errors: bool = False,
+                  timeout: float = ROSIE_TIMEOUT_SECS) -> List[Violation]:
     """
     Run an analysis with rosie
     :param filename: the filename to send
@@ -27,7 +187,13 @@ def analyze_rosie(filename: str, language: str, file_encoding: str,
     :param code_base64: the code encoded in base64
     :param rules: the list of rules to use
     :param server_url: the URL of the Rosie server
+    :param rule_stats: if defined, record the execution time and errors of each rule
+    :param session: the session to use, the session shared for server_url if None
+    :param raise_errors: True to raise an exception when the analysis does not complete instead of
+                         returning no violation
+    :param timeout: the maximum number of seconds to wait for the analysis
     :return: the list of violations
+    :raise RosieAnalysisException: if raise_errors is True and the analysis did not complete
     """
     try:
         result = []
@@ -36,18 +202,23 @@ def analyze_rosie(filename: str, language: str, file_encoding: str,
             "language": language.lower(),
             "fileEncoding": file_encoding,
             "codeBase64": code_base64,
-            "rules": list(map(lambda x: x.to_json(), rules)),
             "logOutput": False,
             "options": {
                 "useTreeSitter": True,
                 "logOutput": False
             }
         }
+        if session is None:
+            session = get_rosie_session(server_url)
         start_ts = time.time()
-        response = requests.post(server_url, json=payload, headers={'Content-type': 'application/json'}, timeout=10)
+        response = session.analyze(payload, rules, timeout=timeout)
         stop_ts = time.time()
+        if raise_errors and response.status_code != 200:
+            raise RosieAnalysisException(f"analysis of {filename} failed with status {response.status_code}")
         try:
-            response_json = response.json()
+            response_json = loads(response.content)
+            if rule_stats is not None:
+                record_rule_responses(rule_stats, response_json['ruleResponses'], (stop_ts - start_ts) * 1000)
             for rule_response in response_json['ruleResponses']:
                 violation_name = rule_response['identifier']
                 violations = rule_response['violations']
@@ -64,9 +235,17 @@ def analyze_rosie(filename: str, language: str, file_encoding: str,
                     )
                     result.append(new_violation)
             return result
-        except requests.exceptions.JSONDecodeError:
+        except (ValueError, KeyError, TypeError) as e:
             log.error("error while decoding analysis output: %s", response.text)
+            if raise_errors:
+                raise RosieAnalysisException(f"invalid analysis output for {filename}") from e
             return []
-    except (TimeoutError, requests.exceptions.ReadTimeout):
+    except (TimeoutError, requests.exceptions.ReadTimeout) as e:
         log.error("timeout when processing file %s", filename)
+        if raise_errors:
+            raise RosieAnalysisException(f"timeout when processing file {filename}") from e
         return []
+    except requests.exceptions.RequestException as e:
+        if raise_errors:
+            raise RosieAnalysisException(f"cannot analyze {filename}: {e}") from e
+        raise
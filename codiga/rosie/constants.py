@@ -0,0 +1,24 @@
+
+# Severities reported by Rosie, from the least to the most important.
+SEVERITY_INFORMATIONAL: str = "INFORMATIONAL"
+SEVERITY_WARNING: str = "WARNING"
+SEVERITY_ERROR: str = "ERROR"
+SEVERITY_CRITICAL: str = "CRITICAL"
+
+SEVERITIES: list = [SEVERITY_INFORMATIONAL, SEVERITY_WARNING, SEVERITY_ERROR, SEVERITY_CRITICAL]
+
+# Categories reported by Rosie
+CATEGORY_BEST_PRACTICE: str = "BEST_PRACTICE"
+CATEGORY_CODE_STYLE: str = "CODE_STYLE"
+CATEGORY_DESIGN: str = "DESIGN"
+CATEGORY_DEPLOYMENT: str = "DEPLOYMENT"
+CATEGORY_DOCUMENTATION: str = "DOCUMENTATION"
+CATEGORY_ERROR_PRONE: str = "ERROR_PRONE"
+CATEGORY_PERFORMANCE: str = "PERFORMANCE"
+CATEGORY_SAFETY: str = "SAFETY"
+CATEGORY_SECURITY: str = "SECURITY"
+CATEGORY_UNKNOWN: str = "UNKNOWN"
+
+CATEGORIES: list = [CATEGORY_BEST_PRACTICE, CATEGORY_CODE_STYLE, CATEGORY_DESIGN, CATEGORY_DEPLOYMENT,
+                    CATEGORY_DOCUMENTATION, CATEGORY_ERROR_PRONE, CATEGORY_PERFORMANCE, CATEGORY_SAFETY,
+                    CATEGORY_SECURITY, CATEGORY_UNKNOWN]
@@ -0,0 +1,154 @@
+"""
+Read and write the codiga.lock file. The lock file contains all the rules of the
+rulesets from codiga.yml so that rules can be loaded without using the network.
+
+The file starts with a header (one line of JSON) followed by one block of rules per
+language. Each block contains one rule per line (JSON). The header contains the offset
+and length of each block (relative to the end of the header) so that only the rules
+of the languages being analyzed are read and decoded:
+
+    {"version": 1, "rulesets": [...], "languages": {"python": {"offset": 0, "length": 1234, "count": 3}}}
+    {"id": "python-security/rule1", "contentBase64": "...", "hash": "...", ...}
+    ...
+"""
+import hashlib
+import json
+import mmap
+import os
+import typing
+
+from codiga.model.rosie_rule import RosieRule
+
+LOCKFILE_NAME = "codiga.lock"
+LOCKFILE_VERSION = 1
+
+
+def get_rule_content_hash(rule: RosieRule) -> str:
+    """
+    :param rule: the rule
+    :return: the hash of the rule content
+    """
+    return hashlib.sha256(rule.content_base64.encode('utf-8')).hexdigest()
+
+
+def rule_to_lock_json(rule: RosieRule) -> dict:
+    """
+    Serialize a rule for the lock file
+    :param rule: the rule to serialize
+    :return: the serialized rule
+    """
+    result = rule.to_json()
+    result["severity"] = rule.severity
+    result["category"] = rule.category
+    result["hash"] = get_rule_content_hash(rule)
+    return result
+
+
+def rule_from_lock_json(value: dict) -> RosieRule:
+    """
+    Deserialize a rule from the lock file and check the integrity of its content.
+    :param value: the serialized rule
+    :return: the rule
+    :raise ValueError: if the content of the rule does not match its hash
+    """
+    rule = RosieRule(id=value["id"],
+                     content_base64=value["contentBase64"],
+                     language=value["language"],
+                     rule_type=value["type"],
+                     entity_checked=value["entityChecked"],
+                     pattern=value["pattern"],
+                     severity=value.get("severity"),
+                     category=value.get("category"))
+    if get_rule_content_hash(rule) != value["hash"]:
+        raise ValueError(f"invalid content for rule {rule.id}")
+    return rule
+
+
+def write_lockfile(path: str, rulesets: typing.List[str], rules: typing.List[RosieRule]):
+    """
+    Write the lock file for a list of rulesets. Duplicated rules are written only once.
+    :param path: the path of the lock file
+    :param rulesets: the name of the rulesets (from codiga.yml)
+    :param rules: the rules of the rulesets
+    :return:
+    """
+    rules_per_language: typing.Dict[str, typing.Dict[str, bytes]] = {}
+    for rule in rules:
+        line = json.dumps(rule_to_lock_json(rule), sort_keys=True).encode('utf-8') + b"\n"
+        rules_per_language.setdefault(rule.language.lower(), {})[rule.id] = line
+
+    languages = {}
+    blocks = []
+    offset = 0
+    for language in sorted(rules_per_language.keys()):
+        block = b"".join(rules_per_language[language][rule_id] for rule_id in sorted(rules_per_language[language]))
+        languages[language] = {"offset": offset, "length": len(block), "count": len(rules_per_language[language])}
+        blocks.append(block)
+        offset += len(block)
+
+    header = {"version": LOCKFILE_VERSION, "rulesets": rulesets, "languages": languages}
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "wb") as lockfile:
+        lockfile.write(json.dumps(header, sort_keys=True).encode('utf-8') + b"\n")
+        for block in blocks:
+            lockfile.write(block)
+    os.replace(temporary_path, path)
+
+
+class RulesetLock:
+    """
+    A lock file opened for reading. The file is memory-mapped and the rules of a language
+    are decoded only when requested.
+    """
+    def __init__(self, path: str):
+        """
+        Open a lock file
+        :param path: the path of the lock file
+        :raise ValueError: if the file is not a valid lock file
+        :raise OSError: if the file cannot be read
+        """
+        with open(path, "rb") as lockfile:
+            try:
+                self._data = mmap.mmap(lockfile.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ValueError(f"empty lock file {path}")
+        header_end = self._data.find(b"\n")
+        if header_end < 0:
+            raise ValueError(f"invalid lock file {path}")
+        try:
+            header = json.loads(self._data[:header_end].decode('utf-8'))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            raise ValueError(f"invalid lock file {path}")
+        if not isinstance(header, dict) or header.get("version") != LOCKFILE_VERSION:
+            raise ValueError(f"unsupported lock file version in {path}")
+        self._data_offset = header_end + 1
+        self.rulesets: typing.List[str] = header["rulesets"]
+        self.languages: typing.Dict[str, dict] = header["languages"]
+
+    def get_rules(self, languages: typing.Optional[typing.Iterable[str]] = None) -> typing.List[RosieRule]:
+        """
+        Get the rules for some languages
+        :param languages: the languages of the rules to get, all languages if None
+        :return: the rules for these languages
+        :raise ValueError: if a rule is invalid
+        """
+        if languages is None:
+            languages = self.languages.keys()
+        rules = []
+        for language in sorted(set(language.lower() for language in languages)):
+            block = self.languages.get(language)
+            if block is None:
+                continue
+            start = self._data_offset + block["offset"]
+            for line in self._data[start:start + block["length"]].splitlines():
+                rules.append(rule_from_lock_json(json.loads(line)))
+        return rules
+
+    def close(self):
+        self._data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
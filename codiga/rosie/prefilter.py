@@ -0,0 +1,188 @@
+"""
+Select the rules to send to Rosie for a file. When no rule is left, the file is not sent at all.
+
+First, rules with literal tokens (declared in codiga.yml or taken from their pattern) are only
+kept when one of their tokens occurs in the file. Each token is searched with a substring
+check, faster than a single regular expression scan even for hundreds of tokens. Then, a
+pattern rule can only report a violation where its pattern matches, so pattern rules whose
+pattern does not match the code are not sent.
+
+Each text between the variables (${name}) of a pattern is compiled into a regular expression
+that matches at least everything Rosie matches: whitespace between tokens is optional and quotes
+match any quote. A pattern rule is kept when all these texts occur in the file, in any order:
+searching them as one expression with gaps for the variables backtracks badly on large files.
+A rule is never dropped when its pattern cannot be compiled.
+"""
+import dataclasses
+import fnmatch
+import functools
+import re
+import typing
+
+from codiga.model.rosie_rule import RosieRule
+
+RULE_TYPE_PATTERN = "pattern"
+
+PATTERN_VARIABLE = re.compile(r'\$\{[^}]*\}')
+PATTERN_TOKEN = re.compile(r'\w+|\S')
+QUOTES = "\"'`"
+
+# Tokens taken from a pattern are identifiers of at least this length
+MIN_PATTERN_TOKEN_LENGTH = 3
+
+
+def get_pattern_literals(pattern: str) -> typing.List[typing.List[str]]:
+    """
+    Split a pattern into its literal parts
+    :param pattern: the pattern of the rule (e.g. "eval(${input})")
+    :return: the tokens of each text between variables (e.g. [["eval", "("], [")"]])
+    """
+    return [PATTERN_TOKEN.findall(literal) for literal in PATTERN_VARIABLE.split(pattern)]
+
+
+def _token_to_regex(token: str) -> str:
+    if token in QUOTES:
+        return "[" + re.escape(QUOTES) + "]"
+    return re.escape(token)
+
+
+@functools.lru_cache(maxsize=None)
+def compile_literal(tokens: typing.Tuple[str, ...]) -> typing.Pattern:
+    """
+    :param tokens: the tokens of a text between variables
+    :return: the regular expression matching the tokens with any whitespace between them
+    """
+    return re.compile(r'\s*'.join(_token_to_regex(token) for token in tokens))
+
+
+@functools.lru_cache(maxsize=None)
+def compile_pattern(pattern: typing.Optional[str]) -> typing.Optional[typing.Tuple[typing.Pattern, ...]]:
+    """
+    Compile the texts between the variables of the pattern of a rule, all present in the code
+    matched by the pattern. Compiled patterns are cached for the whole run.
+    :param pattern: the pattern of the rule
+    :return: the regular expressions, None if the pattern cannot be used to exclude a file
+    """
+    if not pattern:
+        return None
+    literals = [tuple(tokens) for tokens in get_pattern_literals(pattern) if tokens]
+    if not literals:
+        # only variables, matches any code
+        return None
+    try:
+        return tuple(compile_literal(tokens) for tokens in dict.fromkeys(literals))
+    except re.error:
+        return None
+
+
+def pattern_may_match(pattern: str, code: str,
+                      searched: typing.Optional[typing.Dict[typing.Pattern, bool]] = None) -> bool:
+    """
+    :param pattern: the pattern of a rule, compiled by compile_pattern
+    :param code: the code of the file
+    :param searched: the expressions already searched in the code and if they were found
+    :return: False if the pattern cannot match the code
+    """
+    searched = {} if searched is None else searched
+    for expression in compile_pattern(pattern):
+        if expression not in searched:
+            searched[expression] = expression.search(code) is not None
+        if not searched[expression]:
+            return False
+    return True
+
+
+def apply_rule_tokens(rules: typing.List[RosieRule],
+                      rule_tokens: typing.Dict[str, typing.List[str]]) -> typing.List[RosieRule]:
+    """
+    Set the tokens of the rules declared in codiga.yml
+    :param rules: the rules
+    :param rule_tokens: the tokens for each rule identifier or wildcard (e.g. python-security/pickle-*)
+    :return: the rules with their tokens
+    """
+    if not rule_tokens:
+        return rules
+    result = []
+    for rule in rules:
+        tokens = [token for name, name_tokens in rule_tokens.items() if fnmatch.fnmatchcase(rule.id, name)
+                  for token in name_tokens]
+        result.append(dataclasses.replace(rule, tokens=tokens) if tokens else rule)
+    return result
+
+
+@functools.lru_cache(maxsize=None)
+def get_pattern_token(pattern: typing.Optional[str]) -> typing.Optional[str]:
+    """
+    :param pattern: the pattern of a rule
+    :return: the longest identifier of the pattern (present in any code it matches), None if too short
+    """
+    if not pattern:
+        return None
+    identifiers = [token for tokens in get_pattern_literals(pattern) for token in tokens
+                   if re.fullmatch(r'\w+', token) and len(token) >= MIN_PATTERN_TOKEN_LENGTH]
+    return max(identifiers, key=len) if identifiers else None
+
+
+def get_rule_tokens(rule: RosieRule) -> typing.Optional[typing.Tuple[str, ...]]:
+    """
+    :param rule: the rule
+    :return: the tokens of the rule (one of them occurs in any file it reports), None if unknown
+    """
+    if rule.tokens:
+        return tuple(rule.tokens)
+    if rule.rule_type == RULE_TYPE_PATTERN:
+        token = get_pattern_token(rule.pattern)
+        if token:
+            return (token, )
+    return None
+
+
+def find_tokens(tokens: typing.FrozenSet[str], code: str) -> typing.Set[str]:
+    """
+    :param tokens: the tokens to search
+    :param code: the code of the file
+    :return: the tokens found in the code
+    """
+    return {token for token in tokens if token in code}
+
+
+def select_rules_by_tokens(rules: typing.List[RosieRule], code: str) -> typing.List[RosieRule]:
+    """
+    Keep the rules without tokens and the rules with a token in the file
+    :param rules: the rules to use
+    :param code: the code of the file
+    :return: the rules that can report a violation in the file
+    """
+    rules_tokens = [get_rule_tokens(rule) for rule in rules]
+    all_tokens = frozenset(token for tokens in rules_tokens if tokens for token in tokens)
+    if not all_tokens:
+        return rules
+    found = find_tokens(all_tokens, code)
+    return [rule for rule, tokens in zip(rules, rules_tokens) if tokens is None or not found.isdisjoint(tokens)]
+
+
+def is_pattern_rule(rule: RosieRule) -> bool:
+    """
+    :param rule: the rule
+    :return: True if the rule can be excluded using its pattern
+    """
+    return rule.rule_type == RULE_TYPE_PATTERN and compile_pattern(rule.pattern) is not None
+
+
+def select_rules(rules: typing.List[RosieRule], code: str) -> typing.List[RosieRule]:
+    """
+    Get the rules that can report a violation in a file
+    :param rules: the rules to use
+    :param code: the code of the file
+    :return: the rules without the rules whose tokens or pattern do not occur in the code
+    """
+    rules = select_rules_by_tokens(rules, code)
+    pattern_rules = [rule for rule in rules if is_pattern_rule(rule)]
+    if not pattern_rules:
+        return rules
+
+    # texts shared by several patterns are only searched once
+    searched: typing.Dict[typing.Pattern, bool] = {}
+    matched_patterns = {pattern for pattern in {rule.pattern for rule in pattern_rules}
+                        if pattern_may_match(pattern, code, searched)}
+    return [rule for rule in rules if not is_pattern_rule(rule) or rule.pattern in matched_patterns]
@@ -1,5 +1,14 @@
+import logging
+import typing
+
 import yaml
 
+from codiga.model.violation_filter import ViolationFilter
+
+CODIGAFILE_MIN_SEVERITY_KEY = "min-severity"
+CODIGAFILE_CATEGORIES_KEY = "categories"
+CODIGAFILE_RULE_TOKENS_KEY = "rule-tokens"
+
 
 def get_rulesets_from_codigafile(path: str):
     """
@@ -21,6 +30,70 @@ def get_rulesets_from_codigafile(path: str):
         return []
 
 
+def get_rule_filter_from_codigafile(path: str) -> ViolationFilter:
+    """
+    Load the minimum severity and the categories to check from the codiga.yml file.
+    Example of codiga.yml file:
+
+        rulesets:
+          - python-security
+        min-severity: ERROR
+        categories:
+          - security
+          - error_prone
+
+    :param path: the path to the file
+    :return: the filter for the rules to use
+    :raise ValueError: if the severity or one category is invalid
+    """
+    try:
+        with open(path, 'r') as stream:
+            data_loaded = yaml.safe_load(stream)
+    except (FileNotFoundError, yaml.scanner.ScannerError, yaml.YAMLError):
+        logging.error("[get_rule_filter_from_codigafile] invalid rosie file on %s", path)
+        return ViolationFilter()
+    if not data_loaded:
+        return ViolationFilter()
+    return ViolationFilter.from_options(data_loaded.get(CODIGAFILE_MIN_SEVERITY_KEY),
+                                        data_loaded.get(CODIGAFILE_CATEGORIES_KEY))
+
+
+def get_rule_tokens_from_codigafile(path: str) -> typing.Dict[str, typing.List[str]]:
+    """
+    Load the tokens required by the rules from the codiga.yml file. A rule is only sent
+    for the files that contain one of its tokens. Rules can be matched with wildcards.
+    Example of codiga.yml file:
+
+        rulesets:
+          - python-security
+        rule-tokens:
+          python-security/avoid-eval: [eval, exec]
+          python-security/pickle-*: [pickle]
+
+    :param path: the path to the file
+    :return: the tokens for each rule identifier or wildcard
+    :raise ValueError: if the rule-tokens section is invalid
+    """
+    try:
+        with open(path, 'r') as stream:
+            data_loaded = yaml.safe_load(stream)
+    except (FileNotFoundError, yaml.scanner.ScannerError, yaml.YAMLError):
+        logging.error("[get_rule_tokens_from_codigafile] invalid rosie file on %s", path)
+        return {}
+    if not data_loaded or not data_loaded.get(CODIGAFILE_RULE_TOKENS_KEY):
+        return {}
+    rule_tokens = data_loaded[CODIGAFILE_RULE_TOKENS_KEY]
+    if not isinstance(rule_tokens, dict):
+        raise ValueError(f"{CODIGAFILE_RULE_TOKENS_KEY} should map rules to lists of tokens")
+    result = {}
+    for rule, tokens in rule_tokens.items():
+        if isinstance(tokens, str):
+            tokens = [tokens]
+        if not isinstance(tokens, list) or not tokens or not all(isinstance(t, str) and t for t in tokens):
+            raise ValueError(f"invalid tokens for rule {rule} in {CODIGAFILE_RULE_TOKENS_KEY}")
+        result[str(rule)] = tokens
+    return result
+
 
 def element_checked_api_to_json(value):
     """
@@ -0,0 +1,210 @@
+"""
+Collect the execution time and errors of each rule executed by Rosie.
+The statistics are aggregated across runs and used to exclude the rules
+that are consistently slow.
+"""
+import json
+import logging
+import os
+import statistics
+import threading
+import typing
+
+from codiga.utils.cache_utils import get_cache_file
+
+RULE_STATS_FILENAME = "rule-stats.json"
+
+# Number of recent execution times kept for each rule
+MAX_SAMPLES_PER_RULE = 20
+
+# Minimum number of recent execution times required before excluding a rule
+MIN_SAMPLES_FOR_BUDGET = 3
+
+# Number of most recent measured execution times used to compare a rule with the budget
+BUDGET_SAMPLES = 5
+
+# A rule excluded because of the budget is executed again every N runs, so that it comes back when faster
+PROBE_EXCLUDED_RULES_EVERY_RUNS = 10
+
+log: logging.Logger = logging.getLogger('codiga')
+
+
+class RuleStats:
+    """
+    Statistics about the execution of rules. Execution times are reported by the
+    Rosie server when available. Otherwise, the time of the request is split
+    equally between all the rules of the request (the time is then estimated).
+    Estimated times are kept apart and never used to exclude a rule: a slow rule
+    would make all the rules of its requests look slow.
+
+    The object can be updated from multiple threads.
+    """
+    def __init__(self, rules: typing.Optional[typing.Dict[str, dict]] = None):
+        self._lock = threading.Lock()
+        self._rules: typing.Dict[str, dict] = rules if rules is not None else {}
+        for rule in self._rules.values():
+            # statistics saved by previous versions mixed measured and estimated times
+            if rule.pop("estimated", False):
+                rule.setdefault("recentEstimatedTimesMs", rule.pop("recentTimesMs", []))
+            rule.setdefault("recentTimesMs", [])
+            rule.setdefault("recentEstimatedTimesMs", [])
+            rule.setdefault("excludedRuns", 0)
+
+    def record(self, rule_id: str, execution_time_ms: float, error: bool = False, estimated: bool = False):
+        """
+        Record one execution of a rule
+        :param rule_id: the identifier of the rule (ruleset/rule)
+        :param execution_time_ms: the execution time in milliseconds
+        :param error: True if the execution of the rule failed
+        :param estimated: True if the execution time is not reported by the server
+        :return:
+        """
+        with self._lock:
+            rule = self._rules.setdefault(rule_id, {
+                "executions": 0,
+                "errors": 0,
+                "totalTimeMs": 0.0,
+                "maxTimeMs": 0.0,
+                "recentTimesMs": [],
+                "recentEstimatedTimesMs": [],
+                "excludedRuns": 0
+            })
+            rule["executions"] += 1
+            rule["totalTimeMs"] += execution_time_ms
+            rule["maxTimeMs"] = max(rule["maxTimeMs"], execution_time_ms)
+            rule["excludedRuns"] = 0
+            if error:
+                rule["errors"] += 1
+            samples = rule["recentEstimatedTimesMs"] if estimated else rule["recentTimesMs"]
+            samples.append(round(execution_time_ms, 3))
+            del samples[:-MAX_SAMPLES_PER_RULE]
+
+    def get_rule(self, rule_id: str) -> typing.Optional[dict]:
+        """
+        :param rule_id: the identifier of the rule
+        :return: the statistics of a rule or None if the rule was never executed
+        """
+        with self._lock:
+            rule = self._rules.get(rule_id)
+            return dict(rule) if rule else None
+
+    def get_rules_over_budget(self, budget_ms: float) -> typing.Set[str]:
+        """
+        Get the rules that consistently exceed a time budget: the median of their
+        most recent measured execution times is above the budget.
+        :param budget_ms: the time budget for a rule, in milliseconds
+        :return: the identifiers of the rules over the budget
+        """
+        result = set()
+        with self._lock:
+            for rule_id, rule in self._rules.items():
+                samples = rule["recentTimesMs"][-BUDGET_SAMPLES:]
+                if len(samples) >= MIN_SAMPLES_FOR_BUDGET and statistics.median(samples) > budget_ms:
+                    result.add(rule_id)
+        return result
+
+    def select_rules_to_exclude(self, budget_ms: float,
+                                probe_every_runs: int = PROBE_EXCLUDED_RULES_EVERY_RUNS) -> typing.Set[str]:
+        """
+        Get the rules to exclude from a run because they are over the budget. A rule excluded
+        for probe_every_runs runs in a row is executed again to measure it again.
+        :param budget_ms: the time budget for a rule, in milliseconds
+        :param probe_every_runs: number of runs after which an excluded rule is executed again
+        :return: the identifiers of the rules to exclude from this run
+        """
+        result = set()
+        over_budget = self.get_rules_over_budget(budget_ms)
+        with self._lock:
+            for rule_id in over_budget:
+                rule = self._rules[rule_id]
+                rule["excludedRuns"] += 1
+                if rule["excludedRuns"] >= probe_every_runs:
+                    rule["excludedRuns"] = 0
+                    continue
+                result.add(rule_id)
+        return result
+
+    def format_report(self, limit: typing.Optional[int] = None) -> str:
+        """
+        Format the statistics as a text table, the slowest rules first.
+        :param limit: maximum number of rules to show
+        :return: the report
+        """
+        with self._lock:
+            rules = sorted(self._rules.items(),
+                           key=lambda item: item[1]["totalTimeMs"] / max(item[1]["executions"], 1),
+                           reverse=True)
+        if limit is not None:
+            rules = rules[:limit]
+
+        lines = ["{0:<60} {1:>10} {2:>10} {3:>10} {4:>10} {5:>7}".format(
+            "rule", "executions", "mean(ms)", "median(ms)", "max(ms)", "errors")]
+        for rule_id, rule in rules:
+            mean_ms = rule["totalTimeMs"] / max(rule["executions"], 1)
+            samples = rule["recentTimesMs"] or rule["recentEstimatedTimesMs"]
+            median_ms = statistics.median(samples) if samples else 0
+            lines.append("{0:<60} {1:>10} {2:>10.1f} {3:>10.1f} {4:>10.1f} {5:>7}{6}".format(
+                rule_id, rule["executions"], mean_ms, median_ms, rule["maxTimeMs"], rule["errors"],
+                "" if rule["recentTimesMs"] else " (estimated)"))
+        return "\n".join(lines)
+
+    def to_json(self):
+        with self._lock:
+            return {"rules": json.loads(json.dumps(self._rules))}
+
+    @staticmethod
+    def load(path: typing.Optional[str] = None) -> 'RuleStats':
+        """
+        Load statistics from a file. Return empty statistics if the file does not exist or is invalid.
+        :param path: the path of the file, the default statistics file if not specified
+        :return: the statistics
+        """
+        path = path or get_rule_stats_path()
+        try:
+            with open(path, "r") as stats_file:
+                return RuleStats(json.load(stats_file)["rules"])
+        except FileNotFoundError:
+            return RuleStats()
+        except (ValueError, KeyError, TypeError):
+            log.warning("invalid rule statistics file %s, ignoring it", path)
+            return RuleStats()
+
+    def save(self, path: typing.Optional[str] = None):
+        """
+        Save the statistics into a file.
+        :param path: the path of the file, the default statistics file if not specified
+        :return:
+        """
+        path = path or get_rule_stats_path()
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w") as stats_file:
+            json.dump(self.to_json(), stats_file)
+        os.replace(temporary_path, path)
+
+
+def get_rule_stats_path() -> str:
+    """
+    :return: the path of the file storing the rule statistics
+    """
+    return get_cache_file(RULE_STATS_FILENAME)
+
+
+def record_rule_responses(rule_stats: RuleStats, rule_responses: typing.List[dict], request_time_ms: float):
+    """
+    Record the execution of the rules from a Rosie response. When the server does not report
+    the execution time of a rule, the time of the request is split equally between the rules.
+    :param rule_stats: the statistics to update
+    :param rule_responses: the ruleResponses attribute of the Rosie response
+    :param request_time_ms: the time taken by the request in milliseconds
+    :return:
+    """
+    if not rule_responses:
+        return
+    estimated_time_ms = request_time_ms / len(rule_responses)
+    for rule_response in rule_responses:
+        has_error = bool(rule_response.get('errors')) or bool(rule_response.get('executionError'))
+        execution_time_ms = rule_response.get('executionTimeMs')
+        if execution_time_ms is not None:
+            rule_stats.record(rule_response['identifier'], float(execution_time_ms), error=has_error)
+        else:
+            rule_stats.record(rule_response['identifier'], estimated_time_ms, error=has_error, estimated=True)
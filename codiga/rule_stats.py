@@ -0,0 +1,70 @@
+"""Show the execution time of the rules used by codiga-git-hook, the slowest rules first.
+Statistics are collected each time the hook runs.
+
+Usage:
+    codiga-rule-stats [options]
+
+Global options:
+    -n LIMIT                 Maximum number of rules to show
+    --budget-ms <ms>         Show the rules that would be excluded with this time budget (in ms)
+    --reset                  Delete all the statistics collected
+Example:
+    $ codiga-rule-stats -n 20 --budget-ms 500
+"""
+
+import logging
+import os
+import sys
+
+import docopt
+
+from .rosie.telemetry import RuleStats, get_rule_stats_path
+from .version import __version__
+
+logging.basicConfig()
+
+log = logging.getLogger('codiga')
+
+
+def main(argv=None):
+    """
+    Make the magic happen.
+    :param argv:
+    :return:
+    """
+    options = docopt.docopt(__doc__, argv=argv, version=__version__)
+
+    limit_argument = options['-n']
+    budget_argument = options['--budget-ms']
+    reset = options['--reset']
+
+    log.addHandler(logging.StreamHandler())
+    log.setLevel(logging.INFO)
+
+    try:
+        if reset:
+            if os.path.isfile(get_rule_stats_path()):
+                os.remove(get_rule_stats_path())
+            print("Rule statistics deleted")
+            sys.exit(0)
+
+        try:
+            limit = int(limit_argument) if limit_argument else None
+            budget_ms = int(budget_argument) if budget_argument else None
+        except ValueError:
+            print("limit and budget should be integers")
+            sys.exit(1)
+
+        rule_stats = RuleStats.load()
+        print(rule_stats.format_report(limit))
+
+        if budget_ms is not None:
+            slow_rules = rule_stats.get_rules_over_budget(budget_ms)
+            print(f"\n{len(slow_rules)} rules over the budget of {budget_ms}ms")
+            for rule_id in sorted(slow_rules):
+                print(rule_id)
+
+        sys.exit(0)
+    except KeyboardInterrupt:  # pragma: no cover
+        log.info('Aborted')
+        sys.exit(1)
@@ -5,32 +5,50 @@ import re
 def convert_camel_case_to_snake_case(string):
     return re.sub(r'(?<!^)(?=[A-Z])', '_', string).lower()
 
+CODIGA_INDENT = "&[CODIGA_INDENT]"
+
+# ${N:default}, ${N}, $N, ${TM_FILENAME_BASE} and tabulations, rewritten in a single scan
+SNIPPET_TOKEN_PATTERN = re.compile(r'\$\{(\d+):([^}]+)\}|\$\{(\d+)\}|\$(\d+)|(\$\{TM_FILENAME_BASE\})|(\t)')
+
+
+def _convert_token(match, convert_tabs):
+    """
+    Get the Codiga text of a token matched by SNIPPET_TOKEN_PATTERN
+    :param match: the match
+    :param convert_tabs: True to replace tabulations by the Codiga indentation
+    :return: the replacement text
+    """
+    if match.group(1) is not None:
+        default_value = match.group(2)
+        if convert_tabs:
+            default_value = default_value.replace("\t", CODIGA_INDENT)
+        return f"&[USER_INPUT:{match.group(1)}:{default_value}]"
+    if match.group(3) is not None:
+        return f"&[USER_INPUT:{match.group(3)}]"
+    if match.group(4) is not None:
+        return f"&[USER_INPUT:{match.group(4)}]"
+    if match.group(5) is not None:
+        return "&[GET_FILENAME_NO_EXT]"
+    return CODIGA_INDENT if convert_tabs else match.group(0)
+
+
 def convert_variables_in_recipes(recipe_content):
     """
     Replace VS code-style user-variables with Codiga variables
     :param recipe_content: the recipe content as text
     :return: the recipe formatted for Codiga
     """
-    pattern = re.compile('\\${(\d+):([^}]+)}')
-    iterator = pattern.finditer(recipe_content)
-    to_replace = {}
-    to_replace["${TM_FILENAME_BASE}"] = "&[GET_FILENAME_NO_EXT]"
-
-    for match in iterator:
-        original_text = recipe_content[match.start():match.end()]
-        replace_text = f"&[USER_INPUT:{match.group(1)}:{match.group(2)}]"
-        to_replace[original_text] = replace_text
-
-
-    pattern = re.compile('\\$(\d+)[^\d]')
-    iterator = pattern.finditer(recipe_content)
-    for match in iterator:
-        original_text = recipe_content[match.start(1):match.end(1)]
-        replace_text = f"&[USER_INPUT:{match.group(1)}]"
-        to_replace[original_text] = replace_text
-    for key in to_replace:
-        recipe_content = recipe_content.replace(key, to_replace[key])
-    return recipe_content
+    return SNIPPET_TOKEN_PATTERN.sub(lambda match: _convert_token(match, False), recipe_content)
+
+
+def convert_recipe_content(recipe_content):
+    """
+    Replace VS code-style user-variables with Codiga variables and tabulations
+    with the Codiga indentation, in a single scan of the content
+    :param recipe_content: the recipe content as text
+    :return: the recipe formatted for Codiga
+    """
+    return SNIPPET_TOKEN_PATTERN.sub(lambda match: _convert_token(match, True), recipe_content)
 
 def fix_shortcut(shortcut):
     replace_characters = shortcut.replace("!", "").replace("/", "").replace("<", "").replace(">", "").replace("(", "").replace(")", "").replace("#", "")
@@ -43,6 +61,54 @@ def convert_name(name):
     remove_characters = name.replace(".", " ").replace("-", " ")
     return re.sub('\s+',' ', remove_characters)
 
+def convert_snippet_to_codiga(snippet_name, snippet, shortcut_prefix):
+    """
+    Convert a VS Code snippet to a recipe for Codiga
+    :param snippet_name: the name of the snippet
+    :param snippet: the snippet (with its body and prefix)
+    :param shortcut_prefix: prefix to add to shortcut
+    :return: the recipe or None if the snippet cannot be converted
+    """
+    if not isinstance(snippet, dict):
+        return None
+
+    if "body" not in snippet:
+        return None
+
+    if "prefix" not in snippet:
+        return None
+    if isinstance(snippet["body"], list):
+        snippet_content = "\n".join(snippet["body"])
+    else:
+        snippet_content = snippet["body"]
+    snippet_prefix = fix_shortcut(snippet["prefix"])
+    if shortcut_prefix is not None:
+        snippet_prefix = shortcut_prefix + snippet_prefix
+    # Replace variables and indent by the codiga indentation style
+    snippet_content = convert_recipe_content(snippet_content)
+    snippet_content_base64 = base64.b64encode(snippet_content.encode('utf-8')).decode('utf-8')
+    if snippet_name is not None and snippet_content_base64 is not None and snippet_prefix is not None:
+        return {
+            "name": convert_name(snippet_name),
+            "content": snippet_content_base64,
+            "shortcut": snippet_prefix
+        }
+    return None
+
+
+def convert_snippets_to_codiga(snippets, shortcut_prefix):
+    """
+    Convert snippets as they are read
+    :param snippets: iterable of (snippet name, snippet), for example from iter_json_object_items
+    :param shortcut_prefix: prefix to add to shortcut
+    :return: the recipes
+    """
+    for snippet_name, snippet in snippets:
+        recipe = convert_snippet_to_codiga(snippet_name, snippet, shortcut_prefix)
+        if recipe is not None:
+            yield recipe
+
+
 def convert_snippet_file_content_to_codiga(json_content, shortcut_prefix):
     """
     Convert a file file content to a snippet for Codiga
@@ -50,33 +116,4 @@ def convert_snippet_file_content_to_codiga(json_content, shortcut_prefix):
     :param shortcut_prefix: prefix to add to shortcut
     :return:
     """
-    recipes = []
-    for snippet_name in json_content.keys():
-        snippet = json_content[snippet_name]
-
-        if "body" not in snippet:
-            continue
-
-        if "prefix" not in snippet:
-            continue
-        if isinstance(snippet["body"], list):
-            snippet_content = "\n".join(snippet["body"])
-        else:
-            snippet_content = snippet["body"]
-        snippet_prefix = fix_shortcut(snippet["prefix"])
-        if shortcut_prefix is not None:
-            snippet_prefix = shortcut_prefix + snippet_prefix
-        snippet_content = convert_variables_in_recipes(snippet_content)
-        # Replace indent by the codiga indentation style
-        snippet_content = snippet_content.replace("\t", "&[CODIGA_INDENT]")
-        snippet_content_base64 = base64.b64encode(snippet_content.encode('utf-8')).decode('utf-8')
-        if snippet_name is not None and snippet_content_base64 is not None and snippet_prefix is not None:
-            recipe_payload = {
-                "name": convert_name(snippet_name),
-                "content": snippet_content_base64,
-                "shortcut": snippet_prefix
-            }
-            recipes.append(recipe_payload)
-    return recipes
-
-
+    return list(convert_snippets_to_codiga(json_content.items(), shortcut_prefix))
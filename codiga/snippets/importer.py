@@ -0,0 +1,278 @@
+"""
+Upload recipes converted from snippets. Uploads run concurrently with a rate limit and
+each recipe created is written in a journal, so that an interrupted import resumes
+where it stopped instead of creating the same recipes again.
+
+In sync mode, the journal is also used as a manifest of the recipes by shortcut: unchanged
+recipes are skipped and recipes whose content changed are updated instead of created.
+"""
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+import typing
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field
+
+import requests
+
+from codiga.exceptions.cookbook_fetch_exception import CookbookFetchException
+from codiga.graphql.recipe import post_recipe, update_recipe, get_cookbook_recipes
+from codiga.snippets.sources import get_language
+from codiga.utils.rate_limiter import RateLimiter
+
+log = logging.getLogger('codiga')
+
+DEFAULT_JOBS = 4
+DEFAULT_RATE_PER_SEC = 5.0
+# Recipes read in advance for each upload job, the other recipes are not read yet
+MAX_PENDING_UPLOADS_PER_JOB = 4
+
+RECIPE_URL_PROD = "https://app.codiga.io/assistant/recipe/{}/view"
+RECIPE_URL_STAGING = "https://app-staging.codiga.io/assistant/recipe/{}/view"
+
+
+def get_canonical_code(code: str) -> str:
+    """
+    The API does not return the code of a recipe exactly as it was sent (line endings,
+    trailing whitespace), so recipes are compared on their code with unix line endings
+    and without trailing whitespace.
+    :param code: the code of a recipe (not encoded)
+    :return: the code to compare
+    """
+    lines = [line.rstrip() for line in code.replace("\r\n", "\n").replace("\r", "\n").split("\n")]
+    return "\n".join(lines).strip("\n")
+
+
+def hash_recipe(name: typing.Optional[str], shortcut: str, code: str, language: typing.Optional[str]) -> str:
+    """
+    :param name: the name of the recipe
+    :param shortcut: the shortcut of the recipe
+    :param code: the code of the recipe (not encoded)
+    :param language: the language of the recipe, if tagged
+    :return: a hash of the recipe, the same for a local recipe and the recipe returned by the API
+    """
+    values = [(name or "").strip(), shortcut.strip(), get_canonical_code(code)]
+    if language:
+        values.append(language.lower())
+    content = json.dumps(values)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def get_recipe_hash(recipe: dict) -> str:
+    """
+    :param recipe: a recipe converted from a snippet, with its content encoded in base64
+    :return: a hash of the name, shortcut and code of the recipe (and its language when tagged)
+    """
+    code = base64.b64decode(recipe["content"]).decode('utf-8')
+    return hash_recipe(recipe["name"], recipe["shortcut"], code, recipe.get("language"))
+
+
+def get_recipe_key(recipe: dict) -> str:
+    """
+    Get the key of a recipe in the manifest. Recipes imported from several languages
+    at once are tagged with their language, the same shortcut can exist in each language.
+    :param recipe: a recipe converted from a snippet
+    :return: the shortcut of the recipe, prefixed by its language when tagged
+    """
+    if recipe.get("language"):
+        return f"{recipe['language']}/{recipe['shortcut']}"
+    return recipe["shortcut"]
+
+
+class RecipeJournal:
+    """
+    Recipes already uploaded, stored as JSON lines {"hash", "shortcut", "id"}. A line is
+    appended as soon as a recipe is created or updated, so the journal survives an interrupted
+    import. When a recipe is updated, the last line of its shortcut is its current version.
+    """
+    def __init__(self, path: typing.Optional[str]):
+        self.path = path
+        self.entries: typing.Dict[str, dict] = {}
+        self.shortcuts: typing.Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        if path and os.path.isfile(path):
+            with open(path, 'r', encoding='utf-8') as journal_file:
+                for line in journal_file:
+                    try:
+                        entry = json.loads(line)
+                        self.entries[entry["hash"]] = entry
+                        self.shortcuts[entry["shortcut"]] = entry
+                    except (ValueError, KeyError, TypeError):
+                        # line truncated when the import was interrupted
+                        continue
+
+    def contains(self, recipe_hash: str) -> bool:
+        """
+        :param recipe_hash: the hash of a recipe
+        :return: True if the recipe was already uploaded
+        """
+        return recipe_hash in self.entries
+
+    def get_by_shortcut(self, shortcut: str) -> typing.Optional[dict]:
+        """
+        :param shortcut: the shortcut of a recipe
+        :return: the current version of the recipe with this shortcut or None
+        """
+        return self.shortcuts.get(shortcut)
+
+    def add(self, recipe_hash: str, shortcut: str, recipe_id, persist: bool = True):
+        """
+        Record a recipe uploaded
+        :param recipe_hash: the hash of the recipe
+        :param shortcut: the shortcut of the recipe, see get_recipe_key
+        :param recipe_id: the identifier of the recipe created
+        :param persist: False to keep the recipe in memory only (e.g. recipes read from the API)
+        """
+        entry = {"hash": recipe_hash, "shortcut": shortcut, "id": recipe_id}
+        with self._lock:
+            self.entries[recipe_hash] = entry
+            self.shortcuts[shortcut] = entry
+            if self.path and persist:
+                with open(self.path, 'a', encoding='utf-8') as journal_file:
+                    journal_file.write(json.dumps(entry) + "\n")
+
+
+@dataclass
+class ImportSummary:
+    """
+    The result of an import.
+    """
+    created: int = 0
+    updated: int = 0
+    skipped: int = 0
+    failed: typing.List[typing.Tuple[str, str]] = field(default_factory=list)
+
+    def format(self) -> str:
+        """
+        :return: a text summary of the import
+        """
+        lines = [f"{self.created} recipes created, {self.updated} updated, {self.skipped} unchanged, "
+                 f"{len(self.failed)} failed"]
+        lines.extend(f"  {name}: {message}" for name, message in self.failed)
+        return "\n".join(lines)
+
+
+def get_error_message(result: typing.Optional[dict]) -> str:
+    """
+    :param result: the response of the API
+    :return: the error returned by the API
+    """
+    if result and result.get("errors"):
+        return result["errors"][0].get("message", "unknown error")
+    return f"unexpected response {result}"
+
+
+def get_recipe_id(result: typing.Optional[dict], field_name: str = "createAssistantRecipe"):
+    """
+    :param result: the response of the API to createAssistantRecipe or updateAssistantRecipe
+    :param field_name: the name of the mutation
+    :return: the identifier of the recipe created or updated, None if it failed
+    """
+    if result and result.get("data") and result["data"].get(field_name):
+        return result["data"][field_name].get("id")
+    return None
+
+
+def add_cookbook_recipes(api_token: str, cookbook_id: int, use_staging: bool, journal: RecipeJournal):
+    """
+    Add the recipes of a cookbook that are not in the journal, so that a sync
+    does not duplicate recipes created without this journal.
+    :param api_token: the API token
+    :param cookbook_id: the cookbook
+    :param use_staging: use the staging endpoint
+    :param journal: the journal to complete
+    :raise CookbookFetchException: if the recipes of the cookbook cannot all be fetched
+    """
+    try:
+        recipes = get_cookbook_recipes(api_token, cookbook_id, use_staging)
+    except (requests.RequestException, ValueError) as e:
+        raise CookbookFetchException(f"cannot get the recipes of cookbook {cookbook_id}: {e}") from e
+    for recipe in recipes:
+        if not recipe.get("shortcut"):
+            continue
+        # the API returns the code as text and the language in upper case (e.g. PYTHON)
+        languages = [None]
+        if recipe.get("language"):
+            languages.append(get_language(recipe["language"]) or recipe["language"])
+        for remote_language in languages:
+            key = get_recipe_key({"shortcut": recipe["shortcut"], "language": remote_language})
+            if journal.get_by_shortcut(key) is None:
+                journal.add(hash_recipe(recipe.get("name"), recipe["shortcut"], recipe.get("code") or "",
+                                        remote_language), key, recipe.get("id"), persist=False)
+
+
+def upload_recipes(api_token: str, recipes: typing.Iterable[dict], language: str, is_public: bool,
+                   cookbook_id: typing.Optional[int], use_staging: bool, journal: RecipeJournal,
+                   jobs: int = DEFAULT_JOBS, rate_per_sec: typing.Optional[float] = DEFAULT_RATE_PER_SEC,
+                   sync: bool = False) -> ImportSummary:
+    """
+    Upload recipes concurrently, as they are read. Recipes present in the journal are skipped.
+    :param api_token: the API token to post the recipes
+    :param recipes: the recipes to upload, e.g. a generator reading them from a file
+    :param language: the language of the recipes not tagged with their own language
+    :param is_public: True if the recipes are public
+    :param cookbook_id: the cookbook to add the recipes to, or None
+    :param use_staging: use the staging endpoint
+    :param journal: the recipes already uploaded, updated with the recipes created
+    :param jobs: maximum number of uploads at the same time
+    :param rate_per_sec: maximum number of uploads per second, unlimited if None
+    :param sync: True to update the recipes of the journal whose content changed (matched by shortcut)
+    :return: the summary of the import
+    :raise CookbookFetchException: in sync mode, if the recipes of the cookbook cannot all be fetched
+    """
+    summary = ImportSummary()
+    summary_lock = threading.Lock()
+    rate_limiter = RateLimiter(rate_per_sec)
+    recipe_url = RECIPE_URL_STAGING if use_staging else RECIPE_URL_PROD
+
+    def upload(index: int, recipe: dict, recipe_hash: str, existing_id):
+        rate_limiter.acquire()
+        recipe_language = recipe.get("language") or language
+        try:
+            if existing_id is not None:
+                result = update_recipe(api_token, existing_id, recipe, recipe_language, is_public, use_staging)
+                recipe_id = get_recipe_id(result, "updateAssistantRecipe")
+            else:
+                result = post_recipe(api_token, recipe, recipe_language, is_public, cookbook_id, use_staging)
+                recipe_id = get_recipe_id(result)
+        except (requests.RequestException, ValueError) as e:
+            result = {"errors": [{"message": str(e)}]}
+            recipe_id = None
+        with summary_lock:
+            if recipe_id and existing_id is not None:
+                summary.updated += 1
+                print(f"[UPDATED] {index} Recipe {recipe['name']} at: {recipe_url.format(recipe_id)}")
+            elif recipe_id:
+                summary.created += 1
+                print(f"[SUCCESS] {index} Recipe {recipe['name']} at: {recipe_url.format(recipe_id)}")
+            else:
+                summary.failed.append((recipe['name'], get_error_message(result)))
+                print(f"[ERROR] {index} Error when posting recipe {recipe['name']}: {get_error_message(result)}")
+        if recipe_id:
+            journal.add(recipe_hash, get_recipe_key(recipe), recipe_id)
+
+    if sync and cookbook_id is not None:
+        add_cookbook_recipes(api_token, cookbook_id, use_staging, journal)
+
+    # Recipes are uploaded as they are read, with a bounded number of uploads waiting.
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        in_flight: typing.Set[Future] = set()
+        for index, recipe in enumerate(recipes):
+            recipe_hash = get_recipe_hash(recipe)
+            existing = journal.get_by_shortcut(get_recipe_key(recipe)) if sync else None
+            if (sync and existing is not None and existing["hash"] == recipe_hash) \
+                    or (not sync and journal.contains(recipe_hash)):
+                with summary_lock:
+                    summary.skipped += 1
+                continue
+            in_flight.add(executor.submit(upload, index, recipe, recipe_hash, existing["id"] if existing else None))
+            if len(in_flight) >= MAX_PENDING_UPLOADS_PER_JOB * max(1, jobs):
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+        for future in in_flight:
+            future.result()
+    return summary
@@ -0,0 +1,190 @@
+"""
+Find the snippet files to import and their language. A source is either a single
+snippet file, a directory of snippet files or the package.json of a VS Code extension
+that declares its snippets in contributes.snippets. Files are converted in a pool of
+processes since the conversion of large snippet packs is CPU bound.
+"""
+import json
+import logging
+import os
+import typing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+from codiga.snippets.convert import convert_snippets_to_codiga
+from codiga.utils.json_stream import iter_json_object_items, iter_file_chunks
+
+log = logging.getLogger('codiga')
+
+VALID_LANGUAGES = ["Docker",
+                   "Objectivec",
+                   "Terraform",
+                   "Json",
+                   "Yaml",
+                   "Swift",
+                   "Solidity",
+                   "Sql",
+                   "Shell",
+                   "Scala",
+                   "Rust",
+                   "Ruby",
+                   "Php",
+                   "Python",
+                   "Perl",
+                   "Kotlin",
+                   "Html",
+                   "Haskell",
+                   "Go",
+                   "Apex",
+                   "Css",
+                   "Dart",
+                   "Javascript",
+                   "Typescript",
+                   "C",
+                   "Cpp",
+                   "Csharp",
+                   "Python",
+                   "Java"]
+
+# VS Code language identifiers that differ from the Codiga language names
+VSCODE_LANGUAGES = {
+    "dockerfile": "Docker",
+    "objective-c": "Objectivec",
+    "objective-cpp": "Objectivec",
+    "shellscript": "Shell",
+    "bash": "Shell",
+    "javascriptreact": "Javascript",
+    "typescriptreact": "Typescript",
+    "c++": "Cpp",
+    "c#": "Csharp",
+    "hcl": "Terraform",
+    "jsonc": "Json",
+}
+
+SNIPPET_FILE_EXTENSIONS = (".json", ".code-snippets")
+
+PACKAGE_FILE = "package.json"
+
+
+@dataclass
+class SnippetSource:
+    """
+    A snippet file and the language of its snippets (None if unknown).
+    """
+    path: str
+    language: typing.Optional[str]
+
+
+def get_language(language_id: typing.Optional[str]) -> typing.Optional[str]:
+    """
+    Get the Codiga language of a VS Code language identifier or of a file name
+    :param language_id: the identifier (e.g. javascriptreact, python, Python)
+    :return: the Codiga language or None if unknown
+    """
+    if not language_id:
+        return None
+    language_id = language_id.lower()
+    if language_id in VSCODE_LANGUAGES:
+        return VSCODE_LANGUAGES[language_id]
+    for language in VALID_LANGUAGES:
+        if language.lower() == language_id:
+            return language
+    return None
+
+
+def get_file_language(path: str) -> typing.Optional[str]:
+    """
+    Infer the language of a snippet file from its name (e.g. python.json, typescriptreact.code-snippets)
+    :param path: the path of the file
+    :return: the Codiga language or None if unknown
+    """
+    name = os.path.basename(path)
+    for extension in SNIPPET_FILE_EXTENSIONS:
+        if name.endswith(extension):
+            name = name[:-len(extension)]
+            break
+    return get_language(name)
+
+
+def get_package_sources(package_path: str, default_language: typing.Optional[str]) -> typing.List[SnippetSource]:
+    """
+    Get the snippet files declared in the contributes.snippets section of a VS Code extension
+    :param package_path: the path of the package.json file
+    :param default_language: the language of the files whose language is unknown
+    :return: the sources
+    """
+    with open(package_path, 'r', encoding='utf-8') as package_file:
+        package = json.load(package_file)
+    contributions = ((package or {}).get("contributes") or {}).get("snippets") or []
+    directory = os.path.dirname(os.path.abspath(package_path))
+    sources = []
+    for contribution in contributions:
+        if not isinstance(contribution, dict) or not contribution.get("path"):
+            continue
+        language_ids = contribution.get("language")
+        if isinstance(language_ids, list):
+            language_ids = language_ids[0] if language_ids else None
+        path = os.path.normpath(os.path.join(directory, contribution["path"]))
+        sources.append(SnippetSource(path, get_language(language_ids) or default_language))
+    return sources
+
+
+def find_snippet_sources(path: str, default_language: typing.Optional[str]) -> typing.List[SnippetSource]:
+    """
+    Find the snippet files to import. A directory that contains a package.json with snippet
+    contributions is read as a VS Code extension, otherwise all its snippet files are imported.
+    :param path: a snippet file, a package.json or a directory
+    :param default_language: the language of the files whose language cannot be inferred
+    :return: the sources, sorted by path for directories
+    """
+    if os.path.isdir(path):
+        package_path = os.path.join(path, PACKAGE_FILE)
+        if os.path.isfile(package_path):
+            sources = get_package_sources(package_path, default_language)
+            if sources:
+                return sources
+        sources = []
+        for root, directories, files in os.walk(path):
+            directories[:] = sorted(d for d in directories if not d.startswith(".") and d != "node_modules")
+            for name in sorted(files):
+                if name.endswith(SNIPPET_FILE_EXTENSIONS) and name != PACKAGE_FILE:
+                    file_path = os.path.join(root, name)
+                    sources.append(SnippetSource(file_path, get_file_language(file_path) or default_language))
+        return sources
+    if os.path.basename(path) == PACKAGE_FILE:
+        return get_package_sources(path, default_language)
+    return [SnippetSource(path, default_language or get_file_language(path))]
+
+
+def convert_snippet_source(source: SnippetSource, shortcut_prefix: typing.Optional[str]) -> typing.List[dict]:
+    """
+    Convert the snippets of a file. Each recipe is tagged with the language of the file.
+    :param source: the file
+    :param shortcut_prefix: prefix to add to shortcut
+    :return: the recipes
+    """
+    with open(source.path, 'r', encoding='utf-8') as snippet_file:
+        try:
+            recipes = list(convert_snippets_to_codiga(iter_json_object_items(iter_file_chunks(snippet_file)),
+                                                      shortcut_prefix))
+        except ValueError as e:
+            raise ValueError(f"{source.path}: {e}") from e
+    for recipe in recipes:
+        recipe["language"] = source.language
+    return recipes
+
+
+def convert_snippet_sources(sources: typing.List[SnippetSource], shortcut_prefix: typing.Optional[str],
+                            processes: typing.Optional[int] = None) -> typing.List[dict]:
+    """
+    Convert many snippet files in a pool of processes.
+    :param sources: the files to convert
+    :param shortcut_prefix: prefix to add to shortcut
+    :param processes: maximum number of processes, the number of CPUs if None
+    :return: the recipes of all the files, in the order of the sources
+    """
+    if len(sources) <= 1 or processes == 1:
+        return [recipe for source in sources for recipe in convert_snippet_source(source, shortcut_prefix)]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        results = executor.map(convert_snippet_source, sources, [shortcut_prefix] * len(sources))
+        return [recipe for recipes in results for recipe in recipes]
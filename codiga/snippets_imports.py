@@ -5,18 +5,31 @@ Usage:
 
 Options:
     --visibility <public|private>               Visibility of the snippet (public or private)
-    --language=<language>                       Language of the snippet (Java, Javascript, Typescript, etc)
-    --file=</path/to/snippets.json>             File to import (this or --url must be passed)
+    --language=<language>                       Language of the snippet (Java, Javascript, Typescript, etc), optional
+                                                when it can be inferred from the file names or the package.json
+    --file=</path/to/snippets.json>             File, directory or VS Code extension package.json to import
+                                                (this or --url must be passed)
+    --processes=<processes>                     Number of processes converting the files of a directory
+                                                (default: the number of CPUs)
     --url=<https://path/to/snippets.json>       URL to the snippet to import (this or --file must be passed)
     --cookbook=<cookbook-id>                    add recipe to a cookbook (optional)
     --shortcut-prefix=<prefix>                  prefix for all snippets (optional)
     --staging                                   Use staging endpoint (debugging only)
+    -j --jobs=<jobs>                            Number of recipes uploaded at the same time [default: 4]
+    --rate=<requests-per-sec>                   Maximum number of recipes uploaded per second, 0 for no limit [default: 5]
+    --journal=</path/to/journal.jsonl>          Journal of the recipes uploaded, used to resume an interrupted
+                                                import (default: a file in the cache directory for this import)
+    --sync                                      Only upload the recipes that changed since the last import: new
+                                                shortcuts are created, recipes with a changed content are updated
 
 Example:
     $ codiga-snippets-imports --visibility public --language Javascript --url https://url/to/snippets.json
+    $ codiga-snippets-imports --visibility public --file /path/to/extension/package.json
 """
 
+import contextlib
 import os
+import hashlib
 import json
 import logging
 import sys
@@ -26,43 +39,34 @@ import docopt
 
 
 from .constants import DEFAULT_TIMEOUT, API_TOKEN_ENVIRONMENT_VARIABLE
-from .graphql.recipe import post_recipe
-from .snippets.convert import convert_snippet_file_content_to_codiga
+from .exceptions.cookbook_fetch_exception import CookbookFetchException
+from .snippets.convert import convert_snippets_to_codiga
+from .snippets.importer import RecipeJournal, upload_recipes
+from .snippets.sources import VALID_LANGUAGES, PACKAGE_FILE, find_snippet_sources, convert_snippet_sources
+from .utils.cache_utils import get_cache_file
+from .utils.json_stream import iter_json_object_items, iter_file_chunks, DEFAULT_CHUNK_SIZE
 from .version import __version__
 
 logging.basicConfig()
 
 log = logging.getLogger('codiga')
 
-VALID_LANGUAGES = ["Docker",
-                   "Objectivec",
-                   "Terraform",
-                   "Json",
-                   "Yaml",
-                   "Swift",
-                   "Solidity",
-                   "Sql",
-                   "Shell",
-                   "Scala",
-                   "Rust",
-                   "Ruby",
-                   "Php",
-                   "Python",
-                   "Perl",
-                   "Kotlin",
-                   "Html",
-                   "Haskell",
-                   "Go",
-                   "Apex",
-                   "Css",
-                   "Dart",
-                   "Javascript",
-                   "Typescript",
-                   "C",
-                   "Cpp",
-                   "Csharp",
-                   "Python",
-                   "Java"]
+def get_default_journal_path(source, language, visibility, cookbook_id, use_staging):
+    """
+    Get the journal of an import in the cache directory. Running the same import
+    again uses the same journal and resumes the import.
+    :param source: the file or URL imported
+    :param language: the language of the snippets
+    :param visibility: the visibility of the snippets
+    :param cookbook_id: the cookbook or None
+    :param use_staging: if we use the staging endpoint or not
+    :return: the path of the journal
+    """
+    if source and not source.startswith("http") and os.path.exists(source):
+        source = os.path.abspath(source)
+    import_key = json.dumps([source, language, visibility, cookbook_id, bool(use_staging)])
+    return get_cache_file(f"snippets-import-{hashlib.sha256(import_key.encode('utf-8')).hexdigest()[:16]}.jsonl")
+
 
 def main(argv=None):
     """
@@ -79,6 +83,9 @@ def main(argv=None):
     use_staging = options['--staging']
     cookbook = options['--cookbook']
     shortcut_prefix = options['--shortcut-prefix']
+    journal_path = options['--journal']
+    sync = options['--sync']
+    processes = options['--processes']
 
     log.addHandler(logging.StreamHandler())
 
@@ -88,7 +95,7 @@ def main(argv=None):
         print("Invalid visibility, should be public or private")
         sys.exit(1)
 
-    if language not in VALID_LANGUAGES:
+    if language is not None and language not in VALID_LANGUAGES:
         print(f"Invalid language, valid languages: {','.join(VALID_LANGUAGES)}")
         sys.exit(1)
 
@@ -100,6 +107,10 @@ def main(argv=None):
         print("both --url and --file passed, please provide at least one method")
         sys.exit(1)
 
+    if url and not language:
+        print("--language is required with --url")
+        sys.exit(1)
+
     if cookbook:
         try:
             cookbook_id = int(cookbook)
@@ -109,6 +120,14 @@ def main(argv=None):
     else:
         cookbook_id = None
 
+    try:
+        jobs = int(options['--jobs'])
+        rate_per_sec = float(options['--rate'])
+        processes = int(processes) if processes else None
+    except ValueError:
+        print("Invalid number of jobs, rate or processes")
+        sys.exit(1)
+
     try:
         api_token = os.environ.get(API_TOKEN_ENVIRONMENT_VARIABLE)
 
@@ -117,44 +136,62 @@ def main(argv=None):
             log.info('%s environment variable not defined!', API_TOKEN_ENVIRONMENT_VARIABLE)
             sys.exit(1)
 
-        if url:
-            request = requests.get(url, timeout=10)
-            content = request.json()
-        if file:
-            if os.path.isfile(file):
-                with open(file) as myfile:
-                    file_content = myfile.read()
-                    try:
-                        content = json.loads(file_content)
-                    except json.decoder.JSONDecodeError:
-                        # Cannot read the file
-                        print("cannot read file, invalid JSON")
+        # Recipes are converted and uploaded as the file is read, the file stays open meanwhile.
+        with contextlib.ExitStack() as stack:
+            try:
+                if url:
+                    response = stack.enter_context(requests.get(url, timeout=10, stream=True))
+                    if response.status_code != 200:
+                        print(f"cannot get {url}, status {response.status_code}")
                         sys.exit(1)
-            else:
-                print("file not found")
+                    codiga_recipes = convert_snippets_to_codiga(
+                        iter_json_object_items(response.iter_content(chunk_size=DEFAULT_CHUNK_SIZE)),
+                        shortcut_prefix)
+                elif os.path.isdir(file) or os.path.basename(file) == PACKAGE_FILE:
+                    # several files, each recipe is tagged with the language of its file
+                    sources = find_snippet_sources(file, language)
+                    unknown_languages = [source.path for source in sources if source.language is None]
+                    if unknown_languages:
+                        print(f"cannot infer the language of {', '.join(unknown_languages)}, use --language")
+                        sys.exit(1)
+                    codiga_recipes = convert_snippet_sources(sources, shortcut_prefix, processes)
+                elif os.path.isfile(file):
+                    language = find_snippet_sources(file, language)[0].language
+                    if language is None:
+                        print("cannot infer the language of the file, use --language")
+                        sys.exit(1)
+                    snippet_file = stack.enter_context(open(file, encoding='utf-8'))
+                    codiga_recipes = convert_snippets_to_codiga(
+                        iter_json_object_items(iter_file_chunks(snippet_file)), shortcut_prefix)
+                else:
+                    print("file not found")
+                    sys.exit(1)
+
+                if not journal_path:
+                    journal_path = get_default_journal_path(url or file, language, visibility, cookbook_id,
+                                                            use_staging)
+                journal = RecipeJournal(journal_path)
+                summary = upload_recipes(api_token, codiga_recipes, language, visibility == "public", cookbook_id,
+                                         use_staging, journal, jobs, rate_per_sec, sync)
+            except CookbookFetchException as e:
+                print(f"{e}, sync aborted to avoid duplicating recipes")
+                sys.exit(1)
+            except OSError as e:
+                print(f"cannot read file: {e}")
+                sys.exit(1)
+            except ValueError as e:
+                # Cannot read the file, the recipes read before the error are in the journal
+                print(f"cannot read file, invalid JSON: {e}")
                 sys.exit(1)
 
-        if not content:
+        if not summary.created and not summary.updated and not summary.skipped and not summary.failed:
             print("no content read")
             sys.exit(1)
 
-        codiga_recipes = convert_snippet_file_content_to_codiga(content, shortcut_prefix)
-        recipe_index = 0
-        for codiga_recipe in codiga_recipes:
-            result = post_recipe(api_token, codiga_recipe, language, visibility == "public", cookbook_id, use_staging)
-            if result and "data" in result and result["data"]['createAssistantRecipe'] and result["data"]['createAssistantRecipe']['id']:
-                if use_staging:
-                    url = f"https://app-staging.codiga.io/assistant/recipe/{result['data']['createAssistantRecipe']['id']}/view"
-                else:
-                    url =f"https://app.codiga.io/assistant/recipe/{result['data']['createAssistantRecipe']['id']}/view"
-                print(f"[SUCCESS] {recipe_index} Recipe {codiga_recipe['name']} at: {url}")
-            else:
-                if "errors" in result:
-                    print(f"[ERROR] {recipe_index} Error when posting recipe {codiga_recipe['name']}: {result['errors'][0]['message']}")
-                else:
-                    print(f"[ERROR] {recipe_index} Error when posting recipe {codiga_recipe['name']}")
-                    print(result)
-            recipe_index = recipe_index + 1
+        print(summary.format())
+        if summary.failed:
+            print(f"Run the same command again to retry the failed recipes (journal: {journal_path})")
+            sys.exit(1)
         sys.exit(0)
     except KeyboardInterrupt:  # pragma: no cover
         log.info('Aborted')
@@ -0,0 +1,29 @@
+"""
+Utility functions to locate the directory where the tools keep data between runs.
+"""
+import os
+
+CACHE_DIRECTORY_ENVIRONMENT_VARIABLE = "CODIGA_CACHE_DIR"
+
+
+def get_cache_directory() -> str:
+    """
+    Get the directory used to store data between runs and create it if it does not exist.
+    The directory is $CODIGA_CACHE_DIR if defined, $XDG_CACHE_HOME/codiga or ~/.cache/codiga otherwise.
+    :return: the path of the cache directory
+    """
+    directory = os.environ.get(CACHE_DIRECTORY_ENVIRONMENT_VARIABLE)
+    if not directory:
+        base_directory = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        directory = os.path.join(base_directory, "codiga")
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def get_cache_file(filename: str) -> str:
+    """
+    Get the path of a file in the cache directory
+    :param filename: the name of the file
+    :return: the path of the file in the cache directory
+    """
+    return os.path.join(get_cache_directory(), filename)
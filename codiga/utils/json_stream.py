@@ -0,0 +1,130 @@
+"""
+Read the members of a large JSON object incrementally, without loading the whole document.
+"""
+import codecs
+import json
+import typing
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+WHITESPACES = " \t\n\r"
+
+
+class _ChunkReader:
+    """
+    A buffer over chunks of text, dropping the text already parsed.
+    """
+    def __init__(self, chunks: typing.Iterable[str]):
+        self._chunks = iter(chunks)
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+        # bytes are decoded incrementally since a character may be split between two chunks
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+
+    def fill(self, size: int = 1) -> bool:
+        """
+        Read chunks until at least size more characters are available, or the end of the input.
+        The chunks are joined once, so reading a large value does not copy the buffer for each chunk.
+        :param size: the minimum number of characters to read
+        :return: False if there is nothing left to read
+        """
+        if self.eof:
+            return False
+        chunks = [self.buffer[self.position:]]
+        read = 0
+        while read < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self.eof = True
+                break
+            if isinstance(chunk, bytes):
+                chunk = self._decoder.decode(chunk)
+            chunks.append(chunk)
+            read += len(chunk)
+        self.buffer = "".join(chunks)
+        self.position = 0
+        return len(chunks) > 1
+
+    def peek(self) -> typing.Optional[str]:
+        """
+        :return: the next character that is not a whitespace, None at the end of the input
+        """
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in WHITESPACES:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.fill():
+                return None
+
+    def expect(self, character: str):
+        """
+        Consume a character
+        :param character: the expected character
+        :raise ValueError: if the next character is different
+        """
+        found = self.peek()
+        if found != character:
+            raise ValueError(f"invalid JSON: expected {character!r}, found {found!r}")
+        self.position += 1
+
+    def decode(self, decoder: json.JSONDecoder):
+        """
+        Decode the next JSON value, reading more chunks until the value is complete. When the
+        value is incomplete, the text to decode is doubled before decoding it again, so that a
+        large value is only decoded a logarithmic number of times.
+        :param decoder: the decoder
+        :return: the value
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buffer, self.position)
+                # a number may continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.fill(max(len(self.buffer) - self.position, 1))
+
+
+def iter_json_object_items(chunks: typing.Iterable[typing.Union[str, bytes]]) \
+        -> typing.Iterator[typing.Tuple[str, typing.Any]]:
+    """
+    Iterate over the members of a JSON object, reading its text chunk by chunk. Only the
+    member being decoded is kept in memory.
+    :param chunks: the text of the JSON document, in chunks
+    :return: the key and the value of each member, in the order of the document
+    :raise ValueError: if the document is not a valid JSON object
+    """
+    reader = _ChunkReader(chunks)
+    decoder = json.JSONDecoder()
+    reader.expect("{")
+    if reader.peek() == "}":
+        reader.position += 1
+        return
+    while True:
+        if reader.peek() != '"':
+            raise ValueError("invalid JSON: expected a key")
+        key = reader.decode(decoder)
+        reader.expect(":")
+        value = reader.decode(decoder)
+        yield key, value
+        separator = reader.peek()
+        reader.position += 1
+        if separator == "}":
+            return
+        if separator != ",":
+            raise ValueError(f"invalid JSON: expected ',' or '}}', found {separator!r}")
+
+
+def iter_file_chunks(stream, chunk_size: int = DEFAULT_CHUNK_SIZE) -> typing.Iterator[str]:
+    """
+    :param stream: a file opened in text mode
+    :param chunk_size: the size of the chunks
+    :return: the content of the file in chunks
+    """
+    return iter(lambda: stream.read(chunk_size), "")
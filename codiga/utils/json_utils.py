@@ -0,0 +1,49 @@
+"""
+Encode and decode JSON with orjson when it is installed (pip install codiga[fast]),
+and with the json module otherwise. Both produce the same values.
+"""
+import json
+import typing
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def loads(data: typing.Union[bytes, bytearray, str]):
+    """
+    Decode a JSON document
+    :param data: the document, as UTF-8 bytes or text
+    :return: the decoded value
+    :raise ValueError: if the document is not valid JSON
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, (bytes, bytearray)):
+        data = data.decode('utf-8')
+    return json.loads(data)
+
+
+def dumps_bytes(value) -> bytes:
+    """
+    Encode a value in JSON
+    :param value: the value
+    :return: the document as UTF-8 bytes
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(value)
+        except TypeError:
+            # values orjson does not support, e.g. integers larger than 64 bits
+            pass
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def dumps(value) -> str:
+    """
+    Encode a value in JSON
+    :param value: the value
+    :return: the document as text
+    """
+    return dumps_bytes(value).decode('utf-8')
@@ -0,0 +1,113 @@
+"""
+Poll the API until an object (analysis, compare analysis) is complete.
+The interval between two requests starts small and grows exponentially, with some
+randomness so that many concurrent jobs do not poll the API at the same time.
+"""
+import logging
+import random
+import time
+import typing
+
+from codiga.exceptions.polling_timeout_exception import PollingTimeoutException
+
+INITIAL_INTERVAL_SECS = 1.0
+MAX_INTERVAL_SECS = 15.0
+BACKOFF_FACTOR = 1.5
+JITTER_RATIO = 0.2
+
+log = logging.getLogger('codiga')
+
+T = typing.TypeVar('T')
+
+
+class Deadline:
+    """
+    A point in time shared by all the operations of a command.
+    """
+    def __init__(self, timeout_secs: float):
+        self.expires_at: float = time.time() + timeout_secs
+
+    def remaining(self) -> float:
+        """
+        :return: the number of seconds before the deadline (0 if expired)
+        """
+        return max(self.expires_at - time.time(), 0)
+
+    def expired(self) -> bool:
+        """
+        :return: True if the deadline is reached
+        """
+        return time.time() >= self.expires_at
+
+
+def get_next_interval(interval_secs: float, max_interval_secs: float = MAX_INTERVAL_SECS,
+                      backoff_factor: float = BACKOFF_FACTOR) -> float:
+    """
+    :param interval_secs: the current interval
+    :param max_interval_secs: the maximum interval
+    :param backoff_factor: the growth of the interval
+    :return: the next interval between two requests
+    """
+    return min(interval_secs * backoff_factor, max_interval_secs)
+
+
+def add_jitter(interval_secs: float, jitter_ratio: float = JITTER_RATIO) -> float:
+    """
+    :param interval_secs: an interval
+    :param jitter_ratio: the maximum relative variation of the interval
+    :return: the interval with a random variation
+    """
+    return interval_secs * random.uniform(1 - jitter_ratio, 1 + jitter_ratio)
+
+
+def poll(fetch: typing.Callable[[], T],
+         is_complete: typing.Callable[[T], bool],
+         deadline: Deadline,
+         max_requests: typing.Optional[int] = None,
+         initial_interval_secs: float = INITIAL_INTERVAL_SECS,
+         max_interval_secs: float = MAX_INTERVAL_SECS,
+         interval_hint: typing.Optional[typing.Callable[[T], typing.Optional[float]]] = None,
+         sleep: typing.Optional[typing.Callable[[float], None]] = None) -> T:
+    """
+    Call fetch until is_complete returns True for its result. The first call is done
+    immediately, then the interval between two calls grows exponentially with jitter.
+
+    :param fetch: function getting the object from the API
+    :param is_complete: function returning True when the object is complete
+    :param deadline: when to stop polling
+    :param max_requests: maximum number of calls to fetch, unlimited if None
+    :param initial_interval_secs: the interval after the first call
+    :param max_interval_secs: the maximum interval between two calls
+    :param interval_hint: function returning the number of seconds to wait suggested by the API for
+      an object (e.g. an estimated completion time), or None when there is no suggestion
+    :param sleep: function used to wait, time.sleep by default
+    :return: the complete object
+    :raise PollingTimeoutException: if the object is not complete before the deadline or max_requests calls
+    """
+    sleep = sleep or time.sleep
+    interval_secs = initial_interval_secs
+    requests_count = 0
+    while True:
+        result = fetch()
+        requests_count += 1
+        if is_complete(result):
+            return result
+
+        if max_requests is not None and requests_count >= max_requests:
+            raise PollingTimeoutException(f"not complete after {requests_count} requests")
+
+        wait_secs = add_jitter(interval_secs)
+        if interval_hint is not None:
+            hint_secs = interval_hint(result)
+            if hint_secs is not None:
+                wait_secs = min(max(hint_secs, initial_interval_secs), max_interval_secs)
+
+        if deadline.remaining() <= 0:
+            raise PollingTimeoutException("deadline expired")
+
+        log.debug("not complete yet, next request in %.1f seconds", wait_secs)
+        sleep(min(wait_secs, deadline.remaining()))
+        interval_secs = get_next_interval(interval_secs, max_interval_secs)
+
+        if deadline.expired():
+            raise PollingTimeoutException("deadline expired")
@@ -0,0 +1,39 @@
+"""
+Limit the number of requests per second sent by several threads.
+"""
+import threading
+import time
+import typing
+
+
+class RateLimiter:
+    """
+    Token bucket shared by threads: acquire() blocks until a request can be sent.
+    """
+    def __init__(self, rate_per_sec: typing.Optional[float], burst: int = 1):
+        """
+        :param rate_per_sec: maximum number of requests per second, unlimited if None or 0
+        :param burst: number of requests that can be sent at once after an idle period
+        """
+        self.rate_per_sec = rate_per_sec
+        self.burst = burst
+        self._tokens: float = burst
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Wait until a request can be sent.
+        """
+        if not self.rate_per_sec:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate_per_sec)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_secs = (1 - self._tokens) / self.rate_per_sec
+            time.sleep(wait_secs)
@@ -0,0 +1,97 @@
+"""
+Limit the retries of requests shared by several threads: a retry budget for the whole process
+and a circuit breaker that fails fast when an endpoint is down.
+"""
+import threading
+import time
+
+from codiga.exceptions.circuit_open_exception import CircuitOpenException
+
+
+class RetryBudget:
+    """
+    Retries allowed for the whole process. Each retry spends one token and each successful
+    request gives back a fraction of a token, so that retries stay a small part of the traffic
+    when the API is failing instead of multiplying the requests of every thread.
+    """
+    def __init__(self, max_tokens: float = 10, token_ratio: float = 0.1):
+        """
+        :param max_tokens: maximum number of retries in a row
+        :param token_ratio: tokens given back by each successful request
+        """
+        self.max_tokens = max_tokens
+        self.token_ratio = token_ratio
+        self._tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        """
+        Spend a token to retry a request
+        :return: True if the request can be retried
+        """
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def record_success(self):
+        """
+        Record a successful request
+        """
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.token_ratio)
+
+
+class CircuitBreaker:
+    """
+    Open the circuit after consecutive failures: requests then fail immediately. After
+    reset_timeout_secs, one request is allowed to check if the endpoint is back.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout_secs: float = 30.0):
+        """
+        :param failure_threshold: number of consecutive failures that opens the circuit
+        :param reset_timeout_secs: time before trying again once the circuit is open
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_secs = reset_timeout_secs
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """
+        Check that a request can be sent
+        :raise CircuitOpenException: if the circuit is open
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout_secs:
+                # let this request check if the endpoint is back, the others still fail fast
+                self.state = self.HALF_OPEN
+                return
+            raise CircuitOpenException(f"too many failures, retry in {self.reset_timeout_secs} seconds at most")
+
+    def record_success(self):
+        """
+        Record a successful request, closing the circuit
+        """
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        """
+        Record a failed request, opening the circuit after too many failures
+        """
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
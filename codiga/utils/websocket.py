@@ -0,0 +1,248 @@
+"""
+Minimal WebSocket client (RFC 6455) used for GraphQL subscriptions.
+It supports text messages only and answers ping frames automatically.
+"""
+import base64
+import hashlib
+import os
+import socket
+import ssl
+import struct
+import typing
+import urllib.parse
+
+from codiga.exceptions.websocket_exception import WebSocketException
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+WEBSOCKET_VERSION = "13"
+
+OPCODE_CONTINUATION = 0x0
+OPCODE_TEXT = 0x1
+OPCODE_BINARY = 0x2
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xA
+
+CLOSE_NORMAL = 1000
+
+MAX_HEADERS_SIZE = 65536
+
+
+def get_accept_key(key: str) -> str:
+    """
+    :param key: the Sec-WebSocket-Key sent by the client
+    :return: the Sec-WebSocket-Accept value expected from the server
+    """
+    digest = hashlib.sha1((key + WEBSOCKET_GUID).encode('utf-8')).digest()
+    return base64.b64encode(digest).decode('ascii')
+
+
+def mask_payload(mask: bytes, payload: bytes) -> bytes:
+    """
+    Apply a WebSocket mask to a payload (masking and unmasking are the same operation)
+    :param mask: the 4 bytes of the mask
+    :param payload: the payload
+    :return: the masked payload
+    """
+    length = len(payload)
+    repeated_mask = (mask * (length // 4 + 1))[:length]
+    return (int.from_bytes(payload, 'big') ^ int.from_bytes(repeated_mask, 'big')).to_bytes(length, 'big')
+
+
+def encode_frame(opcode: int, payload: bytes, mask: typing.Optional[bytes] = None) -> bytes:
+    """
+    Encode a final frame.
+    :param opcode: the opcode of the frame
+    :param payload: the payload of the frame
+    :param mask: the mask (clients must mask their frames, servers must not)
+    :return: the bytes of the frame
+    """
+    header = bytearray([0x80 | opcode])
+    mask_bit = 0x80 if mask is not None else 0
+    length = len(payload)
+    if length < 126:
+        header.append(mask_bit | length)
+    elif length < 65536:
+        header.append(mask_bit | 126)
+        header += struct.pack("!H", length)
+    else:
+        header.append(mask_bit | 127)
+        header += struct.pack("!Q", length)
+    if mask is None:
+        return bytes(header) + payload
+    return bytes(header) + mask + mask_payload(mask, payload)
+
+
+class WebSocketConnection:
+    """
+    A WebSocket connection opened by the client once the handshake is done.
+    """
+    def __init__(self, sock: socket.socket, buffer: bytes = b""):
+        self.sock = sock
+        self._buffer = bytearray(buffer)
+        self._fragments: typing.List[bytes] = []
+        self._closed = False
+
+    def settimeout(self, timeout: typing.Optional[float]):
+        """
+        :param timeout: the maximum number of seconds to wait for data, None to wait forever
+        """
+        self.sock.settimeout(timeout)
+
+    def _fill_buffer(self, size: int):
+        while len(self._buffer) < size:
+            data = self.sock.recv(max(size - len(self._buffer), 4096))
+            if not data:
+                raise WebSocketException("connection closed by the server")
+            self._buffer += data
+
+    def _receive_frame(self) -> typing.Tuple[bool, int, bytes]:
+        # The frame is only removed from the buffer once complete: after a receive timeout,
+        # the next call reads the same frame again.
+        self._fill_buffer(2)
+        first, second = self._buffer[0], self._buffer[1]
+        length = second & 0x7F
+        offset = 2
+        if length == 126:
+            self._fill_buffer(4)
+            length = struct.unpack("!H", self._buffer[2:4])[0]
+            offset = 4
+        elif length == 127:
+            self._fill_buffer(10)
+            length = struct.unpack("!Q", self._buffer[2:10])[0]
+            offset = 10
+        mask = None
+        if second & 0x80:
+            self._fill_buffer(offset + 4)
+            mask = bytes(self._buffer[offset:offset + 4])
+            offset += 4
+        self._fill_buffer(offset + length)
+        payload = bytes(self._buffer[offset:offset + length])
+        del self._buffer[:offset + length]
+        if mask is not None:
+            payload = mask_payload(mask, payload)
+        return bool(first & 0x80), first & 0x0F, payload
+
+    def _send_frame(self, opcode: int, payload: bytes):
+        self.sock.sendall(encode_frame(opcode, payload, os.urandom(4)))
+
+    def send_text(self, text: str):
+        """
+        Send a text message
+        :param text: the message
+        """
+        self._send_frame(OPCODE_TEXT, text.encode('utf-8'))
+
+    def receive_text(self) -> str:
+        """
+        Wait for the next text message. Ping frames received meanwhile are answered.
+        :return: the message
+        :raise WebSocketException: if the connection is closed
+        :raise socket.timeout: if the message is not received in time, the data already received is kept
+        """
+        while True:
+            final, opcode, payload = self._receive_frame()
+            if opcode == OPCODE_PING:
+                self._send_frame(OPCODE_PONG, payload)
+            elif opcode == OPCODE_PONG:
+                continue
+            elif opcode == OPCODE_CLOSE:
+                self.close()
+                raise WebSocketException("connection closed by the server")
+            elif opcode in [OPCODE_TEXT, OPCODE_BINARY, OPCODE_CONTINUATION]:
+                self._fragments.append(payload)
+                if final:
+                    message = b"".join(self._fragments).decode('utf-8')
+                    self._fragments = []
+                    return message
+
+    def close(self):
+        """
+        Close the connection, ignoring errors if the server is already gone.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._send_frame(OPCODE_CLOSE, struct.pack("!H", CLOSE_NORMAL))
+        except OSError:
+            pass
+        self.sock.close()
+
+
+def read_http_headers(sock: socket.socket) -> typing.Tuple[bytes, bytes]:
+    """
+    Read the HTTP headers of a response
+    :param sock: the socket
+    :return: the headers and the bytes received after the headers
+    """
+    data = b""
+    while b"\r\n\r\n" not in data:
+        chunk = sock.recv(4096)
+        if not chunk:
+            raise WebSocketException("connection closed during the handshake")
+        data += chunk
+        if len(data) > MAX_HEADERS_SIZE:
+            raise WebSocketException("handshake response too large")
+    headers, remaining = data.split(b"\r\n\r\n", 1)
+    return headers, remaining
+
+
+def websocket_connect(url: str, headers: typing.Optional[dict] = None, subprotocol: typing.Optional[str] = None,
+                      timeout: typing.Optional[float] = None) -> WebSocketConnection:
+    """
+    Open a WebSocket connection.
+    :param url: the URL (ws:// or wss://)
+    :param headers: additional HTTP headers for the handshake
+    :param subprotocol: the subprotocol required from the server
+    :param timeout: the timeout to connect and for the handshake
+    :return: the connection
+    :raise WebSocketException: if the server does not accept the connection
+    :raise OSError: if we cannot connect to the server
+    """
+    parsed = urllib.parse.urlsplit(url)
+    if parsed.scheme not in ["ws", "wss"]:
+        raise WebSocketException(f"invalid WebSocket URL {url}")
+    secure = parsed.scheme == "wss"
+    port = parsed.port or (443 if secure else 80)
+    path = parsed.path or "/"
+    if parsed.query:
+        path = f"{path}?{parsed.query}"
+
+    sock = socket.create_connection((parsed.hostname, port), timeout=timeout)
+    try:
+        if secure:
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=parsed.hostname)
+
+        key = base64.b64encode(os.urandom(16)).decode('ascii')
+        request_headers = {
+            "Host": parsed.netloc,
+            "Upgrade": "websocket",
+            "Connection": "Upgrade",
+            "Sec-WebSocket-Key": key,
+            "Sec-WebSocket-Version": WEBSOCKET_VERSION,
+        }
+        if subprotocol:
+            request_headers["Sec-WebSocket-Protocol"] = subprotocol
+        request_headers.update(headers or {})
+        request = f"GET {path} HTTP/1.1\r\n"
+        request += "".join(f"{name}: {value}\r\n" for name, value in request_headers.items())
+        sock.sendall((request + "\r\n").encode('utf-8'))
+
+        response, remaining = read_http_headers(sock)
+        lines = response.decode('iso-8859-1').split("\r\n")
+        status = lines[0].split(" ")
+        if len(status) < 2 or status[1] != "101":
+            raise WebSocketException(f"WebSocket handshake refused: {lines[0]}")
+        response_headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+        if response_headers.get("sec-websocket-accept") != get_accept_key(key):
+            raise WebSocketException("invalid Sec-WebSocket-Accept header")
+        if subprotocol and response_headers.get("sec-websocket-protocol") != subprotocol:
+            raise WebSocketException(f"server does not support the {subprotocol} subprotocol")
+    except BaseException:
+        sock.close()
+        raise
+    return WebSocketConnection(sock, remaining)
@@ -39,12 +39,15 @@ setup(
             'codiga-snippets-import = codiga.snippets_imports:main',
             'codiga-export-ruleset = codiga.export_ruleset:main',
             'codiga-compare = codiga.compare:main',
-            'codiga-project = codiga.project:main'
+            'codiga-project = codiga.project:main',
+            'codiga-rule-stats = codiga.rule_stats:main',
+            'codiga-lock = codiga.lock_rulesets:main'
         ],
     },
     install_requires=['docopt>=0.6.2', 'requests>=2.27.1', "unidiff>=0.7.4", "tenacity>=8.1.0", "pyyaml>=6.0"],
     extras_require={
         'yaml': ['PyYAML>=3.10'],
+        'fast': ['orjson>=3.6.0', 'brotli>=1.0.9'],
         ':python_version < "3"': ['urllib3[secure]'],
         ':python_version < "3.7"': ['dataclasses'],
     },
@@ -0,0 +1,83 @@
+"""
+Test for methods in graphql/cache.py
+"""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+
+from codiga.graphql.cache import ResponseCache, do_cached_graphql_query, get_response_cache_key
+
+
+class TestResponseCache(unittest.TestCase):
+    """
+    Tests for graphql/cache.py
+    """
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = ResponseCache(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_cache_key(self):
+        """
+        Check that the formatting of the query and the order of the variables do not
+        change the key, and that the key depends on the token.
+        :return:
+        """
+        key = get_response_cache_key("token", {"query": "query Q($a: Int) {\n  f(a: $a) { id }\n}",
+                                               "variables": {"a": 1, "b": 2}})
+        self.assertEqual(key, get_response_cache_key("token", {"query": "query Q($a: Int) { f(a: $a) { id } }",
+                                                               "variables": {"b": 2, "a": 1}}))
+        self.assertNotEqual(key, get_response_cache_key("other", {"query": "query Q($a: Int) { f(a: $a) { id } }",
+                                                                  "variables": {"b": 2, "a": 1}}))
+
+    def test_expiration(self):
+        self.cache.set("permanent", {"a": 1})
+        self.cache.set("mutable", {"b": 2}, ttl_secs=10)
+        self.assertEqual({"a": 1}, self.cache.get("permanent"))
+        self.assertEqual({"b": 2}, self.cache.get("mutable"))
+
+        with patch('codiga.graphql.cache.time.time', return_value=4102444800):
+            self.assertEqual({"a": 1}, self.cache.get("permanent"))
+            self.assertIsNone(self.cache.get("mutable"))
+        self.assertFalse(os.path.exists(os.path.join(self.directory.name, "mutable.json")))
+
+    def test_eviction(self):
+        """
+        Check that the least recently used entries are removed first
+        :return:
+        """
+        cache = ResponseCache(self.directory.name, max_bytes=250)
+        for index in range(3):
+            cache.set(f"key{index}", {"value": "x" * 50})
+            os.utime(os.path.join(self.directory.name, f"key{index}.json"), (index, index))
+        cache.set("key3", {"value": "x" * 50})
+
+        self.assertIsNone(cache.get("key0"))
+        self.assertIsNone(cache.get("key1"))
+        self.assertIsNotNone(cache.get("key2"))
+        self.assertIsNotNone(cache.get("key3"))
+
+    def test_do_cached_graphql_query(self):
+        """
+        Check that immutable responses are served from the cache and
+        that mutable responses are not kept when their TTL is 0.
+        :return:
+        """
+        query_function = MagicMock()
+        query_function.side_effect = [{"analysis": {"status": "InProgress"}}, {"analysis": {"status": "Done"}}]
+        payload = {"query": "query A($id: Long!) { analysis(id: $id) { status } }", "variables": {"id": 1}}
+
+        def is_immutable(data):
+            return data["analysis"]["status"] == "Done"
+
+        with patch('codiga.graphql.cache.get_response_cache', return_value=self.cache):
+            for _ in range(3):
+                data = do_cached_graphql_query("token", payload, is_immutable, mutable_ttl_secs=0,
+                                               query_function=query_function)
+
+        self.assertEqual("Done", data["analysis"]["status"])
+        self.assertEqual(2, query_function.call_count)
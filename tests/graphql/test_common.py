@@ -0,0 +1,278 @@
+"""
+Test for methods in graphql/common.py
+"""
+
+import gzip
+import http.server
+import threading
+import unittest
+from unittest.mock import patch, MagicMock
+
+import requests
+
+from codiga.constants import GRAPHQL_ENDPOINT_PROD_URL
+from codiga.exceptions.circuit_open_exception import CircuitOpenException
+from codiga.graphql import common
+from codiga.graphql.common import post_graphql_payload, build_batch_payload, split_batch_data, GraphQLBatcher, \
+    do_graphql_query_with_api_token, send_graphql_payload, get_graphql_response
+from codiga.utils.retry import RetryBudget
+from codiga.graphql.registry import register_query
+
+TEST_QUERY = register_query("""
+    query TestPersistedQuery($id: Long!) {
+      analysis(id: $id) { id }
+    }
+""")
+
+
+def make_response(status_code, content, headers=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.content = content
+    response.headers = headers or {}
+    return response
+
+
+class TestCommon(unittest.TestCase):
+    """
+    Tests for graphql/common.py
+    """
+    def setUp(self):
+        common._endpoints_without_persisted_queries.clear()
+
+    def tearDown(self):
+        common._endpoints_without_persisted_queries.clear()
+
+    @patch('codiga.graphql.common.http_session.post')
+    def test_persisted_query_hit(self, post_mock):
+        """
+        Check that only the hash is sent when the server knows the query
+        :return:
+        """
+        post_mock.return_value = make_response(200, b'{"data": {"analysis": {"id": 1}}}')
+        post_graphql_payload("http://endpoint", TEST_QUERY.payload({"id": 1}), {})
+        self.assertEqual(1, post_mock.call_count)
+        sent_payload = post_mock.call_args[1]['json']
+        self.assertNotIn("query", sent_payload)
+        self.assertEqual(TEST_QUERY.sha256, sent_payload["extensions"]["persistedQuery"]["sha256Hash"])
+        self.assertEqual({"id": 1}, sent_payload["variables"])
+
+    @patch('codiga.graphql.common.http_session.post')
+    def test_persisted_query_miss(self, post_mock):
+        """
+        Check that the query text is sent when the server does not know the hash, and that
+        we stop using persisted queries when the server does not support them
+        :return:
+        """
+        post_mock.side_effect = [
+            make_response(200, b'{"errors": [{"message": "PersistedQueryNotFound"}]}'),
+            make_response(200, b'{"data": {"analysis": {"id": 1}}}')
+        ]
+        post_graphql_payload("http://endpoint", TEST_QUERY.payload({"id": 1}), {})
+        self.assertEqual(2, post_mock.call_count)
+        self.assertEqual(TEST_QUERY.text, post_mock.call_args[1]['json']["query"])
+
+        post_mock.reset_mock()
+        post_mock.side_effect = [
+            make_response(400, b'{"errors": [{"message": "Syntax error"}]}'),
+            make_response(200, b'{"data": {"analysis": {"id": 1}}}'),
+            make_response(200, b'{"data": {"analysis": {"id": 1}}}')
+        ]
+        post_graphql_payload("http://endpoint", TEST_QUERY.payload({"id": 1}), {})
+        post_graphql_payload("http://endpoint", TEST_QUERY.payload({"id": 1}), {})
+        self.assertEqual(3, post_mock.call_count)
+        self.assertEqual(TEST_QUERY.text, post_mock.call_args[1]['json']["query"])
+
+
+    @patch('codiga.graphql.common.http_session.post')
+    def test_persisted_query_errors(self, post_mock):
+        """
+        Check that persisted queries are only disabled when the server does not support them,
+        and that transient statuses and data mentioning persisted queries are returned as is
+        :return:
+        """
+        post_mock.return_value = make_response(200, b'{"data": {"analysis": {"name": "PersistedQueryNotFound"}}}')
+        post_graphql_payload("http://endpoint", TEST_QUERY.payload({"id": 1}), {})
+        self.assertEqual(1, post_mock.call_count)
+
+        post_mock.reset_mock()
+        post_mock.return_value = make_response(503, b'{"errors": [{"message": "unavailable"}]}')
+        self.assertEqual(503, post_graphql_payload("http://endpoint", TEST_QUERY.payload({"id": 1}), {}).status_code)
+        self.assertEqual(1, post_mock.call_count)
+        self.assertTrue(common.use_persisted_queries("http://endpoint"))
+
+        post_mock.reset_mock()
+        post_mock.return_value = None
+        post_mock.side_effect = [
+            make_response(200, b'{"errors": [{"message": "x", "extensions": {"code": "PERSISTED_QUERY_NOT_FOUND"}}]}'),
+            make_response(200, b'{"data": {"analysis": {"id": 1}}}')
+        ]
+        post_graphql_payload("http://endpoint", TEST_QUERY.payload({"id": 1}), {})
+        self.assertEqual(2, post_mock.call_count)
+        self.assertTrue(common.use_persisted_queries("http://endpoint"))
+
+        post_mock.reset_mock()
+        post_mock.side_effect = [
+            make_response(200, b'{"errors": [{"message": "PersistedQueryNotSupported"}]}'),
+            make_response(200, b'{"data": {"analysis": {"id": 1}}}')
+        ]
+        post_graphql_payload("http://endpoint", TEST_QUERY.payload({"id": 1}), {})
+        self.assertEqual(2, post_mock.call_count)
+        self.assertFalse(common.use_persisted_queries("http://endpoint"))
+
+class TestBatching(unittest.TestCase):
+    """
+    Tests for the batching of GraphQL queries
+    """
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_build_batch_payload(self):
+        """
+        Check that variables and root fields of the queries are prefixed
+        :return:
+        """
+        payload = build_batch_payload([(TEST_QUERY, {"id": 1}), (TEST_QUERY, {"id": 2})])
+        self.assertEqual({"b0_id": 1, "b1_id": 2}, payload["variables"])
+        self.assertIn("query Batch($b0_id: Long!, $b1_id: Long!)", payload["query"])
+        self.assertIn("b0_analysis: analysis(id: $b0_id)", payload["query"])
+        self.assertIn("b1_analysis: analysis(id: $b1_id)", payload["query"])
+
+        self.assertEqual([{"analysis": {"id": 1}}, {"analysis": None}],
+                         split_batch_data([(TEST_QUERY, {"id": 1}), (TEST_QUERY, {"id": 2})],
+                                          {"b0_analysis": {"id": 1}, "b1_analysis": None}))
+
+    @patch('codiga.graphql.common.do_graphql_query')
+    def test_batcher(self, do_graphql_query_mock):
+        """
+        Check that queries submitted concurrently are sent in one request
+        :return:
+        """
+        def fake_query(api_token, payload):
+            return {key: {"id": value} for key, value in
+                    zip(["b0_analysis", "b1_analysis", "b2_analysis"], payload["variables"].values())}
+        do_graphql_query_mock.side_effect = fake_query
+
+        batcher = GraphQLBatcher("api_token", window_secs=0.05)
+        futures = [batcher.submit(TEST_QUERY, {"id": i}) for i in range(3)]
+        self.assertEqual([{"analysis": {"id": i}} for i in range(3)], [f.result(timeout=5) for f in futures])
+        self.assertEqual(1, do_graphql_query_mock.call_count)
+
+        # Reaching the maximum size sends the batch immediately
+        batcher = GraphQLBatcher("api_token", window_secs=60, max_batch_size=3)
+        futures = [batcher.submit(TEST_QUERY, {"id": i}) for i in range(3)]
+        self.assertEqual({"analysis": {"id": 2}}, futures[2].result(timeout=5))
+
+
+class TestRetries(unittest.TestCase):
+    """
+    Tests for the retries of GraphQL queries
+    """
+    def setUp(self):
+        common._circuit_breakers.clear()
+        common.retry_budget = RetryBudget()
+
+    def tearDown(self):
+        common._circuit_breakers.clear()
+        common.retry_budget = RetryBudget()
+
+    @patch('codiga.graphql.common.http_session.post')
+    def test_retry_transient_status(self, post_mock):
+        """
+        Check that 503 responses are retried after the time given by Retry-After
+        and that other errors are not retried.
+        :return:
+        """
+        response = make_response(200, b'{"data": {"ok": true}}')
+        post_mock.side_effect = [make_response(503, b"", {"Retry-After": "0"}), response]
+        with patch.object(send_graphql_payload.retry, 'sleep') as sleep_mock:
+            self.assertEqual({"ok": True}, do_graphql_query_with_api_token("token", {"query": "q"}))
+            self.assertEqual([0.0], [call[0][0] for call in sleep_mock.call_args_list])
+        self.assertEqual(2, post_mock.call_count)
+
+        post_mock.reset_mock()
+        post_mock.side_effect = [make_response(400, b"")]
+        self.assertIsNone(do_graphql_query_with_api_token("token", {"query": "q"}))
+        self.assertEqual(1, post_mock.call_count)
+
+        post_mock.reset_mock()
+        response = make_response(200, b'{"errors": []}')
+        post_mock.side_effect = [response]
+        with self.assertRaises(KeyError):
+            do_graphql_query_with_api_token("token", {"query": "q"})
+        self.assertEqual(1, post_mock.call_count)
+
+    @patch('codiga.graphql.common.http_session.post')
+    def test_retry_budget_and_circuit_breaker(self, post_mock):
+        """
+        Check that retries stop when the budget is spent and that requests fail
+        without being sent once the endpoint failed too many times.
+        :return:
+        """
+        common.retry_budget = RetryBudget(max_tokens=2)
+        post_mock.side_effect = requests.ConnectionError("connection refused")
+        with patch.object(send_graphql_payload.retry, 'sleep'):
+            with self.assertRaises(requests.ConnectionError):
+                do_graphql_query_with_api_token("token", {"query": "q"})
+            self.assertEqual(3, post_mock.call_count)
+
+            common.retry_budget = RetryBudget()
+            with self.assertRaises(CircuitOpenException):
+                send_graphql_payload(GRAPHQL_ENDPOINT_PROD_URL, {"query": "q"}, {})
+            self.assertIsNone(do_graphql_query_with_api_token("token", {"query": "q"}))
+        self.assertEqual(5, post_mock.call_count)
+
+    @patch('codiga.graphql.common.http_session.post')
+    def test_circuit_breaker_probe_failure(self, post_mock):
+        """
+        Check that a probe of a half-open circuit that raises a non-transient error opens the circuit again
+        :return:
+        """
+        circuit_breaker = common.get_circuit_breaker("http://endpoint")
+        circuit_breaker.reset_timeout_secs = 0
+        circuit_breaker.state = circuit_breaker.OPEN
+        post_mock.side_effect = requests.exceptions.InvalidURL("invalid")
+        with self.assertRaises(requests.exceptions.InvalidURL):
+            send_graphql_payload("http://endpoint", {"query": "q"}, {})
+        self.assertEqual(circuit_breaker.OPEN, circuit_breaker.state)
+
+        post_mock.side_effect = None
+        post_mock.return_value = make_response(200, b'{"data": {}}')
+        send_graphql_payload("http://endpoint", {"query": "q"}, {})
+        self.assertEqual(circuit_breaker.CLOSED, circuit_breaker.state)
+
+    def test_compressed_response(self):
+        """
+        Check that compressed responses are requested and decoded.
+        :return:
+        """
+        accept_encodings = []
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers["Content-Length"]))
+                accept_encodings.append(self.headers.get("Accept-Encoding"))
+                body = gzip.compress(b'{"data": {"rules": ["' + b"a" * 10000 + b'"]}}')
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = http.server.HTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            endpoint = f"http://127.0.0.1:{server.server_address[1]}/graphql"
+            response = get_graphql_response(endpoint, {"query": "q"}, {})
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(["a" * 10000], response["data"]["rules"])
+        self.assertIn("gzip", accept_encodings[0])
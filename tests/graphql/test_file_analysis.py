@@ -5,7 +5,8 @@ Test for methods in graphql/file_analysis.py
 import unittest
 from unittest.mock import patch
 
-from codiga.graphql.file_analysis import graphql_get_file_analysis, graphql_create_file_analysis
+from codiga.graphql.file_analysis import graphql_get_file_analysis, graphql_create_file_analysis, \
+    CREATE_FILE_ANALYSIS_MUTATION
 
 
 class TestFileAnalysis(unittest.TestCase):
@@ -44,9 +45,13 @@ class TestFileAnalysis(unittest.TestCase):
         :return:
         """
         graphql_create_file_analysis("api_token", "filename", "language", "content", 1)
-        query = {'query': '\n    mutation{\n        createFileAnalysis (\n            language: language,\n            code: "content",\n            filename: "filename"\n            projectId: 1\n        )\n    }\n    '}
-        do_graphql_query_mock.assert_called_with("api_token", query)
+        payload = {'query': CREATE_FILE_ANALYSIS_MUTATION.text,
+                   'operationName': 'CreateFileAnalysis',
+                   'variables': {'language': 'language', 'code': 'content', 'filename': 'filename', 'projectId': 1}}
+        do_graphql_query_mock.assert_called_with("api_token", payload)
 
         graphql_create_file_analysis("api_token", "filename", "language", "content", None)
-        query = {'query': '\n    mutation{\n        createFileAnalysis (\n            language: language,\n            code: "content",\n            filename: "filename"\n            projectId: null\n        )\n    }\n    '}
-        do_graphql_query_mock.assert_called_with("api_token", query)
+        payload = {'query': CREATE_FILE_ANALYSIS_MUTATION.text,
+                   'operationName': 'CreateFileAnalysis',
+                   'variables': {'language': 'language', 'code': 'content', 'filename': 'filename'}}
+        do_graphql_query_mock.assert_called_with("api_token", payload)
@@ -6,7 +6,7 @@ import unittest
 from unittest.mock import patch
 
 from codiga.graphql.file_analysis import graphql_get_file_analysis, graphql_create_file_analysis
-from codiga.graphql.project import graphql_get_project_info
+from codiga.graphql.project import graphql_get_project_info, PROJECT_INFO_QUERY
 
 
 class TestProject(unittest.TestCase):
@@ -36,11 +36,12 @@ class TestProject(unittest.TestCase):
         :return:
         """
         do_graphql_query_mock.return_value = {'project': 'bla'}
+        self.assertEqual({'name': 'project_name'}, PROJECT_INFO_QUERY.payload({'name': 'project_name'})['variables'])
         data = graphql_get_project_info("api_token", "project_name")
-        do_graphql_query_mock.assert_called_with("api_token", {'query': '\n        {\n          project(name:"project_name") {\n            id\n            name\n            public\n            description\n            status\n            owner{\n              username\n            }\n            level\n            analysesCount\n          }\n        }\n    '})
+        do_graphql_query_mock.assert_called_with("api_token", PROJECT_INFO_QUERY.payload({'name': 'project_name'}))
         self.assertEqual('bla', data)
 
         do_graphql_query_mock.return_value = {}
         data = graphql_get_project_info("api_token", "project_name")
-        do_graphql_query_mock.assert_called_with("api_token", {'query': '\n        {\n          project(name:"project_name") {\n            id\n            name\n            public\n            description\n            status\n            owner{\n              username\n            }\n            level\n            analysesCount\n          }\n        }\n    '})
+        do_graphql_query_mock.assert_called_with("api_token", PROJECT_INFO_QUERY.payload({'name': 'project_name'}))
         self.assertIsNone(data)
@@ -0,0 +1,59 @@
+"""
+Test for methods in graphql/registry.py
+"""
+
+import unittest
+
+from codiga.graphql.registry import register_query, get_registered_query
+
+
+class TestRegistry(unittest.TestCase):
+    """
+    Tests for graphql/registry.py
+    """
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_register_query(self):
+        """
+        Check that queries are parsed, registered and produce the expected payload
+        :return:
+        """
+        query = register_query("""
+            query TestProject($name: String!, $revision: String) {
+              project(name: $name) {
+                analyses(revision: $revision, howmany: 1, skip: 0) { id }
+              }
+            }
+        """)
+        self.assertEqual("query", query.operation_type)
+        self.assertEqual("TestProject", query.name)
+        self.assertEqual({"name": "String!", "revision": "String"}, query.variables)
+        self.assertIs(query, get_registered_query(query.text))
+        self.assertEqual(64, len(query.sha256))
+
+        payload = query.payload({"name": "my \"project\"", "revision": None})
+        self.assertEqual({"name": "my \"project\""}, payload["variables"])
+        self.assertEqual("TestProject", payload["operationName"])
+
+        with self.assertRaises(ValueError):
+            query.payload({"revision": "1234"})
+        with self.assertRaises(ValueError):
+            query.payload({"name": "project", "unknown": 1})
+
+    def test_register_invalid_query(self):
+        """
+        Check that invalid queries are rejected
+        :return:
+        """
+        with self.assertRaises(ValueError):
+            register_query("{ project(name: \"foo\") { id } }")
+        with self.assertRaises(ValueError):
+            register_query("query Undeclared { project(name: $name) { id } }")
+        with self.assertRaises(ValueError):
+            register_query("query Unused($name: String!) { project { id } }")
+        with self.assertRaises(ValueError):
+            register_query("query Unbalanced($name: String!) { project(name: $name) { id }")
@@ -5,7 +5,9 @@ Test for methods in graphql/rosie.py
 import unittest
 from unittest.mock import patch
 
-from codiga.graphql.rosie import graphql_get_rulesets, get_rulesets_name_string
+from codiga.exceptions.ruleset_fetch_exception import RulesetFetchException
+from codiga.graphql.rosie import graphql_get_rulesets, graphql_get_ruleset, RULESET_PROFILE_RUNTIME, \
+    RULESET_PROFILE_FULL
 
 
 class TestRosie(unittest.TestCase):
@@ -69,8 +71,77 @@ class TestRosie(unittest.TestCase):
                 ]
             }
         ]
-        do_graphql_query_mock.return_value = {"ruleSetsForClient": fake_data}
+        do_graphql_query_mock.side_effect = lambda api_token, payload: {
+            "ruleSetsForClient": [r for r in fake_data if r["name"] in payload["variables"]["names"]]
+        }
         data = graphql_get_rulesets("api_token", ["daniel-ruleset", "real-ruleset"])
 
         self.assertEqual(fake_data, data)
+        self.assertEqual(2, do_graphql_query_mock.call_count)
 
+    @patch('codiga.graphql.rosie.RULES_PAGE_SIZE', 2)
+    @patch('codiga.graphql.rosie.do_graphql_query')
+    def test_graphql_get_rulesets_pages(self, do_graphql_query_mock):
+        """
+        Check that rulesets are fetched page by page until a page is not full
+        :return:
+        """
+        rules = [{"id": i, "name": f"rule-{i}"} for i in range(5)]
+
+        def fake_query(api_token, payload):
+            variables = payload["variables"]
+            if variables["names"] != ["big-ruleset"]:
+                return {"ruleSetsForClient": []}
+            page = rules[variables["skip"]:variables["skip"] + variables["howmany"]]
+            return {"ruleSetsForClient": [{"id": 1, "name": "big-ruleset", "rules": page}]}
+        do_graphql_query_mock.side_effect = fake_query
+
+        data = graphql_get_rulesets("api_token", ["big-ruleset", "unknown-ruleset"])
+        self.assertEqual([{"id": 1, "name": "big-ruleset", "rules": rules}], data)
+
+    @patch('codiga.graphql.rosie.RULES_PAGE_SIZE', 2)
+    @patch('codiga.graphql.rosie.do_graphql_query')
+    def test_graphql_get_rulesets_failed_page(self, do_graphql_query_mock):
+        """
+        Check that a page that cannot be fetched fails the whole ruleset instead of truncating it
+        :return:
+        """
+        rules = [{"id": i, "name": f"rule-{i}"} for i in range(5)]
+
+        def fake_query(api_token, payload):
+            variables = payload["variables"]
+            if variables["skip"] == 2:
+                return None
+            page = rules[variables["skip"]:variables["skip"] + variables["howmany"]]
+            return {"ruleSetsForClient": [{"id": 1, "name": "big-ruleset", "rules": page}],
+                    "ruleSet": {"id": 1, "name": "big-ruleset", "rules": page}}
+        do_graphql_query_mock.side_effect = fake_query
+
+        with self.assertRaises(RulesetFetchException):
+            graphql_get_rulesets("api_token", ["big-ruleset"])
+        with self.assertRaises(RulesetFetchException):
+            graphql_get_ruleset("api_token", "big-ruleset")
+
+        do_graphql_query_mock.side_effect = None
+        do_graphql_query_mock.return_value = None
+        with self.assertRaises(RulesetFetchException):
+            graphql_get_ruleset("api_token", "big-ruleset")
+
+    @patch('codiga.graphql.rosie.do_graphql_query')
+    def test_graphql_get_ruleset_profiles(self, do_graphql_query_mock):
+        """
+        Check that rule tests are only requested with the full profile
+        :return:
+        """
+        do_graphql_query_mock.return_value = {"ruleSet": None}
+
+        graphql_get_ruleset(None, "python-security", RULESET_PROFILE_RUNTIME)
+        query = do_graphql_query_mock.call_args[0][1]["query"]
+        self.assertIn("elementChecked", query)
+        self.assertNotIn("tests", query)
+
+        graphql_get_ruleset(None, "python-security", RULESET_PROFILE_FULL)
+        self.assertIn("shouldFail", do_graphql_query_mock.call_args[0][1]["query"])
+
+        with self.assertRaises(ValueError):
+            graphql_get_ruleset(None, "python-security", "everything")
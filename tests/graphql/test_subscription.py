@@ -0,0 +1,157 @@
+"""
+Test the GraphQL subscriptions against a local stand-in WebSocket server
+"""
+import json
+import socket
+import struct
+import threading
+import unittest
+from unittest.mock import patch
+
+from codiga.graphql.subscription import wait_for_analysis, GRAPHQL_TRANSPORT_WS_PROTOCOL
+from codiga.utils.poller import Deadline
+from codiga.utils.websocket import get_accept_key, encode_frame, mask_payload, OPCODE_TEXT, OPCODE_PONG, \
+    read_http_headers
+
+
+class StandInServer:
+    """
+    A WebSocket server speaking graphql-transport-ws that sends the given analysis statuses
+    """
+    def __init__(self, statuses, complete=True):
+        self.statuses = statuses
+        self.complete = complete
+        self.received = []
+        self.pong_received = False
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(("127.0.0.1", 0))
+        self.server.listen(1)
+        self.port = self.server.getsockname()[1]
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def receive_frame(self, connection, buffer):
+        while len(buffer) < 2:
+            buffer += connection.recv(4096)
+        length = buffer[1] & 0x7F
+        offset = 2
+        if length == 126:
+            while len(buffer) < 4:
+                buffer += connection.recv(4096)
+            length = struct.unpack("!H", buffer[2:4])[0]
+            offset = 4
+        while len(buffer) < offset + 4 + length:
+            buffer += connection.recv(4096)
+        mask = buffer[offset:offset + 4]
+        payload = mask_payload(bytes(mask), bytes(buffer[offset + 4:offset + 4 + length]))
+        opcode = buffer[0] & 0x0F
+        del buffer[:offset + 4 + length]
+        return opcode, payload
+
+    def receive_message(self, connection, buffer):
+        while True:
+            opcode, payload = self.receive_frame(connection, buffer)
+            if opcode == OPCODE_PONG:
+                continue
+            message = json.loads(payload)
+            self.received.append(message)
+            if message["type"] == "pong":
+                self.pong_received = True
+                continue
+            return message
+
+    def send_message(self, connection, message):
+        connection.sendall(encode_frame(OPCODE_TEXT, json.dumps(message).encode('utf-8')))
+
+    def serve(self):
+        connection, _ = self.server.accept()
+        with connection:
+            headers, remaining = read_http_headers(connection)
+            lines = headers.decode('iso-8859-1').split("\r\n")
+            request_headers = {line.split(":")[0].lower(): line.split(":", 1)[1].strip() for line in lines[1:]}
+            connection.sendall((
+                "HTTP/1.1 101 Switching Protocols\r\n"
+                "Upgrade: websocket\r\n"
+                "Connection: Upgrade\r\n"
+                f"Sec-WebSocket-Accept: {get_accept_key(request_headers['sec-websocket-key'])}\r\n"
+                f"Sec-WebSocket-Protocol: {GRAPHQL_TRANSPORT_WS_PROTOCOL}\r\n\r\n").encode('utf-8'))
+            buffer = bytearray(remaining)
+            self.receive_message(connection, buffer)
+            self.send_message(connection, {"type": "connection_ack"})
+            subscribe = self.receive_message(connection, buffer)
+            self.send_message(connection, {"type": "ping"})
+            for status in self.statuses:
+                self.send_message(connection, {"id": subscribe["id"], "type": "next",
+                                               "payload": {"data": {"analysisUpdated": {"id": 42, "status": status}}}})
+            if self.complete:
+                self.send_message(connection, {"id": subscribe["id"], "type": "complete"})
+            try:
+                self.receive_message(connection, buffer)
+            except (OSError, IndexError, ValueError):
+                pass
+
+    def close(self):
+        self.server.close()
+
+
+class TestSubscription(unittest.TestCase):
+    """
+    Test waiting for an analysis with a subscription
+    """
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_wait_with_subscription(self):
+        server = StandInServer(["InProgress", "Done"])
+        analyses = iter([{"id": 42, "status": "InProgress"}, {"id": 42, "status": "Done", "slocs": 10}])
+        calls = []
+
+        def get_analysis():
+            calls.append(1)
+            return next(analyses)
+
+        analysis = wait_for_analysis("token", 42, get_analysis, Deadline(10), subscribe=True,
+                                     endpoint=f"http://127.0.0.1:{server.port}/graphql")
+        server.thread.join(5)
+        server.close()
+        self.assertEqual("Done", analysis["status"])
+        self.assertEqual(10, analysis["slocs"])
+        self.assertEqual(2, len(calls))
+        self.assertEqual("connection_init", server.received[0]["type"])
+        self.assertEqual("token", server.received[0]["payload"]["X-Api-Token"])
+        self.assertEqual("subscribe", server.received[1]["type"])
+        self.assertEqual({"id": 42}, server.received[1]["payload"]["variables"])
+        self.assertTrue(server.pong_received)
+
+    @patch('codiga.graphql.subscription.poll')
+    @patch('codiga.graphql.subscription.SAFETY_POLL_SECS', 0.1)
+    def test_lost_notification(self, poll_mock):
+        """
+        Check that the analysis is requested when no notification is received for a while
+        :return:
+        """
+        server = StandInServer([], complete=False)
+        analyses = iter([{"id": 42, "status": "InProgress"}, {"id": 42, "status": "InProgress"},
+                         {"id": 42, "status": "Done"}])
+
+        analysis = wait_for_analysis("token", 42, lambda: next(analyses), Deadline(10), subscribe=True,
+                                     endpoint=f"http://127.0.0.1:{server.port}/graphql")
+        server.thread.join(5)
+        server.close()
+        self.assertEqual("Done", analysis["status"])
+        poll_mock.assert_not_called()
+
+    def test_fallback_to_polling(self):
+        # nothing listens on this port once the socket is closed
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+        sock.close()
+
+        analysis = wait_for_analysis("token", 42, lambda: {"id": 42, "status": "Same_Revision"}, Deadline(10),
+                                     subscribe=True, endpoint=f"http://127.0.0.1:{port}/graphql")
+        self.assertEqual("Same_Revision", analysis["status"])
@@ -0,0 +1,58 @@
+"""
+Test for methods in model/rosie_rule.py
+"""
+
+import unittest
+
+from codiga.model.rosie_rule import convert_rules_to_rosie_rules
+from codiga.model.violation_filter import ViolationFilter
+
+
+class TestRosieRule(unittest.TestCase):
+    """
+    Tests for model/rosie_rule.py
+    """
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_convert_rules_to_rosie_rules_with_filter(self):
+        """
+        Check that rules not matching the severity and category filter are not converted
+        :return:
+        """
+        def make_rule(name, severity, category):
+            return {
+                "id": 1,
+                "name": name,
+                "content": "cHJpbnQoIkhlbGxvIFdvcmxkISIp",
+                "language": "Python",
+                "ruleType": "Ast",
+                "pattern": None,
+                "patternMultiline": None,
+                "elementChecked": "FunctionCall",
+                "severity": severity,
+                "category": category
+            }
+
+        rulesets = [
+            {
+                "id": 1,
+                "name": "my-ruleset",
+                "rules": [
+                    make_rule("critical-security", "CRITICAL", "SECURITY"),
+                    make_rule("warning-security", "WARNING", "SECURITY"),
+                    make_rule("critical-style", "CRITICAL", "CODE_STYLE"),
+                    make_rule("no-metadata", None, None)
+                ]
+            }
+        ]
+
+        rules = convert_rules_to_rosie_rules(rulesets)
+        self.assertEqual(4, len(rules))
+        self.assertEqual("CRITICAL", rules[0].severity)
+
+        rules = convert_rules_to_rosie_rules(rulesets, ViolationFilter.from_options("ERROR", ["security"]))
+        self.assertEqual(["my-ruleset/critical-security", "my-ruleset/no-metadata"], [r.id for r in rules])
@@ -0,0 +1,41 @@
+"""
+Test for methods in model/violation_filter.py
+"""
+
+import unittest
+
+from codiga.model.violation_filter import ViolationFilter
+
+
+class TestViolationFilter(unittest.TestCase):
+    """
+    Tests for model/violation_filter.py
+    """
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_matches(self):
+        """
+        Check that severities and categories are correctly filtered
+        :return:
+        """
+        violation_filter = ViolationFilter.from_options("error", "security,error_prone")
+        self.assertTrue(violation_filter.matches("CRITICAL", "SECURITY"))
+        self.assertTrue(violation_filter.matches("ERROR", "ERROR_PRONE"))
+        self.assertFalse(violation_filter.matches("WARNING", "SECURITY"))
+        self.assertFalse(violation_filter.matches("CRITICAL", "CODE_STYLE"))
+        self.assertTrue(violation_filter.matches(None, None))
+        self.assertTrue(ViolationFilter().matches("INFORMATIONAL", "CODE_STYLE"))
+
+    def test_from_options_invalid(self):
+        """
+        Check that invalid values raise an exception
+        :return:
+        """
+        with self.assertRaises(ValueError):
+            ViolationFilter.from_options("blocker", None)
+        with self.assertRaises(ValueError):
+            ViolationFilter.from_options(None, "security,unused")
@@ -0,0 +1,91 @@
+"""
+A local stand-in for the Rosie server, implementing compressed requests and the
+rule-by-reference protocol of codiga/rosie/api.py, to test the client offline.
+"""
+import gzip
+import hashlib
+import http.server
+import json
+import threading
+
+RULE_CACHE_HEADER = "X-Rosie-Rule-Cache"
+
+
+class StandInRosieServer:
+    """
+    Answer each request with one violation at line 1 for each rule whose pattern is in the code.
+    :param accept_compression: False to reject compressed requests like a server that does not support them
+    :param rule_cache: False to ignore the rule-by-reference protocol
+    """
+    def __init__(self, accept_compression=True, rule_cache=True):
+        self.accept_compression = accept_compression
+        self.rule_cache = rule_cache
+        self.rules = {}
+        self.requests = []
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                status, response, headers = server.handle(self.headers, body)
+                content = json.dumps(response).encode('utf-8')
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/analyze"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handle(self, headers, body):
+        """
+        :return: the status, the JSON response and the headers of the response
+        """
+        compressed = headers.get("Content-Encoding") == "gzip"
+        self.requests.append({"size": len(body), "compressed": compressed})
+        if compressed:
+            if not self.accept_compression:
+                return 415, {"error": "unsupported content encoding"}, {}
+            body = gzip.decompress(body)
+        payload = json.loads(body)
+        self.requests[-1]["payload"] = payload
+        use_rule_cache = self.rule_cache and headers.get(RULE_CACHE_HEADER) == "1"
+
+        rules = []
+        missing_rules = []
+        for rule in payload["rules"]:
+            if "contentBase64" in rule:
+                if use_rule_cache:
+                    content_hash = hashlib.sha256(rule["contentBase64"].encode('utf-8')).hexdigest()
+                    assert content_hash == rule["contentHash"]
+                    self.rules[content_hash] = rule["contentBase64"]
+                rules.append(rule)
+            elif use_rule_cache and rule.get("contentHash") in self.rules:
+                rules.append(dict(rule, contentBase64=self.rules[rule["contentHash"]]))
+            else:
+                missing_rules.append(rule.get("contentHash"))
+        if missing_rules:
+            return 409, {"missingRules": missing_rules}, {}
+
+        code = payload["codeBase64"]
+        rule_responses = []
+        for rule in rules:
+            violations = []
+            if rule.get("pattern") and rule["pattern"] in code:
+                violations.append({"start": {"line": 1}, "message": "pattern found", "severity": "ERROR",
+                                   "category": "BEST_PRACTICE"})
+            rule_responses.append({"identifier": rule["id"], "violations": violations, "errors": [],
+                                   "executionTimeMs": 1})
+        response_headers = {RULE_CACHE_HEADER: "1"} if use_rule_cache else {}
+        return 200, {"ruleResponses": rule_responses}, response_headers
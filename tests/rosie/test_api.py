@@ -0,0 +1,106 @@
+"""
+Test for methods in rosie/api.py, against a local stand-in Rosie server
+"""
+
+import base64
+import hashlib
+import unittest
+
+from codiga.exceptions.rosie_analysis_exception import RosieAnalysisException
+from codiga.model.rosie_rule import RosieRule
+from codiga.rosie.api import analyze_rosie, RosieSession
+from tests.rosie.rosie_server import StandInRosieServer
+
+
+def make_rule_content(index):
+    content = b"".join(hashlib.sha256(f"{index}-{line}".encode('utf-8')).digest() for line in range(100))
+    return base64.b64encode(content).decode('utf-8')
+
+
+def make_rules(count):
+    return [RosieRule(id=f"ruleset/rule{index}", content_base64=make_rule_content(index), language="python",
+                      rule_type="pattern", entity_checked=None, pattern=f"p{index}")
+            for index in range(count)]
+
+
+class TestRosieApi(unittest.TestCase):
+    """
+    Tests for rosie/api.py
+    """
+    def setUp(self):
+        self.server = StandInRosieServer()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def analyze(self, session, rules, code="p1"):
+        return analyze_rosie("file.py", "Python", "utf-8", code, rules, self.server.url, session=session)
+
+    def test_rules_by_reference(self):
+        """
+        Check that rules are sent once, then by hash, and sent again when the server misses them.
+        :return:
+        """
+        session = RosieSession(self.server.url)
+        rules = make_rules(3)
+
+        violations = self.analyze(session, rules)
+        self.assertEqual(["ruleset/rule1"], [violation.rule for violation in violations])
+        self.assertTrue(session.rule_cache_supported)
+        self.assertTrue(self.server.requests[0]["compressed"])
+        self.assertTrue(all("contentBase64" in rule for rule in self.server.requests[0]["payload"]["rules"]))
+
+        violations = self.analyze(session, rules)
+        self.assertEqual(["ruleset/rule1"], [violation.rule for violation in violations])
+        self.assertTrue(all("contentBase64" not in rule for rule in self.server.requests[1]["payload"]["rules"]))
+        self.assertLess(self.server.requests[1]["size"] * 10, self.server.requests[0]["size"])
+
+        self.analyze(session, rules + make_rules(5)[3:])
+        self.assertEqual([False, False, False, True, True],
+                         ["contentBase64" in rule for rule in self.server.requests[2]["payload"]["rules"]])
+
+        # the server restarted and lost its rules
+        self.server.rules.clear()
+        violations = self.analyze(session, rules, code="p2")
+        self.assertEqual(["ruleset/rule2"], [violation.rule for violation in violations])
+        self.assertEqual(5, len(self.server.requests))
+        self.assertTrue(all("contentBase64" in rule for rule in self.server.requests[4]["payload"]["rules"]))
+
+    def test_fallbacks(self):
+        """
+        Check that a server without compression and without the protocol receives full,
+        uncompressed requests.
+        :return:
+        """
+        self.server.accept_compression = False
+        self.server.rule_cache = False
+        session = RosieSession(self.server.url)
+        rules = make_rules(2)
+
+        self.assertEqual(1, len(self.analyze(session, rules)))
+        self.assertEqual([True, False], [request["compressed"] for request in self.server.requests])
+        self.assertFalse(session.compress)
+        self.assertFalse(session.rule_cache_supported)
+
+        self.assertEqual(1, len(self.analyze(session, rules)))
+        self.assertEqual(3, len(self.server.requests))
+        self.assertFalse(self.server.requests[2]["compressed"])
+        self.assertTrue(all("contentBase64" in rule for rule in self.server.requests[2]["payload"]["rules"]))
+
+    def test_analysis_errors(self):
+        """
+        Check that an analysis that did not complete raises an exception when requested
+        instead of returning no violation.
+        :return:
+        """
+        session = RosieSession(self.server.url)
+        self.server.stop()
+        self.assertRaises(Exception, self.analyze, session, make_rules(1))
+        with self.assertRaises(RosieAnalysisException):
+            analyze_rosie("file.py", "Python", "utf-8", "p1", make_rules(1), self.server.url, session=session,
+                          raise_errors=True)
+        self.server = StandInRosieServer()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+"""
+Test for methods in rosie/lockfile.py
+"""
+
+import os
+import tempfile
+import unittest
+
+from codiga.model.rosie_rule import RosieRule
+from codiga.rosie.lockfile import write_lockfile, RulesetLock
+
+
+class TestLockfile(unittest.TestCase):
+    """
+    Tests for rosie/lockfile.py
+    """
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_write_and_read_lockfile(self):
+        """
+        Check that rules are deduplicated and can be read per language
+        :return:
+        """
+        python_rule = RosieRule(id="python-security/rule1", content_base64="Zm9v", language="python",
+                                rule_type="ast", entity_checked="functioncall", pattern=None,
+                                severity="CRITICAL", category="SECURITY")
+        java_rule = RosieRule(id="java-security/rule2", content_base64="YmFy", language="java",
+                              rule_type="pattern", entity_checked=None, pattern="eval(${x})")
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "codiga.lock")
+            write_lockfile(path, ["python-security", "java-security"], [python_rule, java_rule, python_rule])
+
+            with RulesetLock(path) as lock:
+                self.assertEqual(["python-security", "java-security"], lock.rulesets)
+                self.assertEqual([python_rule], lock.get_rules(["Python"]))
+                self.assertEqual([java_rule], lock.get_rules(["java", "go"]))
+                self.assertEqual(2, len(lock.get_rules()))
+
+    def test_invalid_lockfile(self):
+        """
+        Check that invalid lock files are rejected
+        :return:
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "codiga.lock")
+            with open(path, "w") as lockfile:
+                lockfile.write("rulesets:\n")
+            with self.assertRaises(ValueError):
+                RulesetLock(path)
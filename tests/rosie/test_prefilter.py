@@ -0,0 +1,107 @@
+"""
+Test for methods in rosie/prefilter.py
+"""
+
+import time
+import unittest
+
+from codiga.model.rosie_rule import RosieRule
+from codiga.rosie.prefilter import compile_pattern, select_rules, apply_rule_tokens, get_rule_tokens, find_tokens, \
+    pattern_may_match
+
+
+def make_rule(name, rule_type, pattern=None, tokens=None):
+    return RosieRule(id=name, content_base64="", language="python", rule_type=rule_type,
+                     entity_checked=None, pattern=pattern, tokens=tokens)
+
+
+class TestPrefilter(unittest.TestCase):
+    """
+    Tests for rosie/prefilter.py
+    """
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_compile_pattern(self):
+        """
+        Check that compiled patterns match code with different spacing, quotes and variables.
+        :return:
+        """
+        pattern = 'requests.get(${url}, verify=False)'
+        self.assertEqual(2, len(compile_pattern(pattern)))
+        self.assertTrue(pattern_may_match(pattern, 'r = requests.get("https://codiga.io", verify = False)'))
+        self.assertTrue(pattern_may_match(pattern, 'requests . get(\n    url,\n    verify=False\n)'))
+        self.assertFalse(pattern_may_match(pattern, 'requests.get(url, verify=True)'))
+        self.assertTrue(pattern_may_match("open('${file}')", 'open("a.txt")'))
+        self.assertIsNone(compile_pattern("${a}"))
+        self.assertIsNone(compile_pattern(None))
+
+    def test_select_rules_adversarial_code(self):
+        """
+        Check that many patterns are matched in linear time on a large file that contains
+        all their literal parts, but never in order (a single expression with gaps backtracks).
+        :return:
+        """
+        rules = [make_rule(f"rule-{i}", "pattern", f"foo(${{a}}, ${{b}}, bar{i})") for i in range(500)]
+        code = " ".join(f"x, bar{i})" for i in range(500)) + "foo(x, " * 20000
+
+        start = time.monotonic()
+        self.assertEqual(rules, select_rules(rules, code))
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual([], select_rules(rules, "foo(x, y, z)"))
+
+    def test_select_rules(self):
+        """
+        Check that only the pattern rules that do not match are excluded.
+        :return:
+        """
+        ast_rule = make_rule("ast", "ast")
+        eval_rule = make_rule("eval", "pattern", "eval(${code})")
+        pickle_rule = make_rule("pickle", "pattern", "pickle.loads(${data})")
+        any_rule = make_rule("any", "pattern", "${anything}")
+        rules = [ast_rule, eval_rule, pickle_rule, any_rule]
+
+        self.assertEqual([ast_rule, eval_rule, any_rule], select_rules(rules, "x = eval(input())"))
+        self.assertEqual([ast_rule, any_rule], select_rules(rules, "print(1)"))
+        self.assertEqual([], select_rules([eval_rule, pickle_rule], "print(1)"))
+        self.assertEqual([pickle_rule], select_rules([eval_rule, pickle_rule], "pickle.loads(b)"))
+
+    def test_select_rules_by_tokens(self):
+        """
+        Check that rules are only kept for the files containing one of their tokens,
+        whether the tokens are declared or taken from the pattern.
+        :return:
+        """
+        rules = apply_rule_tokens([make_rule("python-security/pickle-loads", "ast"),
+                                   make_rule("python-security/pickle-dumps", "ast"),
+                                   make_rule("python-security/subprocess", "ast"),
+                                   make_rule("python-security/other", "ast"),
+                                   make_rule("python-security/eval", "pattern", "eval(${code})")],
+                                  {"python-security/pickle-*": ["pickle", "cPickle"],
+                                   "python-security/subprocess": ["subprocess", "popen"]})
+        self.assertEqual(("pickle", "cPickle"), get_rule_tokens(rules[0]))
+        self.assertEqual(("eval", ), get_rule_tokens(rules[4]))
+        self.assertIsNone(get_rule_tokens(rules[3]))
+
+        self.assertEqual(["python-security/other"], [rule.id for rule in select_rules(rules, "print(1)")])
+        self.assertEqual(["python-security/pickle-loads", "python-security/pickle-dumps", "python-security/other"],
+                         [rule.id for rule in select_rules(rules, "import cPickle")])
+        self.assertEqual(["python-security/subprocess", "python-security/other", "python-security/eval"],
+                         [rule.id for rule in select_rules(rules, "os.popen(eval(x))")])
+        self.assertEqual([], select_rules([rules[0], rules[4]], "evaluate()"))
+
+    def test_find_tokens(self):
+        """
+        Check that overlapping tokens and tokens contained in other tokens are all found
+        :return:
+        """
+        tokens = frozenset(["eval", "evaluate", "abc", "cde", "missing"])
+        self.assertEqual({"eval", "evaluate", "abc", "cde"}, find_tokens(tokens, "x.evaluate(abcde)"))
+        self.assertEqual(set(), find_tokens(tokens, "print(1)"))
+
+
+if __name__ == '__main__':
+    unittest.main()
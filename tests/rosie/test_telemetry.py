@@ -0,0 +1,89 @@
+"""
+Test for methods in rosie/telemetry.py
+"""
+
+import os
+import tempfile
+import unittest
+
+from codiga.rosie.telemetry import RuleStats, record_rule_responses
+
+
+class TestTelemetry(unittest.TestCase):
+    """
+    Tests for rosie/telemetry.py
+    """
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_record_rule_responses(self):
+        """
+        Check that server timings are used when available and the request time is split otherwise
+        :return:
+        """
+        rule_stats = RuleStats()
+        rule_responses = [
+            {"identifier": "ruleset/fast", "violations": [], "executionTimeMs": 2},
+            {"identifier": "ruleset/unknown", "violations": [], "errors": ["syntax error"]}
+        ]
+        record_rule_responses(rule_stats, rule_responses, 100)
+
+        fast_rule = rule_stats.get_rule("ruleset/fast")
+        self.assertEqual(2, fast_rule["totalTimeMs"])
+        self.assertEqual([2], fast_rule["recentTimesMs"])
+
+        unknown_rule = rule_stats.get_rule("ruleset/unknown")
+        self.assertEqual(50, unknown_rule["totalTimeMs"])
+        self.assertEqual(1, unknown_rule["errors"])
+        self.assertEqual([], unknown_rule["recentTimesMs"])
+        self.assertEqual([50], unknown_rule["recentEstimatedTimesMs"])
+
+    def test_estimated_times_ignored_for_budget(self):
+        """
+        Check that rules are never excluded with estimated times, that a server timing
+        after estimated ones is not mixed with them, and that excluded rules are probed again.
+        :return:
+        """
+        rule_stats = RuleStats()
+        for _ in range(5):
+            record_rule_responses(rule_stats, [{"identifier": "ruleset/neighbour", "violations": []},
+                                               {"identifier": "ruleset/slow", "violations": []}], 4000)
+        self.assertEqual(set(), rule_stats.get_rules_over_budget(500))
+
+        for _ in range(3):
+            rule_stats.record("ruleset/slow", 1000)
+        self.assertEqual({"ruleset/slow"}, rule_stats.get_rules_over_budget(500))
+
+        excluded = [rule_stats.select_rules_to_exclude(500, probe_every_runs=3) for _ in range(3)]
+        self.assertEqual([{"ruleset/slow"}, {"ruleset/slow"}, set()], excluded)
+
+        # the probes show that the rule is fast now
+        for _ in range(3):
+            rule_stats.record("ruleset/slow", 10)
+        self.assertEqual(set(), rule_stats.select_rules_to_exclude(500))
+
+    def test_rules_over_budget(self):
+        """
+        Check that only rules consistently over the budget are reported and that statistics are persisted
+        :return:
+        """
+        rule_stats = RuleStats()
+        for execution_time_ms in [900, 1000, 1100]:
+            rule_stats.record("ruleset/slow", execution_time_ms)
+            rule_stats.record("ruleset/fast", 10)
+        rule_stats.record("ruleset/new", 5000)
+        rule_stats.record("ruleset/spike", 5000)
+        rule_stats.record("ruleset/spike", 10)
+        rule_stats.record("ruleset/spike", 10)
+
+        self.assertEqual({"ruleset/slow"}, rule_stats.get_rules_over_budget(500))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "stats.json")
+            rule_stats.save(path)
+            loaded = RuleStats.load(path)
+            self.assertEqual({"ruleset/slow"}, loaded.get_rules_over_budget(500))
+            self.assertEqual(3, loaded.get_rule("ruleset/fast")["executions"])
@@ -0,0 +1,48 @@
+"""
+Test for methods in snippets/convert.py
+"""
+
+import base64
+import unittest
+
+from codiga.snippets.convert import convert_variables_in_recipes, convert_recipe_content, \
+    convert_snippet_file_content_to_codiga
+
+
+class TestConvert(unittest.TestCase):
+    """
+    Tests for snippets/convert.py
+    """
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_convert_variables_in_recipes(self):
+        """
+        Check that all the variables are rewritten and that digits that are not
+        variables are left untouched
+        :return:
+        """
+        self.assertEqual("for &[USER_INPUT:1:i] in range(10): &[USER_INPUT:2] &[USER_INPUT:12]",
+                         convert_variables_in_recipes("for ${1:i} in range(10): $2 $12"))
+        self.assertEqual("class &[GET_FILENAME_NO_EXT] &[USER_INPUT:3]",
+                         convert_variables_in_recipes("class ${TM_FILENAME_BASE} ${3}"))
+        self.assertEqual("&[USER_INPUT:1]\t1", convert_variables_in_recipes("$1\t1"))
+
+    def test_convert_recipe_content(self):
+        self.assertEqual("&[CODIGA_INDENT]&[USER_INPUT:1:&[CODIGA_INDENT]x]",
+                         convert_recipe_content("\t${1:\tx}"))
+
+    def test_convert_snippet_file_content(self):
+        content = {
+            "For Loop": {"prefix": "for-loop", "body": ["for ${1:i}:", "\t$0"]},
+            "No prefix": {"body": "foo"},
+        }
+        recipes = convert_snippet_file_content_to_codiga(content, "js.")
+        self.assertEqual(1, len(recipes))
+        self.assertEqual("For Loop", recipes[0]["name"])
+        self.assertEqual("js.for_loop", recipes[0]["shortcut"])
+        self.assertEqual("for &[USER_INPUT:1:i]:\n&[CODIGA_INDENT]&[USER_INPUT:0]",
+                         base64.b64decode(recipes[0]["content"]).decode('utf-8'))
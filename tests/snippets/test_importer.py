@@ -0,0 +1,172 @@
+"""
+Test for methods in snippets/importer.py
+"""
+
+import base64
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import requests
+
+from codiga.exceptions.cookbook_fetch_exception import CookbookFetchException
+from codiga.graphql.recipe import get_cookbook_recipes, COOKBOOK_RECIPES_PAGE_SIZE
+from codiga.snippets.importer import RecipeJournal, upload_recipes, get_recipe_hash
+
+
+def make_recipe(shortcut):
+    return {"name": f"recipe {shortcut}", "shortcut": shortcut, "content": "Y29udGVudA=="}
+
+
+class TestImporter(unittest.TestCase):
+    """
+    Tests for snippets/importer.py
+    """
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.journal_path = os.path.join(self.directory.name, "journal.jsonl")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    @patch('codiga.snippets.importer.post_recipe')
+    def test_resume_import(self, post_recipe_mock):
+        """
+        Check that recipes created are recorded in the journal, that failed recipes are
+        reported and that a second import only uploads the recipes not created yet.
+        :return:
+        """
+        def fake_post_recipe(api_token, recipe, language, is_public, cookbook_id, use_staging):
+            if recipe["shortcut"] == "fail":
+                return {"errors": [{"message": "invalid recipe"}]}
+            return {"data": {"createAssistantRecipe": {"id": len(recipe["shortcut"])}}}
+
+        post_recipe_mock.side_effect = fake_post_recipe
+        recipes = [make_recipe("a"), make_recipe("bb"), make_recipe("fail")]
+
+        summary = upload_recipes("token", recipes, "Python", True, None, False, RecipeJournal(self.journal_path),
+                                 jobs=2, rate_per_sec=None)
+        self.assertEqual(2, summary.created)
+        self.assertEqual(0, summary.skipped)
+        self.assertEqual([("recipe fail", "invalid recipe")], summary.failed)
+
+        journal = RecipeJournal(self.journal_path)
+        self.assertTrue(journal.contains(get_recipe_hash(recipes[0])))
+        self.assertEqual(2, journal.entries[get_recipe_hash(recipes[1])]["id"])
+
+        post_recipe_mock.reset_mock()
+        summary = upload_recipes("token", recipes, "Python", True, None, False, journal, jobs=2, rate_per_sec=None)
+        self.assertEqual(1, post_recipe_mock.call_count)
+        self.assertEqual(2, summary.skipped)
+
+    def test_journal_ignores_truncated_line(self):
+        with open(self.journal_path, "w", encoding="utf-8") as journal_file:
+            journal_file.write('{"hash": "h1", "shortcut": "a", "id": 1}\n{"hash": "h2", "sho')
+        journal = RecipeJournal(self.journal_path)
+        self.assertTrue(journal.contains("h1"))
+        self.assertFalse(journal.contains("h2"))
+
+    @patch('codiga.snippets.importer.get_cookbook_recipes')
+    @patch('codiga.snippets.importer.update_recipe')
+    @patch('codiga.snippets.importer.post_recipe')
+    def test_sync(self, post_recipe_mock, update_recipe_mock, get_cookbook_recipes_mock):
+        """
+        Check that a sync skips unchanged recipes, updates changed ones (including recipes
+        only present in the cookbook) and creates new ones.
+        :return:
+        """
+        journal = RecipeJournal(self.journal_path)
+        journal.add(get_recipe_hash(make_recipe("same")), "same", 1)
+        journal.add(get_recipe_hash(make_recipe("changed")), "changed", 2)
+        get_cookbook_recipes_mock.return_value = [{"id": 3, "name": "old", "shortcut": "remote", "code": "b2xk"}]
+        post_recipe_mock.return_value = {"data": {"createAssistantRecipe": {"id": 4}}}
+        update_recipe_mock.side_effect = lambda api_token, recipe_id, recipe, language, is_public, use_staging: \
+            {"data": {"updateAssistantRecipe": {"id": recipe_id}}}
+
+        changed = dict(make_recipe("changed"), content="bmV3")
+        recipes = [make_recipe("same"), changed, make_recipe("remote"), make_recipe("new")]
+        summary = upload_recipes("token", recipes, "Python", True, 12, False, journal, rate_per_sec=None, sync=True)
+
+        self.assertEqual(1, summary.skipped)
+        self.assertEqual(2, summary.updated)
+        self.assertEqual(1, summary.created)
+        self.assertEqual({2, 3}, {call[0][1] for call in update_recipe_mock.call_args_list})
+
+        journal = RecipeJournal(self.journal_path)
+        self.assertEqual(get_recipe_hash(changed), journal.get_by_shortcut("changed")["hash"])
+        self.assertEqual(3, journal.get_by_shortcut("remote")["id"])
+
+    @patch('codiga.snippets.importer.post_recipe')
+    def test_recipes_with_language(self, post_recipe_mock):
+        """
+        Check that recipes tagged with a language are posted in their language and
+        that the same shortcut in two languages is two different recipes.
+        :return:
+        """
+        post_recipe_mock.side_effect = lambda api_token, recipe, language, is_public, cookbook_id, use_staging: \
+            {"data": {"createAssistantRecipe": {"id": language}}}
+        recipes = [dict(make_recipe("for"), language="Python"), dict(make_recipe("for"), language="Go")]
+        summary = upload_recipes("token", recipes, None, True, None, False, RecipeJournal(self.journal_path),
+                                 rate_per_sec=None, sync=True)
+
+        self.assertEqual(2, summary.created)
+        journal = RecipeJournal(self.journal_path)
+        self.assertEqual("Python", journal.get_by_shortcut("Python/for")["id"])
+        self.assertEqual("Go", journal.get_by_shortcut("Go/for")["id"])
+
+    @patch('codiga.snippets.importer.get_cookbook_recipes')
+    @patch('codiga.snippets.importer.update_recipe')
+    @patch('codiga.snippets.importer.post_recipe')
+    def test_sync_remote_round_trip(self, post_recipe_mock, update_recipe_mock, get_cookbook_recipes_mock):
+        """
+        Check that a recipe returned by the API as it normalizes it (code as text, language in
+        upper case, different whitespace) is the same recipe as the local one, even when its
+        code is also valid base64.
+        :return:
+        """
+        def make_local(shortcut, code):
+            return {"name": shortcut, "shortcut": shortcut, "language": "Python",
+                    "content": base64.b64encode(code.encode('utf-8')).decode('utf-8')}
+
+        local = [make_local("loop", "for i in range(10):\n    print(i)\n"), make_local("word", "abcd")]
+        get_cookbook_recipes_mock.return_value = [{"id": 7, "name": "loop", "shortcut": "loop",
+                                                   "code": "for i in range(10):  \r\n    print(i)",
+                                                   "language": "PYTHON"},
+                                                  {"id": 8, "name": "word", "shortcut": "word",
+                                                   "code": "abcd", "language": "PYTHON"}]
+
+        summary = upload_recipes("token", local, None, True, 12, False, RecipeJournal(self.journal_path),
+                                 rate_per_sec=None, sync=True)
+        self.assertEqual(2, summary.skipped)
+        self.assertEqual(0, post_recipe_mock.call_count + update_recipe_mock.call_count)
+
+    @patch('codiga.snippets.importer.get_cookbook_recipes')
+    @patch('codiga.snippets.importer.post_recipe')
+    def test_sync_api_errors(self, post_recipe_mock, get_cookbook_recipes_mock):
+        """
+        Check that API errors are reported for the recipe and that a sync is aborted
+        when the recipes of the cookbook cannot be read.
+        :return:
+        """
+        post_recipe_mock.side_effect = ValueError("invalid response")
+        summary = upload_recipes("token", [make_recipe("a")], "Python", True, 12, False,
+                                 RecipeJournal(self.journal_path), rate_per_sec=None)
+        self.assertEqual([("recipe a", "invalid response")], summary.failed)
+
+        get_cookbook_recipes_mock.side_effect = requests.ConnectionError("connection refused")
+        with self.assertRaises(CookbookFetchException):
+            upload_recipes("token", [make_recipe("a")], "Python", True, 12, False,
+                           RecipeJournal(self.journal_path), rate_per_sec=None, sync=True)
+        self.assertEqual(1, post_recipe_mock.call_count)
+
+    @patch('codiga.graphql.recipe.do_graphql_query_with_api_token')
+    def test_get_cookbook_recipes_failed_page(self, do_graphql_query_mock):
+        """
+        Check that a page of recipes that cannot be fetched fails the whole cookbook
+        :return:
+        """
+        full_page = {"cookbook": {"recipes": [{"id": index} for index in range(COOKBOOK_RECIPES_PAGE_SIZE)]}}
+        do_graphql_query_mock.side_effect = [full_page, None]
+        with self.assertRaises(CookbookFetchException):
+            get_cookbook_recipes("token", 12, False)
@@ -0,0 +1,86 @@
+"""
+Test for methods in snippets/sources.py
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+from codiga.snippets.sources import find_snippet_sources, convert_snippet_sources, get_language, SnippetSource
+
+
+def write_json(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as json_file:
+        json.dump(content, json_file)
+
+
+def make_snippets(prefix):
+    return {f"snippet {prefix}": {"prefix": prefix, "body": ["print(1)"]}}
+
+
+class TestSources(unittest.TestCase):
+    """
+    Tests for snippets/sources.py
+    """
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_get_language(self):
+        self.assertEqual("Javascript", get_language("javascriptreact"))
+        self.assertEqual("Python", get_language("python"))
+        self.assertEqual("Shell", get_language("shellscript"))
+        self.assertIsNone(get_language("cobol"))
+
+    def test_find_directory_sources(self):
+        """
+        Check that the language of each file is inferred from its name
+        and that unknown files use the default language.
+        :return:
+        """
+        write_json(os.path.join(self.directory.name, "python.json"), make_snippets("a"))
+        write_json(os.path.join(self.directory.name, "web", "typescriptreact.code-snippets"), make_snippets("b"))
+        write_json(os.path.join(self.directory.name, "misc.json"), make_snippets("c"))
+
+        sources = find_snippet_sources(self.directory.name, None)
+        self.assertEqual([("misc.json", None), ("python.json", "Python"),
+                          ("typescriptreact.code-snippets", "Typescript")],
+                         [(os.path.basename(source.path), source.language) for source in sources])
+        self.assertEqual("Go", find_snippet_sources(self.directory.name, "Go")[0].language)
+
+    def test_find_package_sources(self):
+        """
+        Check that the snippets contributed by a VS Code extension are found with their language.
+        :return:
+        """
+        write_json(os.path.join(self.directory.name, "package.json"), {"contributes": {"snippets": [
+            {"language": "javascript", "path": "./snippets/js.json"},
+            {"language": ["typescript", "typescriptreact"], "path": "./snippets/ts.json"},
+        ]}})
+        write_json(os.path.join(self.directory.name, "snippets", "js.json"), make_snippets("a"))
+        write_json(os.path.join(self.directory.name, "snippets", "ts.json"), make_snippets("b"))
+
+        sources = find_snippet_sources(self.directory.name, None)
+        self.assertEqual(sources, find_snippet_sources(os.path.join(self.directory.name, "package.json"), None))
+        self.assertEqual([SnippetSource(os.path.join(self.directory.name, "snippets", "js.json"), "Javascript"),
+                          SnippetSource(os.path.join(self.directory.name, "snippets", "ts.json"), "Typescript")],
+                         sources)
+
+        recipes = convert_snippet_sources(sources, "x.", processes=2)
+        self.assertEqual([("x.a", "Javascript"), ("x.b", "Typescript")],
+                         [(recipe["shortcut"], recipe["language"]) for recipe in recipes])
+
+    def test_convert_invalid_file(self):
+        path = os.path.join(self.directory.name, "python.json")
+        with open(path, "w", encoding="utf-8") as json_file:
+            json_file.write('{"snippet": ')
+        with self.assertRaises(ValueError):
+            convert_snippet_sources([SnippetSource(path, "Python")], None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+"""
+Test for methods in check_quality.py
+"""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from codiga.check_quality import QualityThresholds, check_analysis, check_manifest, load_manifest
+from codiga.utils.poller import Deadline
+
+
+def make_analysis(status, score=80, grade="GOOD", violations=10, slocs=100):
+    return {
+        "id": 1,
+        "status": status,
+        "slocs": slocs,
+        "techdebt": {"grade": grade, "score": score},
+        "summary": {"duplicates": 0, "violations": violations, "duplicated_lines": 0,
+                    "longFunctions": 0, "totalFunctions": 10, "complexFunctions": 1}
+    }
+
+
+class TestCheckQuality(unittest.TestCase):
+    """
+    Tests for check_quality.py
+    """
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_check_analysis(self):
+        """
+        Check that every condition not met is reported
+        :return:
+        """
+        thresholds = QualityThresholds(min_quality_score=90, max_defects_rate=0.05, max_complex_functions_rate=0.5)
+        reasons = check_analysis(make_analysis("Done"), thresholds)
+        self.assertEqual(2, len(reasons))
+        self.assertTrue(reasons[0].startswith("analysis score 80"))
+        self.assertTrue(reasons[1].startswith("violation rate 0.1"))
+        self.assertEqual([], check_analysis(make_analysis("Done"), QualityThresholds(min_quality_score=50)))
+
+    def test_check_analysis_without_metrics(self):
+        """
+        Check that a failed analysis or an analysis without metrics is reported instead of raising
+        :return:
+        """
+        thresholds = QualityThresholds(min_quality_score=50)
+        self.assertEqual(["analysis failed"], check_analysis(make_analysis("Error", slocs=None), thresholds))
+        empty_analysis = dict(make_analysis("Done", slocs=None), summary=None, techdebt=None)
+        self.assertEqual(["analysis has no metrics"], check_analysis(empty_analysis, thresholds))
+
+    def test_load_manifest(self):
+        """
+        Check that the thresholds of the command line are used when a project does not define them
+        :return:
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "manifest.yml")
+            with open(path, "w", encoding="utf-8") as manifest:
+                manifest.write("projects:\n"
+                               "  - project: p1\n"
+                               "    sha: abc\n"
+                               "    min-quality-score: 90\n"
+                               "  - project: p2\n"
+                               "    sha: def\n")
+            entries = load_manifest(path, QualityThresholds(min_quality_score=50, max_defects_rate=0.1))
+
+        self.assertEqual(2, len(entries))
+        self.assertEqual(("p1", "abc"), entries[0][:2])
+        self.assertEqual(90, entries[0][2].min_quality_score)
+        self.assertEqual(0.1, entries[0][2].max_defects_rate)
+        self.assertEqual(50, entries[1][2].min_quality_score)
+
+    @patch('codiga.check_quality.get_response_cache', return_value=None)
+    @patch('codiga.check_quality.do_graphql_queries')
+    def test_check_manifest(self, do_graphql_queries_mock, get_response_cache_mock):
+        """
+        Check that all the projects are polled in one batch, that complete analyses
+        are not requested again and that the report has the reasons of each project.
+        :return:
+        """
+        responses = [
+            [{"project": {"analyses": [make_analysis("Done")]}},
+             {"project": {"analyses": [make_analysis("InProgress")]}},
+             {"project": {"analyses": []}}],
+            [{"project": {"analyses": [make_analysis("Done", score=95)]}},
+             {"project": {"analyses": [make_analysis("Error", score=30)]}}]
+        ]
+        do_graphql_queries_mock.side_effect = responses
+        entries = [("p1", "a", QualityThresholds(min_quality_score=50)),
+                   ("p2", "b", QualityThresholds(min_quality_score=90)),
+                   ("p3", "c", QualityThresholds(min_quality_score=90))]
+
+        with patch('codiga.utils.poller.time.sleep'):
+            report = check_manifest("api_token", entries, Deadline(100))
+
+        self.assertEqual(2, do_graphql_queries_mock.call_count)
+        self.assertEqual(3, len(do_graphql_queries_mock.call_args_list[0][0][1]))
+        self.assertEqual(2, len(do_graphql_queries_mock.call_args_list[1][0][1]))
+        self.assertFalse(report["passed"])
+        self.assertEqual([True, True, False], [project["passed"] for project in report["projects"]])
+        self.assertEqual([], report["projects"][0]["reasons"])
+        self.assertEqual(["analysis failed"], report["projects"][2]["reasons"])
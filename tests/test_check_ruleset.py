@@ -0,0 +1,81 @@
+"""
+Test for methods in check_ruleset.py
+"""
+
+import unittest
+from unittest.mock import patch
+
+from codiga.check_ruleset import run_tests
+from codiga.exceptions.rosie_analysis_exception import RosieAnalysisException
+
+
+class TestCheckRuleset(unittest.TestCase):
+    """
+    Tests for check_ruleset.py
+    """
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    @patch('codiga.check_ruleset.analyze_rosie')
+    def test_run_tests_skips_tests_that_passed(self, analyze_rosie_mock):
+        """
+        Check that tests are executed, that results keep the order of the tests and
+        that tests passing are not executed again with the same rule.
+        :return:
+        """
+        analyze_rosie_mock.return_value = []
+        rules = [
+            {
+                "name": "rule-1",
+                "content": "cHJpbnQoIkhlbGxvIFdvcmxkISIp",
+                "language": "Python",
+                "ruleType": "Ast",
+                "pattern": None,
+                "elementChecked": "FunctionCall",
+                "tests": [
+                    {"name": "test-ok", "content": "Zm9v", "shouldFail": False},
+                    {"name": "test-fail", "content": "YmFy", "shouldFail": True}
+                ]
+            }
+        ]
+        passed_tests = set()
+        results = run_tests("ruleset", rules, "http://localhost", 2, passed_tests)
+        self.assertEqual(["test-ok", "test-fail"], [r.test for r in results])
+        self.assertEqual([True, False], [r.passed for r in results])
+        self.assertEqual(2, analyze_rosie_mock.call_count)
+        self.assertEqual(1, len(passed_tests))
+
+        results = run_tests("ruleset", rules, "http://localhost", 2, passed_tests)
+        self.assertEqual([True, False], [r.cached for r in results])
+        self.assertEqual(3, analyze_rosie_mock.call_count)
+
+        # Changing the server invalidates the previous results
+        run_tests("ruleset", rules, "http://otherhost", 2, passed_tests)
+        self.assertEqual(5, analyze_rosie_mock.call_count)
+
+    @patch('codiga.check_ruleset.analyze_rosie')
+    def test_run_tests_analysis_error(self, analyze_rosie_mock):
+        """
+        Check that a test whose analysis did not complete is reported as an error and not cached.
+        :return:
+        """
+        analyze_rosie_mock.side_effect = RosieAnalysisException("timeout when processing file test-ok")
+        rules = [
+            {
+                "name": "rule-1",
+                "content": "cHJpbnQoIkhlbGxvIFdvcmxkISIp",
+                "language": "Python",
+                "ruleType": "Ast",
+                "pattern": None,
+                "elementChecked": "FunctionCall",
+                "tests": [{"name": "test-ok", "content": "Zm9v", "shouldFail": False}]
+            }
+        ]
+        passed_tests = set()
+        results = run_tests("ruleset", rules, "http://localhost", 2, passed_tests)
+        self.assertFalse(results[0].passed)
+        self.assertEqual("timeout when processing file test-ok", results[0].error)
+        self.assertEqual(set(), passed_tests)
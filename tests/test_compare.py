@@ -0,0 +1,91 @@
+"""
+Test for methods in compare.py
+"""
+
+import unittest
+from unittest.mock import patch
+
+from codiga.compare import CompareTarget, compare_targets, format_compare_table, get_targets_from_branches, \
+    start_compare_analyses
+from codiga.utils.poller import Deadline
+
+
+def make_compare_analysis(compare_analysis_id, status, violations, duplicates):
+    return {
+        "id": compare_analysis_id,
+        "status": status,
+        "sourceAnalysis": {"status": "Done", "summary": {"violations": 10, "duplicates": 5}},
+        "targetAnalysis": {"status": "Done", "summary": {"violations": violations, "duplicates": duplicates}}
+    }
+
+
+class TestCompare(unittest.TestCase):
+    """
+    Tests for compare.py
+    """
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_get_targets_from_branches(self):
+        targets = get_targets_from_branches("rc-1, rc-2,", "Github", "https://github.com/org/repo")
+        self.assertEqual(["rc-1", "rc-2"], [target.branch for target in targets])
+        self.assertEqual("Github", targets[0].kind)
+
+    @patch('codiga.compare.do_graphql_query')
+    def test_start_compare_analyses_failures(self, do_graphql_query_mock):
+        """
+        Check that a target that cannot be started (failed query, missing URL) does not stop the others
+        :return:
+        """
+        def fake_query(api_token, payload):
+            if payload["variables"]["targetBranch"] == "failed":
+                return None
+            return {"createCompareAnalysis": {"id": 7}}
+        do_graphql_query_mock.side_effect = fake_query
+        targets = get_targets_from_branches("failed,ok", "Github", "https://github.com/org/repo") + \
+            get_targets_from_branches("no-url", "Github", None)
+
+        self.assertEqual([None, 7, None], start_compare_analyses("api_token", 42, targets, None, None))
+        self.assertEqual(2, do_graphql_query_mock.call_count)
+
+    @patch('codiga.compare.do_graphql_queries')
+    @patch('codiga.compare.start_compare_analysis')
+    def test_compare_targets(self, start_compare_analysis_mock, do_graphql_queries_mock):
+        """
+        Check that all the compare analyses are polled together and that
+        complete compare analyses are not requested again.
+        :return:
+        """
+        start_compare_analysis_mock.side_effect = lambda api_token, project_id, kind, url, username, password, \
+            branch, revision: {"rc-1": 1, "rc-2": 2, "rc-3": None}[branch]
+        do_graphql_queries_mock.side_effect = [
+            [{"analysisCompare": make_compare_analysis(1, "Done", 12, 5)},
+             {"analysisCompare": make_compare_analysis(2, "InProgress", 0, 0)}],
+            [{"analysisCompare": make_compare_analysis(2, "Done", 8, 4)}]
+        ]
+        targets = get_targets_from_branches("rc-1,rc-2,rc-3", "Github", "https://github.com/org/repo")
+
+        with patch('codiga.utils.poller.time.sleep'):
+            results = compare_targets("api_token", 42, targets, None, None, Deadline(100))
+
+        self.assertEqual(2, do_graphql_queries_mock.call_count)
+        self.assertEqual(1, len(do_graphql_queries_mock.call_args_list[1][0][1]))
+        self.assertEqual([5, 0, 1], [result["code"] for result in results])
+        self.assertEqual([2, -2, None], [result["violations"] for result in results])
+        self.assertEqual([0, -1, None], [result["duplicates"] for result in results])
+        self.assertEqual("NOT_STARTED", results[2]["status"])
+
+    def test_format_compare_table(self):
+        results = [
+            {"target": "rc-1", "status": "Done", "violations": 2, "duplicates": 0},
+            {"target": "feature-branch", "status": "TIMEOUT", "violations": None, "duplicates": None}
+        ]
+        lines = format_compare_table(results).split("\n")
+        self.assertEqual(3, len(lines))
+        self.assertEqual("TARGET          STATUS   VIOLATIONS  DUPLICATES", lines[0])
+        self.assertEqual("rc-1            Done     +2          +0", lines[1])
+        self.assertEqual("feature-branch  TIMEOUT  -           -", lines[2])
+        self.assertEqual("rc-1", CompareTarget("Github", "url", branch="rc-1").name)
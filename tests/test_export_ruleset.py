@@ -0,0 +1,88 @@
+"""
+Test for methods in export_ruleset.py
+"""
+
+import gzip
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from codiga.export_ruleset import export_rulesets
+
+
+class TestExportRuleset(unittest.TestCase):
+    """
+    Tests for export_ruleset.py
+    """
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    @patch('codiga.export_ruleset.graphql_iter_rulesets')
+    def test_export_rulesets(self, graphql_iter_rulesets_mock):
+        """
+        Check that rules are exported in the order of the rulesets, compressed, and that
+        the file is not rewritten in incremental mode when no rule changed.
+        :return:
+        """
+        def iter_rulesets(api_token, ruleset_names, profile, concurrency):
+            for ruleset_name in ruleset_names:
+                yield {
+                    "name": ruleset_name,
+                    "rules": [{
+                        "name": "rule",
+                        "content": "cHJpbnQoIkhlbGxvIFdvcmxkISIp",
+                        "language": "Python",
+                        "ruleType": "Ast",
+                        "pattern": None,
+                        "elementChecked": "FunctionCall"
+                    }]
+                }
+        graphql_iter_rulesets_mock.side_effect = iter_rulesets
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "rules.json.gz")
+            self.assertTrue(export_rulesets("api_token", ["ruleset1", "ruleset2"], filename, 2, True, True))
+            with gzip.open(filename, "rt") as export_file:
+                content = json.load(export_file)
+            self.assertEqual(["ruleset1/rule", "ruleset2/rule"], [r["name"] for r in content["rules"]])
+            self.assertEqual("FUNCTION_CALL", content["rules"][0]["entityChecked"])
+
+            self.assertFalse(export_rulesets("api_token", ["ruleset1", "ruleset2"], filename, 2, True, True))
+            self.assertTrue(export_rulesets("api_token", ["ruleset1"], filename, 2, True, True))
+            self.assertEqual(["rules.json.gz"], os.listdir(directory))
+
+    @patch('codiga.export_ruleset.graphql_iter_rulesets')
+    def test_export_rulesets_pages(self, graphql_iter_rulesets_mock):
+        """
+        Check that the rules of a ruleset received in several pages are all written, and that
+        the missing rulesets are reported.
+        :return:
+        """
+        def get_rule(name):
+            return {
+                "name": name,
+                "content": "cHJpbnQoIkhlbGxvIFdvcmxkISIp",
+                "language": "Python",
+                "ruleType": "Pattern",
+                "pattern": "print",
+                "elementChecked": None
+            }
+        graphql_iter_rulesets_mock.return_value = iter([
+            {"name": "ruleset1", "rules": [get_rule("rule1"), get_rule("rule2")]},
+            {"name": "ruleset1", "rules": [get_rule("rule3")]}
+        ])
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "rules.json")
+            with self.assertLogs('codiga', level='WARNING') as logs:
+                self.assertTrue(export_rulesets("api_token", ["ruleset1", "missing"], filename))
+            with open(filename, encoding="utf-8") as export_file:
+                content = json.load(export_file)
+            self.assertEqual(["ruleset1/rule1", "ruleset1/rule2", "ruleset1/rule3"],
+                             [r["name"] for r in content["rules"]])
+            self.assertIn("ruleset missing not found", logs.output[0])
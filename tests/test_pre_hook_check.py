@@ -1,8 +1,14 @@
+import os
+import tempfile
+import threading
+import time
 import unittest
 from unittest.mock import patch
 
 from codiga.graphql.constants import STATUS_DONE
-from codiga.git_hook import analyze_file
+from codiga.git_hook import analyze_file, analyze_files
+from codiga.model.rosie_rule import RosieRule
+from codiga.model.violation import Violation
 
 
 class TestPreCommitCheck(unittest.TestCase):
@@ -23,3 +29,58 @@ class TestPreCommitCheck(unittest.TestCase):
         res = analyze_file("myfilethatdoesnotexists", "C", 1)
         self.assertTrue(len(res) == 0)
 
+    @patch('codiga.git_hook.analyze_rosie')
+    def test_analyze_file_pattern_rules(self, analyze_rosie_mock):
+        """
+        Check that only the pattern rules matching the file are sent, and that
+        the file is not sent when no pattern rule matches.
+        :return:
+        """
+        analyze_rosie_mock.return_value = []
+        rules = [RosieRule(id=f"python/{name}", content_base64="", language="python", rule_type="pattern",
+                           entity_checked=None, pattern=f"{name}(${{code}})") for name in ["eval", "exec"]]
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "file.py")
+            with open(filename, "w", encoding="utf-8") as file:
+                file.write("print(1)\n")
+            self.assertEqual([], analyze_file(rules, filename, "Python"))
+            self.assertEqual(0, analyze_rosie_mock.call_count)
+
+            with open(filename, "w", encoding="utf-8") as file:
+                file.write("eval(input())\n")
+            analyze_file(rules, filename, "Python")
+            self.assertEqual([rules[0]], analyze_rosie_mock.call_args[0][4])
+
+            stopped = threading.Event()
+            stopped.set()
+            analyze_rosie_mock.reset_mock()
+            self.assertEqual([], analyze_file(rules, filename, "Python", stopped=stopped))
+            self.assertEqual(0, analyze_rosie_mock.call_count)
+
+            analyze_file(rules, filename, "Python", deadline=time.time() + 3)
+            self.assertTrue(1 <= analyze_rosie_mock.call_args[1]["timeout"] <= 3)
+
+    @patch('codiga.git_hook.analyze_file')
+    def test_analyze_files_stop_condition(self, analyze_file_mock):
+        """
+        Test that the analysis stops and returns the results collected so far when
+        the stop condition is met.
+        :return:
+        """
+        violation = Violation(id="rule", line=1, description="description", severity="CRITICAL",
+                              category="SECURITY", tool="codiga", language="Python", rule="rule")
+
+        def slow_analyze_file(rules, filename, language, rule_stats=None, deadline=None, stopped=None):
+            time.sleep(0.05)
+            return [violation]
+
+        analyze_file_mock.side_effect = slow_analyze_file
+        files = {"file{0}.py".format(i): "Python" for i in range(20)}
+
+        res = analyze_files(files, [], 60, lambda filename, violations: len(violations) > 0)
+        self.assertTrue(0 < len(res) < len(files))
+        self.assertLess(analyze_file_mock.call_count, len(files))
+        self.assertTrue(analyze_file_mock.call_args[0][5].is_set())
+
+        res = analyze_files(files, [], 60, lambda filename, violations: False)
+        self.assertEqual(list(files.keys()), list(res.keys()))
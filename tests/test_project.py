@@ -0,0 +1,110 @@
+"""
+Test for methods in project.py
+"""
+
+import io
+import json
+import unittest
+from unittest.mock import patch
+
+from codiga.project import get_projects_analyses, get_projects_information, write_rows, get_project_row, \
+    get_all_project_names, PROJECT_COLUMNS, FORMAT_CSV, FORMAT_NDJSON, PROJECTS_PAGE_SIZE
+
+
+def fake_queries(api_token, queries):
+    results = []
+    for _, variables in queries:
+        name = variables["name"]
+        if name == "missing":
+            results.append({"project": None})
+            continue
+        skip = variables.get("skip", 0)
+        howmany = variables.get("howmany", 0)
+        analyses = [{"id": index} for index in range(skip, min(skip + howmany, 250))]
+        results.append({"project": {"id": 1, "name": name, "analysesCount": 250, "analyses": analyses,
+                                    "lastAnalysis": {"status": "Done", "summary": {"violations": 3}}}})
+    return results
+
+
+class TestProject(unittest.TestCase):
+    """
+    Tests for project.py
+    """
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    @patch('codiga.project.do_graphql_query')
+    def test_get_all_project_names(self, do_graphql_query_mock):
+        """
+        Check that projects are fetched page by page and that a failed page fails the whole list
+        :return:
+        """
+        full_page = {"projects": [{"name": f"p{index}"} for index in range(PROJECTS_PAGE_SIZE)]}
+        do_graphql_query_mock.side_effect = [full_page, {"projects": [{"name": "last"}]}]
+        names = get_all_project_names("api_token")
+        self.assertEqual(PROJECTS_PAGE_SIZE + 1, len(names))
+        self.assertEqual("last", names[-1])
+
+        do_graphql_query_mock.side_effect = [full_page, None]
+        self.assertIsNone(get_all_project_names("api_token"))
+
+    @patch('codiga.project.do_graphql_queries')
+    def test_get_projects_information(self, do_graphql_queries_mock):
+        do_graphql_queries_mock.side_effect = fake_queries
+        failed = []
+        projects = list(get_projects_information("api_token", ["p1", "missing", "p2"], failed))
+        self.assertEqual(1, do_graphql_queries_mock.call_count)
+        self.assertEqual(["p1", "p2"], [project["name"] for project in projects])
+        self.assertEqual(["missing"], failed)
+        self.assertEqual(3, get_project_row(projects[0])["violations"])
+
+    @patch('codiga.project.do_graphql_queries')
+    def test_get_projects_analyses(self, do_graphql_queries_mock):
+        """
+        Check that the first page of all the projects is fetched in one batch, then all the other pages
+        :return:
+        """
+        do_graphql_queries_mock.side_effect = fake_queries
+        analyses = list(get_projects_analyses("api_token", ["p1", "p2"]))
+        self.assertEqual(2, do_graphql_queries_mock.call_count)
+        self.assertEqual(2, len(do_graphql_queries_mock.call_args_list[0][0][1]))
+        self.assertEqual(4, len(do_graphql_queries_mock.call_args_list[1][0][1]))
+        self.assertEqual(500, len(analyses))
+        self.assertEqual(list(range(250)), sorted(analysis["id"] for name, analysis in analyses if name == "p1"))
+
+    @patch('codiga.project.do_graphql_queries')
+    def test_get_projects_analyses_failed_page(self, do_graphql_queries_mock):
+        """
+        Check that a project whose first page or a next page cannot be fetched is reported as failed
+        :return:
+        """
+        def failing_queries(api_token, queries):
+            results = fake_queries(api_token, queries)
+            return [None if variables["name"] == "flaky" and variables["skip"] > 0 else result
+                    for (_, variables), result in zip(queries, results)]
+
+        do_graphql_queries_mock.side_effect = failing_queries
+        failed = []
+        analyses = list(get_projects_analyses("api_token", ["p1", "flaky", "missing"], failed=failed))
+        self.assertEqual(["missing", "flaky"], failed)
+        self.assertEqual(250, len([name for name, analysis in analyses if name == "p1"]))
+
+        do_graphql_queries_mock.reset_mock()
+        analyses = list(get_projects_analyses("api_token", ["p1"], max_analyses=120))
+        self.assertEqual(120, len(analyses))
+
+    def test_write_rows(self):
+        rows = [{"project": "p1", "id": 1}, {"project": "p2", "id": 2}]
+
+        output = io.StringIO()
+        self.assertEqual(2, write_rows(iter(rows), PROJECT_COLUMNS, FORMAT_NDJSON, output))
+        self.assertEqual(rows, [json.loads(line) for line in output.getvalue().splitlines()])
+
+        output = io.StringIO()
+        write_rows(iter(rows), PROJECT_COLUMNS, FORMAT_CSV, output)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(",".join(PROJECT_COLUMNS), lines[0])
+        self.assertTrue(lines[1].startswith("p1,1,"))
@@ -0,0 +1,56 @@
+"""
+Test for methods in utils/json_stream.py
+"""
+
+import io
+import json
+import unittest
+from unittest.mock import patch
+
+from codiga.utils.json_stream import iter_json_object_items, iter_file_chunks
+
+
+class TestJsonStream(unittest.TestCase):
+    """
+    Test methods for the utils/json_stream.py
+    """
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_iter_json_object_items(self):
+        """
+        Check that the members are decoded whatever the size of the chunks
+        :return:
+        """
+        document = {"a": {"prefix": "p", "body": ["x", "}{"]}, "b": 1234, "c": "é\"}", "d": [1, None]}
+        text = json.dumps(document)
+        encoded = json.dumps(document, ensure_ascii=False).encode('utf-8')
+        for size in [1, 2, 5, 1000]:
+            self.assertEqual(document, dict(iter_json_object_items(iter_file_chunks(io.StringIO(text), size))))
+            chunks = [encoded[index:index + size] for index in range(0, len(encoded), size)]
+            self.assertEqual(list(document.items()), list(iter_json_object_items(chunks)))
+
+    def test_large_value(self):
+        """
+        Check that a large value read in small chunks is only decoded a few times
+        :return:
+        """
+        document = {"a": {"body": ["line {0}".format(index) for index in range(20000)]}, "b": 1}
+        text = json.dumps(document)
+        with patch.object(json.JSONDecoder, 'raw_decode', autospec=True,
+                          side_effect=json.JSONDecoder.raw_decode) as raw_decode_mock:
+            self.assertEqual(document, dict(iter_json_object_items(iter_file_chunks(io.StringIO(text), 64))))
+        # about log2(len(text) / 64) attempts instead of one per chunk
+        self.assertLess(raw_decode_mock.call_count, 40)
+
+    def test_invalid_json(self):
+        self.assertEqual([], list(iter_json_object_items([" { } "])))
+        with self.assertRaises(ValueError):
+            list(iter_json_object_items(['["a"]']))
+        with self.assertRaises(ValueError):
+            list(iter_json_object_items(['{"a": 1 "b": 2}']))
+        with self.assertRaises(ValueError):
+            list(iter_json_object_items(['{"a": {"b": ']))
@@ -0,0 +1,45 @@
+"""
+Test for methods in utils/json_utils.py
+"""
+
+import unittest
+from unittest.mock import patch
+
+from codiga.utils import json_utils
+from codiga.utils.json_utils import loads, dumps, dumps_bytes
+
+VALUE = {"name": "règle", "count": 3, "ratio": 0.5, "tags": [None, True], "big": 2 ** 70}
+
+
+class TestJsonUtils(unittest.TestCase):
+    """
+    Tests for utils/json_utils.py
+    """
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_round_trip(self):
+        """
+        Check that values are encoded and decoded the same way with and without orjson.
+        :return:
+        """
+        self.assertEqual(VALUE, loads(dumps_bytes(VALUE)))
+        self.assertEqual(VALUE, loads(dumps(VALUE)))
+        with patch.object(json_utils, 'orjson', None):
+            self.assertEqual(VALUE, loads(dumps_bytes(VALUE)))
+            self.assertEqual(VALUE, loads(dumps(VALUE).encode('utf-8')))
+            self.assertEqual(dumps_bytes({"a": [1, "é"]}), '{"a":[1,"é"]}'.encode('utf-8'))
+
+    def test_invalid_document(self):
+        with self.assertRaises(ValueError):
+            loads(b'{"a": ')
+        with patch.object(json_utils, 'orjson', None):
+            with self.assertRaises(ValueError):
+                loads(b'{"a": ')
+
+
+if __name__ == '__main__':
+    unittest.main()
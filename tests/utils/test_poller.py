@@ -0,0 +1,57 @@
+"""
+Test for methods in utils/poller.py
+"""
+
+import unittest
+
+from codiga.exceptions.polling_timeout_exception import PollingTimeoutException
+from codiga.utils.poller import Deadline, poll, get_next_interval, MAX_INTERVAL_SECS
+
+
+class TestPoller(unittest.TestCase):
+    """
+    Test the polling of objects on the API
+    """
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_first_check_without_sleep(self):
+        sleeps = []
+        result = poll(lambda: {"status": "DONE"}, lambda r: r["status"] == "DONE", Deadline(10), sleep=sleeps.append)
+        self.assertEqual("DONE", result["status"])
+        self.assertEqual([], sleeps)
+
+    def test_backoff(self):
+        sleeps = []
+        responses = iter([None, None, None, "done"])
+        result = poll(lambda: next(responses), lambda r: r is not None, Deadline(100),
+                      initial_interval_secs=1, sleep=sleeps.append)
+        self.assertEqual("done", result)
+        self.assertEqual(3, len(sleeps))
+        self.assertTrue(0.8 <= sleeps[0] <= 1.2)
+        self.assertTrue(sleeps[2] > sleeps[0])
+
+    def test_interval_hint(self):
+        sleeps = []
+        responses = iter([4, None])
+        poll(lambda: next(responses), lambda r: r is None, Deadline(100),
+             interval_hint=lambda r: r, sleep=sleeps.append)
+        self.assertEqual([4], sleeps)
+
+    def test_max_requests(self):
+        calls = []
+        with self.assertRaises(PollingTimeoutException):
+            poll(lambda: calls.append(1), lambda r: False, Deadline(100), max_requests=3, sleep=lambda s: None)
+        self.assertEqual(3, len(calls))
+
+    def test_deadline_expired(self):
+        with self.assertRaises(PollingTimeoutException):
+            poll(lambda: None, lambda r: False, Deadline(0), sleep=lambda s: None)
+
+    def test_next_interval(self):
+        self.assertEqual(1.5, get_next_interval(1))
+        self.assertEqual(MAX_INTERVAL_SECS, get_next_interval(MAX_INTERVAL_SECS))
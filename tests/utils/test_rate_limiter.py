@@ -0,0 +1,38 @@
+"""
+Test for methods in utils/rate_limiter.py
+"""
+
+import unittest
+from unittest.mock import patch
+
+from codiga.utils.rate_limiter import RateLimiter
+
+
+class TestRateLimiter(unittest.TestCase):
+    """
+    Test methods for the utils/rate_limiter.py
+    """
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_rate_limiter(self):
+        """
+        Check that we wait once the burst is used and never wait without limit
+        :return:
+        """
+        with patch('codiga.utils.rate_limiter.time.sleep') as sleep_mock, \
+                patch('codiga.utils.rate_limiter.time.monotonic', side_effect=[0, 0, 0, 0.5, 1.0]):
+            rate_limiter = RateLimiter(2)
+            rate_limiter.acquire()
+            rate_limiter.acquire()
+            self.assertEqual(1, sleep_mock.call_count)
+            self.assertAlmostEqual(0.5, sleep_mock.call_args[0][0])
+
+        with patch('codiga.utils.rate_limiter.time.sleep') as sleep_mock:
+            rate_limiter = RateLimiter(None)
+            for _ in range(10):
+                rate_limiter.acquire()
+            sleep_mock.assert_not_called()
@@ -0,0 +1,68 @@
+"""
+Test for methods in utils/retry.py
+"""
+
+import unittest
+from unittest.mock import patch
+
+from codiga.exceptions.circuit_open_exception import CircuitOpenException
+from codiga.utils.retry import RetryBudget, CircuitBreaker
+
+
+class TestRetry(unittest.TestCase):
+    """
+    Tests for utils/retry.py
+    """
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_retry_budget(self):
+        """
+        Check that retries stop when the budget is spent and that successful requests refill it.
+        :return:
+        """
+        budget = RetryBudget(max_tokens=2, token_ratio=0.5)
+        self.assertTrue(budget.try_acquire())
+        self.assertTrue(budget.try_acquire())
+        self.assertFalse(budget.try_acquire())
+        budget.record_success()
+        self.assertFalse(budget.try_acquire())
+        budget.record_success()
+        self.assertTrue(budget.try_acquire())
+
+    @patch('codiga.utils.retry.time.monotonic')
+    def test_circuit_breaker(self, monotonic_mock):
+        """
+        Check that the circuit opens after consecutive failures, lets one request through
+        after the reset timeout and closes again when it succeeds.
+        :return:
+        """
+        monotonic_mock.return_value = 100.0
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout_secs=10)
+        breaker.record_failure()
+        breaker.before_call()
+        breaker.record_failure()
+        self.assertEqual(CircuitBreaker.OPEN, breaker.state)
+        with self.assertRaises(CircuitOpenException):
+            breaker.before_call()
+
+        monotonic_mock.return_value = 111.0
+        breaker.before_call()
+        self.assertEqual(CircuitBreaker.HALF_OPEN, breaker.state)
+        with self.assertRaises(CircuitOpenException):
+            breaker.before_call()
+        breaker.record_failure()
+        self.assertEqual(CircuitBreaker.OPEN, breaker.state)
+
+        monotonic_mock.return_value = 122.0
+        breaker.before_call()
+        breaker.record_success()
+        self.assertEqual(CircuitBreaker.CLOSED, breaker.state)
+        breaker.before_call()
+
+
+if __name__ == '__main__':
+    unittest.main()